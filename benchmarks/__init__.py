@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.__init__.py
+November 14, 2019
+@author Francois Roy
+"""
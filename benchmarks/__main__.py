@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.__main__.py
+November 14, 2019
+@author Francois Roy
+"""
+import sys
+import click
+from benchmarks.suite import *
+
+
+@click.group()
+def main():
+    r"""Benchmarks of the stages of the CFD models, e.g.
+
+    python -m benchmarks run -o new.json
+
+    python -m benchmarks compare old.json new.json
+    """
+    pass
+
+
+@main.command('run')
+@click.option('-o', '--output', default='benchmarks.json',
+              help="The JSON file of the results.")
+@click.option('-m', '--model', 'models', multiple=True,
+              type=click.Choice(sorted(MODELS.keys())),
+              help="The models to benchmark, default to all.")
+@click.option('--max-size', type=int, default=None,
+              help="The number of problem sizes per model, default to all.")
+@click.option('--num-steps', type=int, default=10,
+              help="The number of IPCS steps.")
+@click.option('--repeat', type=int, default=3,
+              help="The number of repetitions of the fast stages.")
+def run_command(output, models, max_size, num_steps, repeat):
+    r"""Times the stages of the models and saves the results."""
+    run(models=list(models) or None, max_size=max_size,
+        num_steps=num_steps, repeat=repeat, filename=output)
+
+
+@main.command('compare')
+@click.argument('baseline')
+@click.argument('current')
+@click.option('--threshold', type=float, default=0.2,
+              help="The relative slow down of a regression.")
+def compare_command(baseline, current, threshold):
+    r"""Compares two result files, exits with status 1 on regressions."""
+    rows = compare(load(baseline), load(current), threshold=threshold)
+    for row in rows:
+        click.echo('{:<16} {:<24} {:<14} {:>10.4f} {:>10.4f} {:>7.2f}{}'
+                   .format(row['model'], str(row['ne']), row['stage'],
+                           row['baseline'], row['current'], row['ratio'],
+                           '  REGRESSION' if row['regression'] else ''))
+    if any(row['regression'] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.suite.py
+November 14, 2019
+@author Francois Roy
+"""
+import json
+import platform
+import subprocess
+import time
+import dolfin
+from utils import *
+from cfd.models_2d.axi_symmetric.poiseuille_axi import PoiseuilleAxi
+from cfd.models_2d.poiseuille_plane import PoiseuillePlane
+
+# the numbers of elements of the problem sizes, from small to large
+SIZES = {
+    'PoiseuillePlane': [{'ne_x': 20, 'ne_y': 4}, {'ne_x': 50, 'ne_y': 10},
+                        {'ne_x': 100, 'ne_y': 20}, {'ne_x': 200, 'ne_y': 40}],
+    'PoiseuilleAxi': [{'ne_r': 4, 'ne_z': 20}, {'ne_r': 10, 'ne_z': 50},
+                      {'ne_r': 20, 'ne_z': 100}, {'ne_r': 40, 'ne_z': 200}],
+}
+MODELS = {'PoiseuillePlane': PoiseuillePlane, 'PoiseuilleAxi': PoiseuilleAxi}
+# the timed stages, in the order of the pipeline
+STAGES = ('setup', 'geometry', 'mesh', 'mesh_memory', 'mesh_xdmf',
+          'materials_bcs', 'jit', 'assembly', 'ipcs_step', 'full_run')
+
+
+def best_time(func, repeat=3):
+    r"""Returns the smallest wall time of ``repeat`` calls of a function."""
+    times = []
+    for _ in range(max(int(repeat), 1)):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def benchmark(model_name, ne, num_steps=10, repeat=3):
+    r"""Times the stages of a model for one problem size.
+
+    The stages are:
+
+    - 'setup': the creation of the model and of its IPCS solver,
+    - 'geometry': :meth:`Geometry.run<fem.geometry.Geometry.run>`,
+    - 'mesh': :meth:`Mesh.run<fem.mesh.Mesh.run>` (gmsh or the mesh
+      cache, and the dolfin mesh),
+    - 'mesh_memory': the dolfin mesh and markers built in memory from the
+      gmsh arrays, see :meth:`Mesh.from_meshio<fem.mesh.Mesh.from_meshio>`,
+    - 'mesh_xdmf': the same through the XDMF files (write and read), the
+      path of the parallel runs,
+    - 'materials_bcs': the material properties and the boundary conditions
+      on the new mesh,
+    - 'jit': the first assembly of the IPCS operators (compilation or
+      loading of the forms),
+    - 'assembly': the assembly of the IPCS operators,
+    - 'ipcs_step': the median wall time of an IPCS step (after the first
+      one, which also assembles the tentative velocity matrix),
+    - 'full_run': the ``compute`` method of a new model with ``num_steps``
+      steps.
+
+    The fast stages are repeated ``repeat`` times and the best time is kept.
+
+    :param model_name: The model name, see :data:`MODELS`.
+    :type model_name: str
+    :param ne: The numbers of elements by name, e.g. ``{'ne_r': 10,
+      'ne_z': 50}``.
+    :type ne: dict
+    :param num_steps: The number of IPCS steps, default = 10.
+    :type num_steps: int
+    :param repeat: The number of repetitions, default = 3.
+    :type repeat: int
+    :return: The record of the problem size (model, ne, number of cells and
+      degrees of freedom, timings by stage).
+    """
+    model_class = MODELS[model_name]
+    timings = {}
+    dt = 0.01
+    t0 = time.perf_counter()
+    model = model_class(**ne)
+    solver = model.setup(t_end=Q_(num_steps * dt, 's'), num_steps=num_steps)
+    timings['setup'] = time.perf_counter() - t0
+
+    comp = model.component('comp')
+    geom = comp.child_by_tag('geom')
+    mesh = comp.child_by_tag('mesh')
+    physics = solver.physics()
+    timings['geometry'] = best_time(lambda: geom.run(force=True), repeat)
+    timings['mesh'] = best_time(lambda: mesh.run(force=True), 1)
+    msh = mesh.load_geometry()  # from the mesh cache
+    timings['mesh_memory'] = best_time(lambda: mesh.from_meshio(msh), repeat)
+
+    def mesh_xdmf():
+        mesh._write_xdmf(msh, *mesh._xdmf_path())
+        mesh.import_mesh()
+
+    timings['mesh_xdmf'] = best_time(mesh_xdmf, repeat)
+
+    def materials_bcs():
+        # a new mesh revision invalidates the cached functions and BCs
+        mesh.run(force=True)
+        t = time.perf_counter()
+        physics.fluid_properties()
+        physics.boundary_conditions()
+        return time.perf_counter() - t
+
+    timings['materials_bcs'] = min(materials_bcs() for _ in range(repeat))
+
+    forms = solver.variational_problem()[0]
+    operators = [forms[key] for key in ('a1', 'a2', 'a3', 'l1')]
+    timings['jit'] = best_time(
+        lambda: [dolfin.assemble(form) for form in operators], 1)
+    timings['assembly'] = best_time(
+        lambda: [dolfin.assemble(form) for form in operators], repeat)
+
+    u, p = solver.solve()
+    steps = [_step_time(record) for record in solver.stats().steps()[1:]]
+    timings['ipcs_step'] = float(np.median(steps)) if steps else np.nan
+
+    t0 = time.perf_counter()
+    model_class(**ne).compute(t_end=Q_(num_steps * dt, 's'),
+                              num_steps=num_steps)
+    timings['full_run'] = time.perf_counter() - t0
+
+    return {'model': model_name, 'ne': ne,
+            'num_cells': mesh.num_cells(),
+            'dofs': u.function_space().dim() + p.function_space().dim(),
+            'timings': timings}
+
+
+def compare(baseline, current, threshold=0.2, min_time=1e-3):
+    r"""Compares the timings of two benchmark files.
+
+    A stage is a regression if it is more than ``threshold`` (relative)
+    and ``min_time`` (absolute) slower than the baseline.
+
+    :param baseline: The baseline results, see :func:`run`.
+    :type baseline: dict
+    :param current: The current results.
+    :type current: dict
+    :param threshold: The relative tolerance, default = 0.2.
+    :type threshold: float
+    :param min_time: The absolute tolerance in seconds, default = 1e-3.
+    :type min_time: float
+    :return: The comparisons (model, ne, stage, baseline and current times,
+      ratio and regression flag) of the stages found in both files.
+    """
+    def key(record):
+        return record['model'], tuple(sorted(record['ne'].items()))
+
+    base = {key(record): record for record in baseline['results']}
+    out = []
+    for record in current['results']:
+        ref = base.get(key(record))
+        if ref is None:
+            continue
+        for stage in STAGES:
+            t_ref = ref['timings'].get(stage)
+            t_cur = record['timings'].get(stage)
+            if t_ref is None or t_cur is None:
+                continue
+            ratio = t_cur / t_ref if t_ref > 0. else np.inf
+            out.append({'model': record['model'], 'ne': record['ne'],
+                        'stage': stage, 'baseline': t_ref, 'current': t_cur,
+                        'ratio': ratio,
+                        'regression': bool(ratio > 1. + threshold and
+                                           t_cur - t_ref > min_time)})
+    return out
+
+
+def load(filename):
+    r"""Loads a benchmark file."""
+    with open(filename) as f:
+        return json.load(f)
+
+
+def metadata():
+    r"""Returns the environment of the benchmark (commit, versions and
+    platform)."""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=str(ROOT_DIR),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dolfin': dolfin.__version__, 'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processes': dolfin.MPI.size(dolfin.MPI.comm_world)}
+
+
+def run(models=None, max_size=None, num_steps=10, repeat=3, filename=None):
+    r"""Runs the benchmarks of the models for the sizes of :data:`SIZES`.
+
+    :param models: The model names, default = all the models.
+    :type models: list
+    :param max_size: The number of sizes per model, default = all sizes.
+    :type max_size: int
+    :param num_steps: The number of IPCS steps, default = 10.
+    :type num_steps: int
+    :param repeat: The number of repetitions of the fast stages,
+      default = 3.
+    :type repeat: int
+    :param filename: Save the results in this JSON file, default = None.
+    :type filename: str
+    :return: The results, i.e. the metadata and the records of
+      :func:`benchmark`.
+    """
+    if models is None:
+        models = list(SIZES.keys())
+    results = []
+    for name in models:
+        for ne in SIZES[name][:max_size]:
+            record = benchmark(name, ne, num_steps=num_steps, repeat=repeat)
+            logging.info("{} {}: {}".format(name, ne, record['timings']))
+            results.append(record)
+    out = {'metadata': metadata(), 'results': results}
+    if filename is not None:
+        with open(filename, 'w') as f:
+            json.dump(out, f, indent=2, default=float)
+    return out
+
+
+def _step_time(record):
+    r"""Returns the wall time of a step, i.e. the total of the timed phases
+    of its record, see :class:`SolverStats<fem.solver_stats.SolverStats>`."""
+    return sum(v for k, v in record.items()
+               if isinstance(v, float) and
+               k not in ('t', 'dt', 'courant', 'alpha') and
+               not k.startswith(('iterations_', 'residual_')))
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+cfd.job_queue.py
+November 14, 2019
+@author Francois Roy
+"""
+import hashlib
+import json
+import socket
+import threading
+import time
+from utils import *
+
+# the states of the jobs, one subdirectory per state
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+STATES = (PENDING, RUNNING, DONE, FAILED)
+
+
+def job_id(spec):
+    r"""Returns the id of a job specification, the hash of its canonical
+    JSON representation, so that the same job is never queued twice.
+
+    :param spec: The job specification, e.g. ``{'model': 'PoiseuilleAxi',
+      'params': {'pin': 8.0}}``.
+    :type spec: dict
+    """
+    data = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+class JobQueue(object):
+    r"""A durable queue of jobs on a (possibly shared) file system, pulled by
+    any number of worker processes on any number of hosts.
+
+    Each job is a JSON record (specification, status, attempts, worker,
+    result) in the subdirectory of its state: ``pending``, ``running``,
+    ``done`` or ``failed``. The state changes are atomic renames between the
+    subdirectories, so that a pending job is claimed by exactly one worker,
+    and the records are rewritten atomically (written to a temporary file
+    then renamed). Unlike SQLite, this relies only on the atomicity of
+    ``rename`` and works on network file systems (NFS).
+
+    A worker touches the record of its running job every
+    ``heartbeat`` seconds; the running jobs without heartbeat for more than
+    ``timeout`` seconds (e.g. the worker crashed or the host rebooted) are
+    queued again by the other workers, until ``max_attempts`` attempts. A
+    worker finishes a job only if it still owns its running record, so that
+    a worker whose job was queued again (e.g. a long call holding the GIL
+    starved its heartbeat) never overwrites the job of another worker. The
+    done jobs are never run again, even if they are submitted again.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> queue = JobQueue(OUT_DIR.child('queue'))
+      >>> for job in sweep.jobs():
+      ...     queue.submit({'model': job['model'], 'params': job['params']})
+      >>> # on any host sharing the directory
+      >>> queue.work(run_job)
+      >>> queue.counts()
+      {'pending': 0, 'running': 0, 'done': 8, 'failed': 0}
+
+    :param directory: The queue directory.
+    :type directory: str
+    :param timeout: The time in seconds without heartbeat after which a
+      running job is queued again, default = 600.
+    :type timeout: float
+    :param heartbeat: The time in seconds between two heartbeats,
+      default = 30.
+    :type heartbeat: float
+    :param max_attempts: The number of attempts of a job before it is moved
+      to ``failed``, default = 3.
+    :type max_attempts: int
+    :param worker: The name of the worker, default to ``<host>:<pid>``.
+    :type worker: str
+    """
+    def __init__(self, directory, timeout=600., heartbeat=30.,
+                 max_attempts=3, worker=None):
+        self._directory = Path(os.path.abspath(str(directory)))
+        self._timeout = float(timeout)
+        self._heartbeat = float(heartbeat)
+        self._max_attempts = max(int(max_attempts), 1)
+        for state in STATES + ('tmp', 'work'):
+            os.makedirs(self._directory.child(state), exist_ok=True)
+        self._worker = '{}:{}'.format(socket.gethostname(), os.getpid()) \
+            if worker is None else str(worker)
+
+    def claim(self):
+        r"""Claims the oldest pending job.
+
+        :return: The record of the job, None if there is no pending job.
+        """
+        for name in self._pending():
+            job_id = name[:-len('.json')]
+            try:
+                # only one worker succeeds
+                os.rename(self.path(PENDING, job_id),
+                          self.path(RUNNING, job_id))
+            except OSError:
+                continue
+            try:
+                # the rename keeps the time of the pending record, touch it
+                # before the other workers take the job for a stale one
+                os.utime(self.path(RUNNING, job_id))
+            except OSError:  # queued again in the meantime
+                continue
+            if os.path.exists(self.path(DONE, job_id)):
+                os.remove(self.path(RUNNING, job_id))
+                continue
+            record = self.record(RUNNING, job_id)
+            record['attempts'] += 1
+            record['worker'] = self._worker
+            record['started'] = time.time()
+            self._write(RUNNING, record)
+            return record
+        return None
+
+    def complete(self, record, result):
+        r"""Moves a running job to ``done``.
+
+        :param record: The record of the job, see :meth:`claim`.
+        :type record: dict
+        :param result: The result of the job, e.g. its summary.
+        :type result: dict
+        """
+        self._finish(record, DONE, result=result)
+
+    def counts(self):
+        r"""Returns the number of jobs by state."""
+        return {state: len(self._names(state)) for state in STATES}
+
+    def directory(self):
+        r"""Returns the queue directory."""
+        return self._directory
+
+    def fail(self, record, error):
+        r"""Queues a running job again after a failure, or moves it to
+        ``failed`` after ``max_attempts`` attempts.
+
+        :param record: The record of the job, see :meth:`claim`.
+        :type record: dict
+        :param error: The error message.
+        :type error: str
+        """
+        if record['attempts'] < self._max_attempts:
+            self._finish(record, PENDING, error=error)
+        else:
+            self._finish(record, FAILED, error=error)
+
+    def path(self, state, job_id):
+        r"""Returns the path of the record of a job in a state."""
+        return self._directory.child(state).child(job_id + '.json')
+
+    def record(self, state, job_id):
+        r"""Reads the record of a job in a state."""
+        with open(self.path(state, job_id)) as f:
+            return json.load(f)
+
+    def records(self, state):
+        r"""Returns the records of the jobs in a state."""
+        records = []
+        for name in self._names(state):
+            try:
+                records.append(self.record(state, name[:-len('.json')]))
+            except (OSError, ValueError):  # moved in the meantime
+                continue
+        return records
+
+    def release(self, record):
+        r"""Queues a running job again without counting the attempt, e.g.
+        when the worker is interrupted."""
+        record['attempts'] -= 1
+        self._finish(record, PENDING)
+
+    def requeue_stale(self):
+        r"""Queues again the running jobs without heartbeat for more than
+        ``timeout`` seconds, or moves them to ``failed`` after
+        ``max_attempts`` attempts.
+
+        :return: The ids of the jobs queued again.
+        """
+        ids = []
+        now = time.time()
+        for name in self._names(RUNNING):
+            job_id = name[:-len('.json')]
+            path = self.path(RUNNING, job_id)
+            try:
+                if now - os.path.getmtime(path) <= self._timeout:
+                    continue
+            except OSError:
+                continue
+            tmp = self._tmp(job_id)
+            try:
+                # only one worker succeeds
+                os.rename(path, tmp)
+            except OSError:
+                continue
+            try:
+                with open(tmp) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            state = PENDING if record['attempts'] < self._max_attempts \
+                else FAILED
+            record['status'] = state
+            record['error'] = 'no heartbeat'
+            with open(tmp, 'w') as f:
+                json.dump(record, f, indent=2, default=float)
+            os.replace(tmp, self.path(state, job_id))
+            logging.warning("{}: no heartbeat from {}, moved to {}".format(
+                job_id, record.get('worker'), state))
+            ids.append(job_id)
+        return ids
+
+    def submit(self, spec):
+        r"""Adds a job to the queue, unless a job of the same specification
+        is already in the queue (in any state).
+
+        :param spec: The job specification, see :func:`job_id`.
+        :type spec: dict
+        :return: The id of the job.
+        """
+        i = job_id(spec)
+        if any(os.path.exists(self.path(state, i)) for state in STATES):
+            return i
+        record = {'id': i, 'spec': spec, 'status': PENDING, 'attempts': 0,
+                  'submitted': time.time(),
+                  'directory': str(self._directory.child('work').child(i))}
+        self._write(PENDING, record)
+        return i
+
+    def work(self, run, wait=False, poll=10., max_jobs=None):
+        r"""Runs the jobs of the queue until it is empty.
+
+        :param run: The function running a job, called with the record of
+          the job and returning its result; the job fails if the function
+          raises an exception or returns a result of status 'failed'.
+        :type run: callable
+        :param wait: Keep polling while jobs are running on other workers
+          (they may be queued again), default = False.
+        :type wait: bool
+        :param poll: The time in seconds between two polls, default = 10.
+        :type poll: float
+        :param max_jobs: The maximum number of jobs, default = None.
+        :type max_jobs: int
+        :return: The number of jobs run.
+        """
+        num_jobs = 0
+        while max_jobs is None or num_jobs < max_jobs:
+            self.requeue_stale()
+            record = self.claim()
+            if record is None:
+                if not wait or not self._names(RUNNING):
+                    break
+                time.sleep(poll)
+                continue
+            logging.info("{}: attempt {} on {}".format(
+                record['id'], record['attempts'], self._worker))
+            stop = threading.Event()
+            beat = threading.Thread(target=self._beat,
+                                    args=(record['id'], stop), daemon=True)
+            beat.start()
+            try:
+                result = run(record)
+            except KeyboardInterrupt:
+                stop.set()
+                self.release(record)
+                raise
+            except Exception as e:
+                stop.set()
+                logging.error("{}: {}".format(record['id'], e))
+                self.fail(record, str(e))
+            else:
+                stop.set()
+                if isinstance(result, dict) and \
+                        result.get('status') == FAILED:
+                    self.fail(record, result.get('error'))
+                else:
+                    self.complete(record, result)
+            beat.join()
+            num_jobs += 1
+        return num_jobs
+
+    def _beat(self, job_id, stop):
+        r"""Touches the record of a running job until ``stop`` is set."""
+        while not stop.wait(self._heartbeat):
+            try:
+                os.utime(self.path(RUNNING, job_id))
+            except OSError:
+                break
+
+    def _finish(self, record, state, **kwargs):
+        r"""Moves a running job to a state with its updated record, if the
+        worker still owns the running record.
+
+        :return: False if the job was queued again meanwhile.
+        """
+        try:
+            running = self.record(RUNNING, record['id'])
+        except (OSError, ValueError):
+            running = None
+        if running is None or running.get('worker') != self._worker or \
+                running.get('started') != record.get('started'):
+            logging.warning("{}: no longer run by {}, {} dropped".format(
+                record['id'], self._worker, state))
+            return False
+        record.update(kwargs)
+        record['status'] = state
+        record['finished'] = time.time()
+        self._write(state, record)
+        try:
+            os.remove(self.path(RUNNING, record['id']))
+        except OSError:
+            pass
+        return True
+
+    def _names(self, state):
+        r"""Returns the file names of the records of a state."""
+        return sorted(name for name in os.listdir(self._directory.child(state))
+                      if name.endswith('.json'))
+
+    def _pending(self):
+        r"""Returns the file names of the pending records, the oldest
+        first."""
+        names = self._names(PENDING)
+        directory = self._directory.child(PENDING)
+
+        def mtime(name):
+            try:
+                return os.path.getmtime(os.path.join(directory, name))
+            except OSError:
+                return 0.
+
+        return sorted(names, key=mtime)
+
+    def _tmp(self, job_id):
+        r"""Returns the temporary file of a record of the worker."""
+        return self._directory.child('tmp').child('{}.{}.json'.format(
+            job_id, self._worker.replace(':', '_')))
+
+    def _write(self, state, record):
+        r"""Writes a record atomically."""
+        tmp = self._tmp(record['id'])
+        with open(tmp, 'w') as f:
+            json.dump(record, f, indent=2, default=float)
+        os.replace(tmp, self.path(state, record['id']))
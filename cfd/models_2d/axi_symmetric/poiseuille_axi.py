@@ -165,6 +165,8 @@ class PoiseuilleAxi(fem.Model):
         self._ne_r = int(ne_r)
         self._ne_z = int(ne_z)
         self.add_child(fem.Component('comp', 2, is_axi=True))
+        self.create(STUDY, 'std')
+        self.create(RESULTS, 'res')
         self._geom = self.geom()
         self._mesh = self.mesh()
 
@@ -183,13 +185,46 @@ class PoiseuilleAxi(fem.Model):
             check_dimension(value, name)
         self._size = value.to('m')
 
+    def analytic_solution(self, x):
+        r"""Evaluates the steady solution of the finite element problem
+        (without gravity) at the points ``x``, see :meth:`exact_solution`:
+
+        .. math:: u_r = 0,~u_z = \frac{p_{in} - p_{out}}{4\mu L}
+            \left(R^2 - r^2\right),~
+            p = p_{in} - \left(p_{in} - p_{out}\right)\frac{z}{L}
+
+        :param x: The (n, 2) array of points (r, z) in m.
+        :type x: array-like
+        :return: The (n, 2) array of velocities (m/s) and the (n,) array of
+          pressures (Pa).
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        radius = self._size[0].magnitude
+        length = self._size[1].magnitude
+        mu = self._mu.magnitude
+        pin = self._pin.magnitude
+        pout = self._pout.magnitude
+        u = np.zeros_like(x)
+        u[:, 1] = 0.25 * (pin - pout) / (mu * length) * (radius**2 -
+                                                         x[:, 0]**2)
+        p = pin - (pin - pout) * x[:, 1] / length
+        return u, p
+
     def axial_line(self):
         r"""Define an axial line on which the solution :math:`p` can be
         mapped (interpolated)."""
         z = self._size[1].magnitude
         return Q_(np.linspace(0, z, self._ne_z + 1), 'm')
 
-    def compute(self, t_end=Q_(10.0, 's'), num_steps=500):
+    def char_length(self):
+        r"""The characteristic length of the mesh elements, such that there
+        are at least ``ne_r`` elements along the radius and ``ne_z``
+        elements along the height of the pipe."""
+        return min(self._size[0] / self._ne_r, self._size[1] / self._ne_z)
+
+    def compute(self, t_end=Q_(10.0, 's'), num_steps=500, adaptive=False,
+                solver=IPCS, restart=False, discretization=P2P1, probes=None,
+                stats_dir=None, **kwargs):
         r"""For incompressible flow, the continuity equation is:
 
         .. math::  \nabla\cdot \mathbf{u} = 0
@@ -435,30 +470,103 @@ class PoiseuilleAxi(fem.Model):
         equations efficiently by solving a sequence of three linear
         variational problems in each time step.
 
-        In order to simulate steady-state use t_end = large number
+        The axisymmetric formulation is switched on by the component
+        (``Component(is_axi=True)``), see
+        :class:`LaminarFlow<fem.physics_feats.laminar_flow.LaminarFlow>`. The
+        first coordinate of the mesh is the radial coordinate :math:`r`, the
+        inlet and outlet are at :math:`z=0` and :math:`z=L`, the wall is at
+        :math:`r=R` and the radial velocity vanishes on the symmetry axis
+        :math:`r=0`.
+
+        In order to simulate steady-state, use the steady-state tolerance
+        ``u_tol`` of the IPCS solver, or the NEWTON solver.
 
         :param t_end: Final time, default = 10 s.
         :type t_end: ureg.Quantity
         :param num_steps: Number of time steps, default = 500.
         :type num_steps: int
-        :return: The solution.
+        :param adaptive: Adapt the time step to the flow, ``t_end/num_steps``
+          is then the initial time step, default = False.
+        :type adaptive: bool
+        :param solver: The solver type, IPCS (time marching) or NEWTON
+          (steady state, ``t_end``, ``num_steps`` and ``adaptive`` are
+          ignored), default = IPCS.
+        :type solver: str
+        :param restart: Continue the IPCS time loop from its checkpoint file
+          if it exists, see :meth:`Study.run<fem.study.Study.run>`, default =
+          False.
+        :type restart: bool
+        :param discretization: The discretization of the laminar flow, 'p2p1'
+          (default) or 'p1p1', see
+          :class:`LaminarFlow<fem.physics_feats.laminar_flow.LaminarFlow>`.
+        :type discretization: str
+        :param probes: The probe points (r, z) in m by name, e.g. the
+          locations of the pressure transducers, recorded at each step by
+          the :class:`Probe<fem.results_feats.probe.Probe>` 'probe1' of the
+          results, default = None (no probe).
+        :type probes: dict
+        :param stats_dir: Directory where the timings and linear solver
+          statistics of the solver are saved, see
+          :meth:`Study.save_stats<fem.study.Study.save_stats>`, default =
+          None (not saved).
+        :type stats_dir: str
+        :param kwargs: Extra arguments of the solver -- see
+          :class:`fem.solver_feats.ipcs.Ipcs` and
+          :class:`fem.solver_feats.newton.Newton`.
+        :return: The velocity and pressure fields at the final time.
+        """
+        solver = self.setup(t_end, num_steps, adaptive, solver,
+                            discretization, probes, **kwargs)
+        return self.study('std').run(restart=restart,
+                                     stats_dir=stats_dir)[solver.tag]
+
+    def setup(self, t_end=Q_(10.0, 's'), num_steps=500, adaptive=False,
+              solver=IPCS, discretization=P2P1, probes=None, **kwargs):
+        r"""Creates the materials, physics and solver of the model, see
+        :meth:`compute`.
+
+        :return: The solver.
         """
-        out = None
         dt = t_end.to('s').magnitude / num_steps
         radius = self._size[0].magnitude
         length = self._size[1].magnitude
         mu = self._mu.magnitude
         rho = self._rho.magnitude
         pin = self._pin.magnitude
+        pout = self._pout.magnitude
 
-        # TODO: something is odd with this mesh, needs investigations
         mesh = self._mesh
-
-        dom = dolfin.cpp.mesh.MeshFunctionSizet(mesh, mesh.mvc_dom())
-        bnd = dolfin.cpp.mesh.MeshFunctionSizet(mesh, mesh.mvc_bnd())
-        dx = dolfin.Measure("dx", domain=mesh, subdomain_data=dom)
-        ds = dolfin.Measure("ds", domain=mesh, subdomain_data=bnd)
-        return out
+        mat = self.component('comp').create(MATERIALS, 'mat')
+        # add water density
+        mat.add('water', 'x[0] <= {} + tol'.format(radius), 'density', rho)
+        # add dynamic viscosity
+        mat.add('water', 'x[0] <= {} + tol'.format(radius),
+                'dynamic_viscosity', mu)
+
+        # set physics
+        phys = self.component('comp').create(PHYSICS, 'fem')
+        # add laminar flow, axisymmetric from the component
+        lam = phys.create(LAMINAR_FLOW, 'lam', discretization=discretization)
+        # create boundary conditions, x[0] is r and x[1] is z
+        lam.inflow('on_boundary && near(x[1], 0.0, tol)',
+                   value=dolfin.Constant(pin))
+        lam.outflow('on_boundary && near(x[1], {}, tol)'.format(length),
+                    value=dolfin.Constant(pout))
+        lam.wall('on_boundary && near(x[0], {}, tol)'.format(radius),
+                 value=dolfin.Constant((0.0, 0.0)))
+        lam.axis('on_boundary && near(x[0], 0.0, tol)')
+        if solver == NEWTON:
+            solver = self.study('std').create(NEWTON, 'newton1', **kwargs)
+        else:
+            solver = self.study('std').create(IPCS, 'ipcs1',
+                                              num_steps=num_steps, dt=dt,
+                                              adaptive=adaptive, **kwargs)
+        solver.add_mesh(mesh)
+        solver.add_physics(lam)
+        if probes:
+            solver.add_probe(self.results('res').create(PROBE, 'probe1',
+                                                        points=probes))
+        return solver
 
     def exact_solution(self):
         r"""This method is used to validate the finite element model.
@@ -612,7 +720,8 @@ class PoiseuilleAxi(fem.Model):
     def geom(self):
         r""""""
         geom = self.component('comp').create(GEOMETRY, 'geom')
-        geom.create(RECTANGLE, tag='r1', a=self._size[0], b=self._size[1])
+        geom.create(RECTANGLE, tag='r1', a=self._size[0], b=self._size[1],
+                    char_length=self.char_length())
         geom.run()
         return geom
 
@@ -627,41 +736,8 @@ class PoiseuilleAxi(fem.Model):
         mesh.run()
         return mesh
 
-    def molecular_stress_tensor(self, u, p):
-        r"""Define the molecular stress tensor:
-
-        .. math:: \bar{\pi} = 2\mu\bar{\epsilon}-p\bar{I}
-
-        :param u: The velocity field.
-        :param p: The pressure field.
-        :return: The molecular stress tensor.
-        """
-        mu = self._mu.magnitude
-        return 2 * mu * self.strain_rate_tensor(u) - p * dolfin.Identity(3)
-
     def radial_line(self):
         r"""Define a radial line on which the solution :math:`u_z` can be
         mapped (interpolated)."""
         r = self._size[0].magnitude
         return Q_(np.linspace(0, r, self._ne_r + 1), 'm')
-
-    def strain_rate_tensor(self, u):
-        r"""Define the symmetric strain-rate tensor
-
-        :param u: The velocity field (2D).
-        :return: The strain rate tensor.
-        """
-        r = dolfin.SpatialCoordinate(self._mesh)[0]
-        ur = u[0]
-        uz = u[1]
-        ur_r = ur.dx(0)
-        ur_z = ur.dx(1)
-        uz_r = uz.dx(0)
-        uz_z = uz.dx(1)
-        return dolfin.sym(
-            dolfin.as_tensor(
-                [
-                    [ur_r, 0, 0.5 * (uz_r + ur_z)],
-                    [0, ur / r, 0],
-                    [0.5 * (uz_r + ur_z), 0, uz_z]
-                ]))
@@ -57,18 +57,87 @@ class PoiseuillePlane(fem.Model):
             check_dimension(value, name)
         self._size = value.to('m')
 
+    def analytic_solution(self, x):
+        r"""Evaluates the steady solution of the finite element problem at
+        the points ``x``, see :meth:`exact_solution`.
+
+        :param x: The (n, 2) array of points (x, y) in m.
+        :type x: array-like
+        :return: The (n, 2) array of velocities (m/s) and the (n,) array of
+          pressures (Pa).
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        length = self._size[0].magnitude
+        height = self._size[1].magnitude
+        mu = self._mu.magnitude
+        pin = self._pin.magnitude
+        pout = self._pout.magnitude
+        u = np.zeros_like(x)
+        u[:, 0] = 0.5 * (pin - pout) / (mu * length) * x[:, 1] * (height -
+                                                                 x[:, 1])
+        p = pin - (pin - pout) * x[:, 0] / length
+        return u, p
+
     def axial_line(self):
         r"""Define an axial line on which the solution :math:`p` can be
         mapped (interpolated)."""
-        x = self._size[1].magnitude
+        x = self._size[0].magnitude
         return Q_(np.linspace(0, x, self._ne_x + 1), 'm')
 
-    def compute(self, t_end=Q_(10.0, 's'), num_steps=500):
+    def char_length(self):
+        r"""The characteristic length of the mesh elements, such that there
+        are at least ``ne_x`` elements along the length and ``ne_y``
+        elements along the height of the channel."""
+        return min(self._size[0] / self._ne_x, self._size[1] / self._ne_y)
+
+    def compute(self, t_end=Q_(10.0, 's'), num_steps=500, adaptive=False,
+                solver=IPCS, restart=False, discretization=P2P1,
+                stats_dir=None, **kwargs):
         r"""Compute the finite element problem.
 
-        :param t_end:
-        :param num_steps:
-        :return:
+        :param t_end: Final time, default = 10 s.
+        :type t_end: ureg.Quantity
+        :param num_steps: Number of time steps, default = 500.
+        :type num_steps: int
+        :param adaptive: Adapt the time step to the flow, ``t_end/num_steps``
+          is then the initial time step, default = False.
+        :type adaptive: bool
+        :param solver: The solver type, IPCS (time marching) or NEWTON
+          (steady state, ``t_end``, ``num_steps`` and ``adaptive`` are
+          ignored), default = IPCS.
+        :type solver: str
+        :param restart: Continue the IPCS time loop from its checkpoint file
+          if it exists, see :meth:`Study.run<fem.study.Study.run>`, default =
+          False.
+        :type restart: bool
+        :param discretization: The discretization of the laminar flow, 'p2p1'
+          (default) or 'p1p1', see
+          :class:`LaminarFlow<fem.physics_feats.laminar_flow.LaminarFlow>`.
+        :type discretization: str
+        :param stats_dir: Directory where the timings and linear solver
+          statistics of the solver are saved, see
+          :meth:`Study.save_stats<fem.study.Study.save_stats>`, default =
+          None (not saved).
+        :type stats_dir: str
+        :param kwargs: Extra arguments of the solver, e.g. the steady-state
+          tolerance ``u_tol`` -- see :class:`fem.solver_feats.ipcs.Ipcs` and
+          :class:`fem.solver_feats.newton.Newton`.
+        :return: The velocity and pressure fields at the final time.
+        """
+        solver = self.setup(t_end, num_steps, adaptive, solver,
+                            discretization, **kwargs)
+        out = self.study('std').run(restart=restart,
+                                    stats_dir=stats_dir)[solver.tag]
+        # results add solution from study to dataset
+        line = self.results('res').create(LINE_PLOT, 'lp1')
+        return out
+
+    def setup(self, t_end=Q_(10.0, 's'), num_steps=500, adaptive=False,
+              solver=IPCS, discretization=P2P1, **kwargs):
+        r"""Creates the geometry, mesh, materials, physics and solver of the
+        model, see :meth:`compute`.
+
+        :return: The solver.
         """
         dt = t_end.to('s').magnitude / num_steps
         length = self._size[0].magnitude
@@ -82,14 +151,16 @@ class PoiseuillePlane(fem.Model):
         mesh = self._generate_mesh()
         mat = self.component('comp').create(MATERIALS, 'mat')
         # add water density
-        mat.add('water', 'x[0] <= 0.5 + tol', 'density', rho)
+        mat.add('water', 'x[0] <= {} + tol'.format(length), 'density', rho)
         # add dynamic viscosity
-        mat.add('water', 'x[0] <= 0.5 + tol', 'dynamic_viscosity', mu)
+        mat.add('water', 'x[0] <= {} + tol'.format(length),
+                'dynamic_viscosity', mu)
 
         # set physics
         phys = self.component('comp').create(PHYSICS, 'fem')
         # add laminar flow
-        lam = phys.create(LAMINAR_FLOW, 'lam')  # fluid props from materials
+        # fluid props from materials
+        lam = phys.create(LAMINAR_FLOW, 'lam', discretization=discretization)
         # create boundary conditions
         lam.inflow('on_boundary && near(x[0], 0.0, tol)',
                    value=dolfin.Constant(pin))
@@ -98,17 +169,50 @@ class PoiseuillePlane(fem.Model):
         lam.wall('on_boundary && near(x[1], 0) || near(x[1], {})'.format(
             height),
                   value=dolfin.Constant((0.0, 0.0)))
-        solver = self.study('std').create(IPCS, 'ipcs1', dt=dt)
+        if solver == NEWTON:
+            solver = self.study('std').create(NEWTON, 'newton1', **kwargs)
+        else:
+            solver = self.study('std').create(IPCS, 'ipcs1',
+                                              num_steps=num_steps, dt=dt,
+                                              adaptive=adaptive, **kwargs)
         solver.add_mesh(mesh)
         solver.add_physics(lam)
-        # solver.solve()
-        # results add solution from study to dataset
-        line = self.results('res').create(LINE_PLOT, 'lp1')
+        return solver
+
+    def cross_line(self):
+        r"""Define a line across the channel on which the solution
+        :math:`u_x` can be mapped (interpolated)."""
+        y = self._size[1].magnitude
+        return Q_(np.linspace(0, y, self._ne_y + 1), 'm')
 
     def exact_solution(self):
         r"""This method is used to validate the finite element model.
+
+        The steady flow between two parallel plates driven by the pressure
+        difference :math:`p_{in} - p_{out}` over the length :math:`L` is
+        directed along :math:`x`, with a no-slip condition on the plates at
+        :math:`y=0` and :math:`y=H`. The :math:`x`-component of the
+        Navier-Stokes equations reduces to
+
+        .. math:: \frac{\partial p}{\partial x} =
+            \mu\frac{\partial^2 u_x}{\partial y^2}
+
+        with a linear pressure, which gives
+
+        .. math:: u_x = \frac{p_{in} - p_{out}}{2\mu L}y\left(H - y\right),
+            ~p = p_{in} - \left(p_{in} - p_{out}\right)\frac{x}{L}
+
+        :return: The solution, i.e. :math:`(p, u_x)` respectively along the
+          channel and across the channel.
         """
-        pass
+        length = self._size[0].magnitude
+        x = self.axial_line().magnitude
+        y = self.cross_line().magnitude
+        p = self.analytic_solution(
+            np.stack([x, np.zeros_like(x)], axis=1))[1]
+        ux = self.analytic_solution(
+            np.stack([0.5 * length * np.ones_like(y), y], axis=1))[0][:, 0]
+        return Q_(p, 'Pa'), Q_(ux, 'm/s')
 
     def _generate_geometry(self, tag='r1'):
         r"""Generates a rectangle"""
@@ -116,7 +220,8 @@ class PoiseuillePlane(fem.Model):
         if 'geom' in [v.tag for v in self.component('comp').children()]:
             return self.component('comp').child_by_tag('geom')
         geom = self.component('comp').create(GEOMETRY, 'geom')
-        geom.create(RECTANGLE, tag=tag, a=self._size[0], b=self._size[1])
+        geom.create(RECTANGLE, tag=tag, a=self._size[0], b=self._size[1],
+                    char_length=self.char_length())
         geom.run()
         return geom
 
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+cfd.sweep.py
+November 14, 2019
+@author Francois Roy
+"""
+import csv
+import itertools
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils import *
+
+# the units of the parameters given as SI floats in the job specifications
+UNITS = {'size': 'm', 'mu': 'Pa*s', 'rho': 'kg/m**3', 'pin': 'Pa',
+         'pout': 'Pa', 't_end': 's'}
+# the parameters of the model constructors, the others go to ``compute``
+MODEL_PARAMETERS = ('size', 'mu', 'rho', 'pin', 'pout', 'ne_r', 'ne_z',
+                    'ne_x', 'ne_y')
+# the environment variables limiting the threads of the numerical libraries
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                    'MKL_NUM_THREADS')
+
+
+def models():
+    r"""Returns the model classes of the sweeps by name."""
+    from cfd.models_2d.axi_symmetric.poiseuille_axi import PoiseuilleAxi
+    from cfd.models_2d.poiseuille_plane import PoiseuillePlane
+    return {'PoiseuilleAxi': PoiseuilleAxi,
+            'PoiseuillePlane': PoiseuillePlane}
+
+
+def run_job(job):
+    r"""Runs a job of a sweep in the current process.
+
+    The generated files (geometry and mesh) and the outputs (checkpoints,
+    probes) of the job are written in the ``app`` and ``out``
+    subdirectories of the job directory, see :func:`utils.app_dir` and
+    :func:`utils.out_dir`, so that the concurrent jobs don't overwrite each
+    other. The summary of the job is also saved in ``summary.json``, and the
+    statistics of the solver in the ``out`` subdirectory.
+
+    :param job: The job specification, see :meth:`Sweep.jobs`.
+    :type job: dict
+    :return: The summary of the job (id, parameters, status, wall time,
+      number of degrees of freedom and extrema of the fields).
+    """
+    directory = Path(job['directory'])
+    os.environ['FEM_APP_DIR'] = str(directory.child('app'))
+    os.environ['FEM_OUT_DIR'] = str(directory.child('out'))
+    os.makedirs(os.environ['FEM_OUT_DIR'], exist_ok=True)
+    params = dict(job['params'])
+    summary = {'id': job['id'], 'model': job['model']}
+    summary.update({k: json.dumps(v) if isinstance(v, (list, tuple)) else v
+                    for k, v in params.items()})
+    wall_time = time.perf_counter()
+    try:
+        model_kwargs = {}
+        compute_kwargs = {}
+        for key, value in params.items():
+            if key in UNITS:
+                value = Q_(np.asarray(value, dtype=float), UNITS[key]) \
+                    if isinstance(value, (list, tuple)) \
+                    else Q_(float(value), UNITS[key])
+            if key in MODEL_PARAMETERS:
+                model_kwargs[key] = value
+            else:
+                compute_kwargs[key] = value
+        compute_kwargs.setdefault('stats_dir', os.environ['FEM_OUT_DIR'])
+        model = models()[job['model']](tag=job['id'], **model_kwargs)
+        u, p = model.compute(**compute_kwargs)
+        summary.update({
+            'status': 'done',
+            'dofs': u.function_space().dim() + p.function_space().dim(),
+            'u_max': u.vector().norm('linf'), 'p_min': p.vector().min(),
+            'p_max': p.vector().max()})
+    except Exception as e:
+        logging.error("{}: {}".format(job['id'], e))
+        summary.update({'status': 'failed', 'error': str(e)})
+    summary['wall_time'] = time.perf_counter() - wall_time
+    with open(directory.child('summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=float)
+    return summary
+
+
+def run_record(record):
+    r"""Runs a job of a :class:`JobQueue<cfd.job_queue.JobQueue>` submitted
+    by :meth:`Sweep.submit`, in the work directory of the job, see
+    :func:`run_job`.
+
+    :param record: The record of the job.
+    :type record: dict
+    :return: The summary of the job, with the path of its directory.
+    """
+    spec = record['spec']
+    summary = run_job({'id': record['id'], 'model': spec['model'],
+                       'params': spec['params'],
+                       'directory': record['directory']})
+    summary['directory'] = record['directory']
+    return summary
+
+
+class Sweep(object):
+    r"""Runs a model for each combination of a parameter grid in a pool of
+    worker processes.
+
+    The parameters are SI floats (or lists of floats, e.g. the size), see
+    :data:`UNITS`; the parameters of the model constructor (e.g. ``mu``,
+    ``ne_r``) and of its ``compute`` method (e.g. ``t_end``, ``num_steps``,
+    ``solver``) can both be swept. Each job runs in a worker process
+    started with the 'spawn' method (no state shared with the parent, e.g.
+    MPI or the compiled forms) in its own scratch directory
+    ``<directory>/<job id>``, see :func:`run_job`. The number of threads of
+    each worker is limited through the environment variables of
+    :data:`THREAD_VARIABLES`, so that ``max_workers * threads`` matches the
+    number of cores. The compiled forms and the meshes are shared by the
+    workers through the JIT cache and the mesh cache, see
+    :class:`JitCache<fem.jit_cache.JitCache>` and
+    :class:`MeshCache<fem.mesh_cache.MeshCache>`.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> sweep = Sweep('PoiseuilleAxi', {'mu': [8.5e-4, 1e-3],
+      ...                                 'pin': [4., 8.],
+      ...                                 'ne_r': [10, 20]},
+      ...               t_end=1., num_steps=100)
+      >>> sweep.run()  # 8 jobs
+      >>> sweep.to_csv('summary.csv')
+
+    :param model: The model name, see :func:`models`.
+    :type model: str
+    :param grid: The values of the swept parameters by name.
+    :type grid: dict
+    :param directory: The directory of the jobs, default to
+      ``out_dir()/sweep``.
+    :type directory: str
+    :param max_workers: The number of worker processes, default to the
+      number of cores divided by ``threads``.
+    :type max_workers: int
+    :param threads: The number of threads per worker, default = 1.
+    :type threads: int
+    :param kwargs: The fixed parameters of the jobs.
+    """
+    def __init__(self, model, grid, directory=None, max_workers=None,
+                 threads=1, **kwargs):
+        if model not in models():
+            raise ValueError(error(E_VALID, model, 'model'))
+        self._model = model
+        self._grid = dict(grid)
+        self._directory = Path(out_dir().child('sweep') if directory is None
+                               else directory)
+        self._threads = max(int(threads), 1)
+        if max_workers is None:
+            max_workers = max((os.cpu_count() or 1) // self._threads, 1)
+        self._max_workers = int(max_workers)
+        self._fixed = kwargs
+        self._summary = []
+
+    def jobs(self):
+        r"""Returns the specifications of the jobs (id, model, parameters and
+        directory), one per combination of the grid."""
+        keys = sorted(self._grid.keys())
+        jobs = []
+        for i, values in enumerate(itertools.product(
+                *[self._grid[key] for key in keys])):
+            params = dict(self._fixed)
+            params.update(zip(keys, values))
+            job_id = 'job_{:04d}'.format(i)
+            jobs.append({'id': job_id, 'model': self._model,
+                         'params': params,
+                         'directory': str(self._directory.child(job_id))})
+        return jobs
+
+    def run(self):
+        r"""Runs the jobs and collects their summaries.
+
+        :return: The summaries of the jobs, in the order of :meth:`jobs`.
+        """
+        jobs = self.jobs()
+        for job in jobs:
+            os.makedirs(job['directory'], exist_ok=True)
+        # the spawned workers inherit the environment of the parent
+        saved = {key: os.environ.get(key) for key in THREAD_VARIABLES}
+        os.environ.update({key: str(self._threads)
+                           for key in THREAD_VARIABLES})
+        context = multiprocessing.get_context('spawn')
+        summary = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self._max_workers,
+                                     mp_context=context) as executor:
+                futures = {executor.submit(run_job, job): job
+                           for job in jobs}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        summary[job['id']] = future.result()
+                    except Exception as e:  # the worker died
+                        summary[job['id']] = {'id': job['id'],
+                                              'model': job['model'],
+                                              'status': 'failed',
+                                              'error': str(e)}
+                    logging.info("{}: {}".format(
+                        job['id'], summary[job['id']]['status']))
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        self._summary = [summary[job['id']] for job in jobs]
+        self.to_csv(self._directory.child('summary.csv'))
+        return self._summary
+
+    def submit(self, queue):
+        r"""Adds the jobs to a durable queue instead of running them, see
+        :class:`JobQueue<cfd.job_queue.JobQueue>` and :func:`run_record`.
+
+        :param queue: The job queue.
+        :type queue: cfd.job_queue.JobQueue
+        :return: The ids of the jobs.
+        """
+        return [queue.submit({'model': job['model'], 'params': job['params']})
+                for job in self.jobs()]
+
+    def summary(self):
+        r"""Returns the summaries of the jobs of the last run."""
+        return self._summary
+
+    def to_csv(self, filename):
+        r"""Saves the summaries of the jobs, one row per job.
+
+        :param filename: The CSV file name.
+        :type filename: str
+        """
+        columns = []
+        for record in self._summary:
+            for k in record.keys():
+                if k not in columns:
+                    columns.append(k)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self._summary)
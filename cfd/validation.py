@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+cfd.validation.py
+November 14, 2019
+@author Francois Roy
+"""
+import json
+import time
+import dolfin
+from utils import *
+
+# the error norms of the velocity and the pressure
+NORMS = ('u_l2', 'u_h1', 'p_l2')
+
+
+def convergence_rate(x, errors):
+    r"""Returns the slope of the least squares fit of
+    :math:`\log e = a\log x + b`, e.g. the convergence rate with respect to
+    the mesh size.
+
+    :param x: The mesh sizes, or the numbers of degrees of freedom.
+    :type x: array-like
+    :param errors: The errors.
+    :type errors: array-like
+    :return: The slope, NaN if less than two positive errors.
+    """
+    x = np.asarray(x, dtype=float)
+    errors = np.asarray(errors, dtype=float)
+    mask = (x > 0.) & (errors > 0.)
+    if np.count_nonzero(mask) < 2:
+        return np.nan
+    return np.polyfit(np.log(x[mask]), np.log(errors[mask]), 1)[0]
+
+
+def errors(model, u, p, is_axi=False, degree_rise=2):
+    r"""Returns the relative errors of the finite element solution with
+    respect to the analytic solution of the model.
+
+    The analytic solution is interpolated on spaces of degree
+    ``degree_rise`` higher than the spaces of the solution (see
+    :func:`interpolate_analytic`) and the norms are integrated with the
+    weight :math:`r` in axisymmetric coordinates, the :math:`H^1` norm of
+    the velocity then includes the hoop term :math:`u_r^2/r^2`.
+
+    :param model: The model, with an ``analytic_solution(x)`` method
+      returning the velocity and the pressure at the points ``x``.
+    :param u: The velocity.
+    :type u: dolfin.Function
+    :param p: The pressure.
+    :type p: dolfin.Function
+    :param is_axi: Axisymmetric coordinates, default = False.
+    :type is_axi: bool
+    :param degree_rise: The degree rise of the analytic solution,
+      default = 2.
+    :type degree_rise: int
+    :return: The relative errors 'u_l2', 'u_h1' and 'p_l2'.
+    """
+    mesh = u.function_space().mesh()
+    v_space = dolfin.VectorFunctionSpace(
+        mesh, 'P', u.ufl_element().degree() + degree_rise)
+    q_space = dolfin.FunctionSpace(
+        mesh, 'P', p.ufl_element().degree() + degree_rise)
+    u_ex = interpolate_analytic(model, v_space, 'u')
+    p_ex = interpolate_analytic(model, q_space, 'p')
+    dx = dolfin.dx
+    if is_axi:
+        r = dolfin.SpatialCoordinate(mesh)[0]
+    else:
+        r = dolfin.Constant(1.)
+
+    def l2(f):
+        return np.sqrt(abs(dolfin.assemble(dolfin.inner(f, f) * r * dx)))
+
+    def h1(f):
+        semi = dolfin.inner(dolfin.grad(f), dolfin.grad(f)) * r * dx
+        if is_axi:
+            semi += f[0]**2 / r * dx
+        return np.sqrt(l2(f)**2 + abs(dolfin.assemble(semi)))
+
+    def relative(error, norm):
+        return error / norm if norm > 0. else error
+
+    return {'u_l2': relative(l2(u - u_ex), l2(u_ex)),
+            'u_h1': relative(h1(u - u_ex), h1(u_ex)),
+            'p_l2': relative(l2(p - p_ex), l2(p_ex))}
+
+
+def interpolate_analytic(model, space, field):
+    r"""Interpolates the analytic solution of the model on a Lagrange space,
+    evaluated at once at the coordinates of the degrees of freedom.
+
+    :param model: The model, see :func:`errors`.
+    :param space: The scalar (pressure) or vector (velocity) space.
+    :type space: dolfin.FunctionSpace
+    :param field: 'u' or 'p'.
+    :type field: str
+    :return: The interpolated field.
+    """
+    f = dolfin.Function(space)
+    values = np.zeros(f.vector().local_size())
+    gdim = space.mesh().geometry().dim()
+    x = space.tabulate_dof_coordinates().reshape(-1, gdim)[:len(values)]
+    u, p = model.analytic_solution(x)
+    if field == 'p':
+        values[:] = p
+    else:
+        offset = space.dofmap().ownership_range()[0]
+        for j in range(space.num_sub_spaces()):
+            dofs = space.sub(j).dofmap().dofs() - offset
+            values[dofs] = u[dofs, j]
+    f.vector().set_local(values)
+    f.vector().apply('insert')
+    return f
+
+
+class ConvergenceStudy(object):
+    r"""Solves a model with an analytic solution on a sequence of refined
+    meshes and reports the errors against the mesh size, the number of
+    degrees of freedom and the wall time, e.g. to pick the cheapest mesh and
+    discretization meeting an accuracy target.
+
+    Each level creates a new model with the numbers of elements ``ne``
+    multiplied by the refinement factor of the level, e.g. ``ne_r`` and
+    ``ne_z`` for :class:`PoiseuilleAxi
+    <cfd.models_2d.axi_symmetric.poiseuille_axi.PoiseuilleAxi>`, and solves
+    it with :meth:`compute`, by default with the steady Newton solver. The
+    wall time includes the meshing and the solve.
+
+    Note that the P2/P1 solution of the Poiseuille flows is exact (the
+    velocity is quadratic and the pressure linear), its errors are at the
+    level of the solver tolerance; the convergence rates are meaningful for
+    the P1/P1 discretization.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> study = ConvergenceStudy(PoiseuilleAxi, {'ne_r': 4, 'ne_z': 20},
+      ...                          levels=(1, 2, 4),
+      ...                          discretizations=(P1P1, P2P1))
+      >>> study.run()
+      >>> print(study.report())
+      >>> study.rates()[P1P1]['h']['u_l2']  # ~2
+      >>> study.cheapest(1e-3)  # the fastest record with u_l2 <= 1e-3
+
+    :param model_class: The model class.
+    :type model_class: type
+    :param ne: The numbers of elements of the coarsest level by name.
+    :type ne: dict
+    :param levels: The refinement factors, default = (1, 2, 4, 8).
+    :type levels: tuple
+    :param discretizations: The discretizations of the laminar flow,
+      default = (P2P1,).
+    :type discretizations: tuple
+    :param solver: The solver type, default = NEWTON.
+    :type solver: str
+    :param model_kwargs: Extra arguments of the model, e.g. ``pin``.
+    :type model_kwargs: dict
+    :param kwargs: Extra arguments of the ``compute`` method of the model.
+    """
+    def __init__(self, model_class, ne, levels=(1, 2, 4, 8),
+                 discretizations=(P2P1,), solver=NEWTON, model_kwargs=None,
+                 **kwargs):
+        self._model_class = model_class
+        self._ne = dict(ne)
+        self._levels = tuple(levels)
+        self._discretizations = tuple(discretizations)
+        self._solver = solver
+        self._model_kwargs = {} if model_kwargs is None else dict(
+            model_kwargs)
+        self._kwargs = kwargs
+        self._records = []
+
+    def cheapest(self, tol, norm='u_l2'):
+        r"""Returns the record of the smallest wall time meeting the accuracy
+        target.
+
+        :param tol: The relative error target.
+        :type tol: float
+        :param norm: The error norm, 'u_l2' (default), 'u_h1' or 'p_l2'.
+        :type norm: str
+        :return: The record, None if no record meets the target.
+        """
+        records = [rec for rec in self._records if rec[norm] <= tol]
+        if not records:
+            return None
+        return min(records, key=lambda rec: rec['wall_time'])
+
+    def rates(self):
+        r"""Returns the convergence rates of the errors with respect to the
+        mesh size ('h') and the number of degrees of freedom ('dofs') by
+        discretization, see :func:`convergence_rate`."""
+        rates = {}
+        for discretization in self._discretizations:
+            records = [rec for rec in self._records
+                       if rec['discretization'] == discretization]
+            rates[discretization] = {
+                key: {norm: convergence_rate([rec[key] for rec in records],
+                                             [rec[norm] for rec in records])
+                      for norm in NORMS}
+                for key in ('h', 'dofs')}
+        return rates
+
+    def records(self):
+        r"""Returns the records (discretization, level, numbers of elements,
+        mesh size, degrees of freedom, wall time and errors) of the
+        levels."""
+        return self._records
+
+    def report(self):
+        r"""Returns the table of the records and the convergence rates."""
+        header = ('{:>6} {:>5} {:>10} {:>8} {:>10} {:>10} {:>10} '
+                  '{:>10}'.format('disc', 'level', 'h', 'dofs', 'time',
+                                  *NORMS))
+        lines = [header]
+        for rec in self._records:
+            lines.append(
+                '{:>6} {:>5} {:>10.3e} {:>8d} {:>10.3f} {:>10.3e} {:>10.3e} '
+                '{:>10.3e}'.format(rec['discretization'], rec['level'],
+                                   rec['h'], rec['dofs'], rec['wall_time'],
+                                   *[rec[norm] for norm in NORMS]))
+        for discretization, rates in self.rates().items():
+            for key, values in rates.items():
+                lines.append('{} rates ({}): {}'.format(
+                    discretization, key, ', '.join(
+                        '{} {:.2f}'.format(norm, values[norm])
+                        for norm in NORMS)))
+        return '\n'.join(lines)
+
+    def run(self):
+        r"""Solves the levels.
+
+        :return: The records, see :meth:`records`.
+        """
+        self._records = []
+        for discretization in self._discretizations:
+            for level in self._levels:
+                ne = {key: int(round(value * level))
+                      for key, value in self._ne.items()}
+                wall_time = time.perf_counter()
+                model = self._model_class(
+                    tag='{}_{}'.format(discretization, level), **ne,
+                    **self._model_kwargs)
+                u, p = model.compute(solver=self._solver,
+                                     discretization=discretization,
+                                     **self._kwargs)
+                wall_time = time.perf_counter() - wall_time
+                mesh = u.function_space().mesh()
+                record = {'discretization': discretization, 'level': level,
+                          'h': dolfin.MPI.max(mesh.mpi_comm(), mesh.hmax()),
+                          'dofs': (u.function_space().dim() +
+                                   p.function_space().dim()),
+                          'wall_time': wall_time}
+                record.update(ne)
+                record.update(errors(model, u, p,
+                                     model.component('comp').is_axi))
+                logging.info("{} level {}: {}".format(
+                    discretization, level, record))
+                self._records.append(record)
+        return self._records
+
+    def save(self, filename):
+        r"""Saves the records and the convergence rates in a JSON file. In
+        parallel, the process of rank 0 writes the file.
+
+        :param filename: The file name.
+        :type filename: str
+        """
+        if dolfin.MPI.rank(dolfin.MPI.comm_world) != 0:
+            return
+        directory = os.path.dirname(os.path.abspath(str(filename)))
+        os.makedirs(directory, exist_ok=True)
+        with open(filename, 'w') as f:
+            json.dump({'records': self._records, 'rates': self.rates()}, f,
+                      indent=2, default=float)
@@ -6,8 +6,10 @@ November 14, 2019
 """
 from .component import *
 from .geometry import *
+from .jit_cache import *
 from .materials import *
 from .mesh import *
+from .mesh_cache import *
 from .physics import *
 from .study import *
 from .results import *
@@ -16,8 +18,14 @@ from .mesh_feature import *
 from .physics_feature import *
 from .results_feature import *
 from .solver_feature import *
+from .solver_stats import *
+from .subdomain_cache import *
 from fem.geom_feats.rectangle import *
 from fem.physics_feats.laminar_flow import *
 from fem.solver_feats.ipcs import *
+from fem.solver_feats.newton import *
 from fem.results_feats.line_plot import *
+from fem.results_feats.probe import *
+from fem.results_feats.sampling import *
+from fem.results_feats.time_series import *
 from .model import *
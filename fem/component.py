@@ -34,11 +34,10 @@ class Component(Node):
         return self._is_axi
 
     def boundaries(self, tag=None):
-        r""""""
+        r"""Returns the boundary markers of the mesh, see
+        :meth:`fem.mesh.Mesh.boundaries`."""
         self.check_mesh()
-        mesh = self.mesh(tag=tag)
-        mvc_bnd = mesh.mvc_bnd()
-        return dolfin.cpp.mesh.MeshFunctionSizet(mesh, mvc_bnd)
+        return self.mesh(tag=tag).boundaries()
 
     def check_mesh(self):
         r"""Check that a mesh exist"""
@@ -46,11 +45,10 @@ class Component(Node):
             raise (error(E_MESH))
 
     def subdomains(self, tag=None):
-        r""""""
+        r"""Returns the domain markers of the mesh, see
+        :meth:`fem.mesh.Mesh.subdomains`."""
         self.check_mesh()
-        mesh = self.mesh(tag=tag)
-        mvc_dom = mesh.mvc_dom()
-        return dolfin.cpp.mesh.MeshFunctionSizet(mesh, mvc_dom)
+        return self.mesh(tag=tag).subdomains()
 
     def geometry(self, tag=None):
         r"""Returns the geometry of given tag. If tag is None, returns the
@@ -4,8 +4,11 @@ fem.geometry.py
 November 14, 2019
 @author Francois Roy
 """
+import hashlib
+import json
 from importlib import import_module
 import pygmsh
+import dolfin
 from collections import namedtuple
 from utils import *
 from utils.node import *
@@ -24,6 +27,7 @@ class Geometry(pygmsh.opencascade.Geometry, Node):
         Node.__init__(self, tag, parent)
         self._type_info = GEOMETRY
         self._valid_children_type = [GEOMETRY_FEATURE]
+        self._features_signature = None
         if parent is not None:
             # automatically add class instance to parent if exists
             parent.add_child(self)
@@ -70,10 +74,11 @@ class Geometry(pygmsh.opencascade.Geometry, Node):
         return True
 
     def export(self, filename=None):
-        r""""""
+        r"""Save the geometry, the file is written by the process of rank 0
+        only."""
         name = GEOMETRY
         if filename is None:
-            geo_filename = APP_DIR.child(name + '.geo')
+            geo_filename = app_dir().child(name + '.geo')
         else:
             # check if path exist
             directory = os.path.split(filename)[0]
@@ -82,7 +87,10 @@ class Geometry(pygmsh.opencascade.Geometry, Node):
                 if not os.path.isdir(directory):
                     os.makedirs(directory)
             geo_filename = filename
-        pygmsh.generate_mesh(self, geo_filename=geo_filename)
+        comm = dolfin.MPI.comm_world
+        if dolfin.MPI.rank(comm) == 0:
+            pygmsh.generate_mesh(self, geo_filename=geo_filename)
+        dolfin.MPI.barrier(comm)
 
     def gmsh_code(self):
         r"""Returns GMSH_CODE."""
@@ -109,10 +117,33 @@ class Geometry(pygmsh.opencascade.Geometry, Node):
         child._parent = None
         return True
 
-    def run(self):
-        r"""generate the gmsh code for the geometry"""
+    def run(self, force=False):
+        r"""generate the gmsh code for the geometry, if the features have
+        changed since the last generation, see :meth:`signature`.
+
+        :param force: Generate the gmsh code even if the features have not
+          changed, default = False.
+        :type force: bool
+        :return: True if the gmsh code has been generated.
+        """
+        signature = self.signature()
+        if signature == self._features_signature and not force:
+            return False
         for c in self._children:
             c.run()
+        self._features_signature = signature
+        return True
+
+    def signature(self):
+        r"""Returns the hash of the parameters of the features, see
+        :meth:`fem.geometry_feature.GeometryFeature.parameters`.
+
+        The gmsh code can't be compared directly since the ids of the gmsh
+        entities change at each generation.
+        """
+        data = json.dumps([c.parameters() for c in self._children],
+                          sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
 
     def set_data(self, column, value):
         pass
@@ -86,6 +86,13 @@ class GeometryFeature(Node):
         r"""Generates the pygmsh code for the core."""
         pass
 
+    def parameters(self):
+        r"""Returns the parameters of the feature (its attributes and its
+        origin), which define its gmsh code."""
+        kv = self.attributes()
+        kv['origin'] = [str(x) for x in self._origin]
+        return kv
+
     def get_type(self):
         r"""Get the geometry feature type."""
         return self._geom_type
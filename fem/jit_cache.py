@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+fem.jit_cache.py
+November 14, 2019
+@author Francois Roy
+"""
+import dolfin
+from utils import *
+
+# default directory of the compiled forms
+JIT_DIR = APP_DIR.child('jit')
+
+
+class JitCache(object):
+    r"""Persistent cache of the compiled forms shared by the processes.
+
+    The forms are generated by FFC and compiled in shared libraries by
+    dijitso in the directory given by the ``DIJITSO_CACHE_DIR`` environment
+    variable, set here for the current process and inherited by its worker
+    processes. dijitso compiles each library in a temporary directory and
+    moves it in place atomically, so concurrent processes can use the same
+    directory, and a form is compiled once for all the processes and all
+    the runs.
+
+    The forms of a solver can be compiled ahead of the solve, e.g.
+    ``python run.py --precompile``, so that the batch jobs start solving
+    immediately.
+
+    The hits and misses are approximate: dijitso doesn't report its
+    lookups, so a form counts as a miss when the number of libraries of the
+    cache directory changes during its compilation. When other processes
+    compile in the same directory at the same time (e.g. the workers of a
+    sweep), their libraries can turn a hit into a miss.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> cache = JitCache()
+      >>> cache.precompile(solver.forms())
+      >>> cache.summary()
+      {'directory': '.../.fem/jit', 'hits': 9, 'misses': 1,
+       'new_libraries': 1}
+
+    :param directory: The cache directory, default to the
+      ``DIJITSO_CACHE_DIR`` environment variable if defined, else
+      :data:`JIT_DIR`.
+    :type directory: str
+    """
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.environ.get('DIJITSO_CACHE_DIR', JIT_DIR)
+        self._directory = os.path.abspath(str(directory))
+        os.makedirs(self._directory, exist_ok=True)
+        os.environ['DIJITSO_CACHE_DIR'] = self._directory
+        self._hits = 0
+        self._misses = 0
+        self._num_libraries = self.num_libraries()
+
+    def compile(self, form):
+        r"""Compiles a form, or loads it from the cache.
+
+        The form is a hit if no library has been added to the cache
+        directory during the compilation, i.e. if the form was already
+        compiled by this process or by any previous process; the libraries
+        added meanwhile by other processes count as misses, see the note on
+        the approximate counts above.
+
+        :param form: The UFL form.
+        :return: True if the form was in the cache.
+        """
+        num_libraries = self.num_libraries()
+        dolfin.Form(form)
+        hit = self.num_libraries() == num_libraries
+        if hit:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return hit
+
+    def directory(self):
+        r"""Returns the cache directory."""
+        return self._directory
+
+    def hits(self):
+        r"""Returns the (approximate) number of compiled forms found in the
+        cache."""
+        return self._hits
+
+    def misses(self):
+        r"""Returns the (approximate) number of forms compiled by
+        :meth:`compile`."""
+        return self._misses
+
+    def num_libraries(self):
+        r"""Returns the number of compiled libraries in the cache."""
+        lib_dir = os.path.join(self._directory, 'lib')
+        if not os.path.isdir(lib_dir):
+            return 0
+        return len(os.listdir(lib_dir))
+
+    def precompile(self, forms):
+        r"""Compiles the forms, see :meth:`compile`.
+
+        :param forms: The forms by name, e.g.
+          :meth:`forms<fem.solver_feature.SolverFeature.forms>`.
+        :type forms: dict
+        :return: The names of the forms that were not in the cache.
+        """
+        misses = []
+        for name, form in forms.items():
+            if not self.compile(form):
+                misses.append(name)
+            logging.debug("{}: {}".format(
+                name, 'hit' if name not in misses else 'miss'))
+        return misses
+
+    def summary(self):
+        r"""Returns the approximate hits and misses of :meth:`compile`, and
+        the number of libraries added to the cache since the creation of the
+        instance (by :meth:`compile`, by the solvers or by other processes).
+
+        :return: A dictionary.
+        """
+        return {'directory': self._directory, 'hits': self._hits,
+                'misses': self._misses,
+                'new_libraries': self.num_libraries() - self._num_libraries}
@@ -6,18 +6,31 @@ November 14, 2019
 """
 import dolfin
 from utils import *
-from abc import ABC
 from utils.node import *
+from fem.subdomain_cache import LazySubDomain
 
 
 class Materials(Node):
-    r"""
+    r"""The materials of a component. Each material is defined on a
+    selection of the domain (a C++ expression) with its properties, e.g.
+
+    .. code-block:: python
+
+      >>> mat = component.create(MATERIALS, 'mat')
+      >>> mat.add('water', 'x[0] <= 0.5 + tol', 'density', 996.5)
+      >>> mat.add('water', 'x[0] <= 0.5 + tol', 'dynamic_viscosity', 8.5e-4)
+      >>> rho = mat.density()  # DG0 function
+
+    The properties are piecewise constant (DG0) functions, see
+    :meth:`property_function`.
     """
     def __init__(self, tag, parent=None):
         super(Materials, self).__init__(tag, parent)
         self._type_info = MATERIALS
         self._valid_children_type = []
         self._dms = {}
+        self._revision = 0
+        self._properties = {}
         if parent is not None:
             # automatically add class instance to parent if exists
             parent.add_child(self)
@@ -26,9 +39,10 @@ class Materials(Node):
         r"""Add material"""
         if tag not in self._dms.keys():
             self._dms[tag] = {
-                'subdomain': dolfin.CompiledSubDomain(selection, tol=1e-14)
+                'subdomain': LazySubDomain(selection, tol=1e-14)
             }
         self._dms[tag][prop] = expression
+        self._revision += 1
 
     def component(self):
         r"""Check that the parent is a component."""
@@ -44,63 +58,67 @@ class Materials(Node):
         pass
 
     def density(self):
-        r""""""
-        comp = self.component()
-        subdomains = comp.subdomains()
-        subdomains.set_all(0)
-        ind = 1
-        subd = []
-        densities = []
-        for k, v in self._dms.items():
-            self._dms[k]['subdomain'].mark(subdomains, ind)
-            subd.append(self._dms[k]['subdomain'])
-            if 'density' in self._dms[k].keys():
-                densities.append(self._dms[k]['density'])
-            else:
-                raise ValueError(error(
-                    'DENSITY NOT DEFINED FOR MATERIAL {}'.format(k)))
-            ind += 1
-        return self.Property(subdomains=subd, prop=densities, shape=1)
+        r"""Returns the density, see :meth:`property_function`."""
+        return self.property_function('density')
 
     def dynamic_viscosity(self):
-        r""""""
+        r"""Returns the dynamic viscosity, see :meth:`property_function`."""
+        return self.property_function('dynamic_viscosity')
+
+    def property_function(self, prop):
+        r"""Returns a material property as a piecewise constant (DG0)
+        function.
+
+        The cells are marked with the index of their material (in the order
+        of :meth:`add`, the last matching selection wins), and the values of
+        the cells are set at once by indexing the values of the materials
+        with the markers. The function is cached until the mesh is generated
+        again; when the materials change on the same mesh, the values of the
+        cached function are updated in place, so that the forms using it
+        remain valid. Every cell must be in the selection of a material, the
+        unassigned cells are counted over all the processes.
+
+        :param prop: The property name, e.g. 'density'.
+        :type prop: str
+        :return: The DG0 function of the property.
+        """
         comp = self.component()
+        mesh = comp.mesh()
+        # the markers first, they generate the mesh again if needed
         subdomains = comp.subdomains()
+        revision = mesh.revision()
+        cached = self._properties.get(prop)
+        if cached is not None and cached[0] == (revision, self._revision):
+            return cached[2]
+        values = np.zeros(len(self._dms) + 1)
         subdomains.set_all(0)
-        ind = 1
-        subd = []
-        dynamic_viscosity = []
-        for k, v in self._dms.items():
-            self._dms[k]['subdomain'].mark(subdomains, ind)
-            subd.append(self._dms[k]['subdomain'])
-            if 'dynamic_viscosity' in self._dms[k].keys():
-                dynamic_viscosity.append(self._dms[k]['dynamic_viscosity'])
-            else:
-                raise ValueError(error(
-                    'DYNAMIC VISCOSITY NOT DEFINED FOR MATERIAL {}'.format(k)))
-            ind += 1
-        return self.Property(subdomains=subd, prop=dynamic_viscosity, shape=1)
+        for ind, (k, v) in enumerate(self._dms.items(), 1):
+            if prop not in v.keys():
+                raise ValueError(error(E_PROPERTY, prop, k))
+            v['subdomain'].mark(subdomains, ind)
+            values[ind] = v[prop]
+        # the owned cells of all the processes, so that they all raise
+        tdim = mesh.topology().dim()
+        owned_cells = subdomains.array()[:mesh.topology().ghost_offset(tdim)]
+        num_unassigned = int(dolfin.MPI.sum(
+            mesh.mpi_comm(), float(np.count_nonzero(owned_cells == 0))))
+        if num_unassigned > 0:
+            raise ValueError(error(E_MATERIAL, num_unassigned, prop))
+        if cached is not None and cached[1] == revision:
+            func = cached[2]
+        else:
+            func = dolfin.Function(dolfin.FunctionSpace(mesh, 'DG', 0))
+            func.rename(prop, prop)
+        # the DG0 dof of each local cell
+        dofs = func.function_space().dofmap().entity_dofs(
+            mesh, mesh.topology().dim())
+        array = func.vector().get_local()
+        owned = dofs < len(array)
+        array[dofs[owned]] = values[subdomains.array()[owned]]
+        func.vector().set_local(array)
+        func.vector().apply('insert')
+        self._properties[prop] = ((revision, self._revision), revision, func)
+        return func
 
     def set_data(self, column, value):
         pass
-
-    class Property(dolfin.UserExpression, ABC):
-        r"""An Expression is a function (field) that can appear as a
-        coefficient in a form.
-
-        This version of the evaluation function has an
-        additional cell argument which we can use to check on which cell we are
-        currently evaluating the function.
-        """
-        def __init__(self, **kwargs):
-            self.subdomains = kwargs["subdomains"]
-            self.prop = kwargs["prop"]
-            self.shape = kwargs["shape"]
-
-        def eval_cell(self, values, x, cell):
-            for i in range(len(self.prop)):
-                if self.subdomains[cell.index] == i:
-                    values[0] = self.prop[i]
-
-        def value_shape(self):
-            return self.shape,
@@ -4,24 +4,130 @@ fem.mesh.py
 November 14, 2019
 @author Francois Roy
 """
+import hashlib
+import json
 import pygmsh
 import meshio
 import dolfin
 from utils import *
 from utils.node import *
+from fem.mesh_cache import MeshCache
+
+# the meshio cell and facet types, and the dolfin cell type by dimension
+CELL_TYPES = {2: ('triangle', 'line', 'triangle'),
+              3: ('tetra', 'triangle', 'tetrahedron')}
+# the C++ functions filling a mesh and a mesh value collection from arrays,
+# compiled once (and cached by dijitso) on the first use
+BUILDER_CODE = """
+#include <pybind11/pybind11.h>
+#include <pybind11/eigen.h>
+#include <dolfin/mesh/CellType.h>
+#include <dolfin/mesh/Mesh.h>
+#include <dolfin/mesh/MeshEditor.h>
+#include <dolfin/mesh/MeshFunction.h>
+#include <dolfin/mesh/MeshValueCollection.h>
+
+using Points = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic,
+                             Eigen::RowMajor>;
+using Cells = Eigen::Matrix<std::size_t, Eigen::Dynamic, Eigen::Dynamic,
+                            Eigen::RowMajor>;
+
+void build_mesh(dolfin::Mesh& mesh, const std::string& cell_type,
+                const Eigen::Ref<const Points> points,
+                const Eigen::Ref<const Cells> cells)
+{
+  const std::size_t gdim = points.cols();
+  dolfin::MeshEditor editor;
+  editor.open(mesh, dolfin::CellType::string2type(cell_type), gdim, gdim);
+  editor.init_vertices(points.rows());
+  editor.init_cells(cells.rows());
+  std::vector<double> x(gdim);
+  for (Eigen::Index i = 0; i < points.rows(); ++i)
+  {
+    for (std::size_t j = 0; j < gdim; ++j)
+      x[j] = points(i, j);
+    editor.add_vertex(i, x);
+  }
+  std::vector<std::size_t> v(cells.cols());
+  for (Eigen::Index i = 0; i < cells.rows(); ++i)
+  {
+    for (Eigen::Index j = 0; j < cells.cols(); ++j)
+      v[j] = cells(i, j);
+    editor.add_cell(i, v);
+  }
+  editor.close();
+}
+
+void assign_collection(dolfin::MeshValueCollection<std::size_t>& mvc,
+                       const dolfin::MeshFunction<std::size_t>& markers)
+{
+  mvc = markers;
+}
+
+PYBIND11_MODULE(SIGNATURE, m)
+{
+  m.def("build_mesh", &build_mesh);
+  m.def("assign_collection", &assign_collection);
+}
+"""
+_BUILDER = []
+
+
+def mesh_builder():
+    r"""Returns the compiled module of :data:`BUILDER_CODE`, compiled once
+    per process."""
+    if not _BUILDER:
+        _BUILDER.append(dolfin.compile_cpp_code(BUILDER_CODE))
+    return _BUILDER[0]
 
 
 class Mesh(dolfin.Mesh, Node):
     r"""Use pygmsh to import mesh in dolfin.
+
+    The mesh is generated lazily: :meth:`run` calls gmsh only if the gmsh
+    code of the geometry or the mesh options have changed since the last
+    generation, see :meth:`signature`. The boundary and domain markers are
+    built once per generation.
+
+    In serial, the dolfin mesh and the markers are built in memory from the
+    arrays of the gmsh mesh, see :meth:`from_meshio`, and the XDMF files
+    are written only if ``xdmf`` is True. In parallel, the mesh is written
+    in XDMF files by the process of rank 0 and each process reads its
+    partition, see :meth:`export` and :meth:`import_mesh`.
+
+    gmsh is called only if the mesh is not in the on-disk mesh cache shared
+    by the processes, see :class:`MeshCache<fem.mesh_cache.MeshCache>`.
+
+    :param tag: The mesh tag.
+    :type tag: str
+    :param geom_tag: The tag of the geometry to be meshed.
+    :type geom_tag: str
+    :param options: Extra arguments of :func:`pygmsh.generate_mesh`, e.g.
+      ``{'extra_gmsh_arguments': ['-clscale', '0.5']}``.
+    :type options: dict
+    :param xdmf: Write the XDMF files of the mesh and of the markers at each
+      generation in serial (e.g. for ParaView), default = False.
+    :type xdmf: bool
+    :param cache: The mesh cache, True for the default cache or None to
+      always call gmsh, default = True.
+    :type cache: bool or fem.mesh_cache.MeshCache
     """
-    def __init__(self, tag, parent=None, geom_tag=None):
+    def __init__(self, tag, parent=None, geom_tag=None, options=None,
+                 xdmf=False, cache=True):
         dolfin.Mesh.__init__(self)  # explicit calls
         Node.__init__(self, tag, parent)
         self._type_info = MESH
         self._valid_children_type = []
         self._geom_tag = geom_tag
+        self._options = {} if options is None else dict(options)
+        self._xdmf = xdmf
+        self._cache = cache
         self._mvc_bnd = None
         self._mvc_dom = None
+        self._boundaries = None
+        self._subdomains = None
+        self._signature = None
+        self._revision = 0
         if parent is not None:
             # automatically add class instance to parent if exists
             parent.add_child(self)
@@ -35,26 +141,88 @@ class Mesh(dolfin.Mesh, Node):
         # returns None if it doesn't exist
         self._geom_tag = self._parent.child_by_type(GEOMETRY, value).tag
 
+    def boundaries(self):
+        r"""Returns a copy of the boundary markers, the markers are built
+        once per mesh generation."""
+        self.run()
+        if self._boundaries is None:
+            self._boundaries = dolfin.cpp.mesh.MeshFunctionSizet(
+                self, self._mvc_bnd)
+        return self._copy(self._boundaries)
+
+    def from_meshio(self, msh):
+        r"""Builds the dolfin mesh and the markers from the arrays of a
+        meshio mesh, without writing files.
+
+        The vertices and the cells are added at once by a compiled
+        :class:`dolfin.MeshEditor` loop (see :func:`mesh_builder`) in the
+        order of the meshio arrays, so that the domain markers are the
+        physical tags of the cells. The facets of the boundary markers are
+        matched at once with the mesh facets from their sorted vertices, see
+        :meth:`_match`. The unmarked entities are set to 0.
+
+        :param msh: The mesh generated by gmsh, see :meth:`load_geometry`.
+        :type msh: meshio.Mesh
+        """
+        dim = self._parent.dim
+        cell_type, facet_type, dolfin_type = CELL_TYPES[dim]
+        points = np.ascontiguousarray(msh.points[:, :dim], dtype=np.float64)
+        cells = np.ascontiguousarray(msh.cells[cell_type], dtype=np.uintp)
+        mesh_builder().build_mesh(self, dolfin_type, points, cells)
+
+        subdomains = dolfin.cpp.mesh.MeshFunctionSizet(self, dim, 0)
+        subdomains.array()[:] = msh.cell_data[cell_type]['gmsh:physical']
+        boundaries = dolfin.cpp.mesh.MeshFunctionSizet(self, dim - 1, 0)
+        if facet_type in msh.cells:
+            self.init(dim - 1, 0)
+            facets = self.topology()(dim - 1, 0)().reshape(-1, dim)
+            index = self._match(facets, msh.cells[facet_type])
+            found = index >= 0
+            boundaries.array()[index[found]] = msh.cell_data[facet_type][
+                'gmsh:physical'][found]
+        self._subdomains = subdomains
+        self._boundaries = boundaries
+
     def data(self, column):
         pass
 
     def export(self, filename=None):
-        r"""Save mesh in xdmf format."""
+        r"""Save mesh in xdmf format.
+
+        The mesh is generated and written by the process of rank 0 only, the
+        other processes wait until the files are written.
+        """
+        comm = self.mpi_comm()
+        if dolfin.MPI.rank(comm) == 0:
+            self._export(filename)
+        dolfin.MPI.barrier(comm)
+
+    def _export(self, filename=None):
+        r"""Generate the mesh with gmsh and save it in xdmf format."""
+        directory, name = self._xdmf_path(filename)
+        self._write_xdmf(self.load_geometry(), directory, name)
+
+    def _xdmf_path(self, filename=None):
+        r"""Returns the directory and the name of the XDMF files."""
         name = MESH
         if filename is None:
-            directory = APP_DIR
+            directory = app_dir()
             # check if directory exist and make it if it doesn't
             if not os.path.isdir(directory):
                 os.makedirs(directory)
         else:
             # check if path exist
             directory, name = os.path.split(filename)
+            directory = Path(directory)
             name = name.split(".")[0]  # remove extension if exists
             if not os.path.exists(filename):
                 # check if directory exist and make it if it doesn't
                 if not os.path.isdir(directory):
                     os.makedirs(directory)
-        msh = self.load_geometry()
+        return directory, name
+
+    def _write_xdmf(self, msh, directory, name):
+        r"""Writes the mesh and the markers in xdmf format."""
         if self._parent.dim == 2:
             msh.points = msh.points[:, :2]  # remove z-values to force 2d
         meshio.write(directory.child(name + XDMF), meshio.Mesh(
@@ -75,44 +243,108 @@ class Mesh(dolfin.Mesh, Node):
             }
         ))
 
-    def run(self):
-        r"""save mesh in xdmf format and load in dolfin"""
-        self.export()  # in APP directory
-        self.import_mesh()  # from APP directory
+    def options(self):
+        r"""Returns the extra arguments of :func:`pygmsh.generate_mesh`."""
+        return self._options
+
+    def revision(self):
+        r"""Returns the number of generations of the mesh, e.g. to
+        invalidate the objects built on a previous mesh."""
+        return self._revision
+
+    def run(self, force=False):
+        r"""save mesh in xdmf format and load in dolfin, if the geometry or
+        the mesh options have changed since the last generation.
+
+        :param force: Generate the mesh even if the geometry and the options
+          have not changed, default = False.
+        :type force: bool
+        :return: True if the mesh has been generated.
+        """
+        signature = self.signature()
+        if signature == self._signature and not force:
+            return False
+        self._boundaries = None
+        self._subdomains = None
+        self._mvc_bnd = None
+        self._mvc_dom = None
+        if dolfin.MPI.size(self.mpi_comm()) > 1:
+            self.export()  # in APP directory
+            self.import_mesh()  # from APP directory
+        else:
+            msh = self.load_geometry()
+            self.from_meshio(msh)
+            if self._xdmf:
+                self._write_xdmf(msh, *self._xdmf_path())
         # save vtk file for display?
+        self._signature = signature
+        self._revision += 1
+        return True
+
+    def set_options(self, **kwargs):
+        r"""Updates the extra arguments of :func:`pygmsh.generate_mesh`, the
+        mesh is generated again on the next :meth:`run`."""
+        self._options.update(kwargs)
+
+    def signature(self):
+        r"""Returns the hash of the gmsh code of the geometry (generated
+        again only if the geometry features have changed, see
+        :meth:`fem.geometry.Geometry.run`) and of the mesh options."""
+        geom = self.parent_geometry()
+        geom.run()
+        data = json.dumps({'code': geom.gmsh_code(),
+                           'dim': self._parent.dim,
+                           'options': self._options},
+                          sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def subdomains(self):
+        r"""Returns a copy of the domain markers, the markers are built once
+        per mesh generation."""
+        self.run()
+        if self._subdomains is None:
+            self._subdomains = dolfin.cpp.mesh.MeshFunctionSizet(
+                self, self._mvc_dom)
+        return self._copy(self._subdomains)
 
     def import_mesh(self, filename=None):
-        r"""Load mesh from generated xdmf files."""
+        r"""Load mesh from generated xdmf files. When running in parallel,
+        each process reads its partition of the mesh and of the markers."""
         name = MESH
         if filename is None:
-            directory = APP_DIR
+            directory = app_dir()
         else:
             # check if path exist
             if not os.path.exists(filename):
                 raise ValueError(error(E_PATH, filename))
             directory, name = os.path.split(filename)
+            directory = Path(directory)
             name = name.split(".")[0]  # remove extension if exists
+        comm = self.mpi_comm()
         try:
             mesh = self
             with dolfin.XDMFFile(
-                    directory.child(name + XDMF)) as infile:
+                    comm, directory.child(name + XDMF)) as infile:
                 infile.read(mesh)
             mvc_bnd = dolfin.MeshValueCollection("size_t", self, 1)
             with dolfin.XDMFFile(
-                    directory.child(name + BND_XDMF)) as infile:
+                    comm, directory.child(name + BND_XDMF)) as infile:
                 infile.read(mvc_bnd, "bnd")
             mvc_dom = dolfin.MeshValueCollection("size_t", self, 2)
             with dolfin.XDMFFile(
-                    directory.child(name + DOM_XDMF)) as infile:
+                    comm, directory.child(name + DOM_XDMF)) as infile:
                 infile.read(mvc_dom, "dom")
             self._mvc_bnd = mvc_bnd
             self._mvc_dom = mvc_dom
         except RuntimeError as e:
             logging.error("RunTimeError\n{}\n\n".format(e))
 
-    def load_geometry(self):
+    def parent_geometry(self):
         r"""Check that the parent is a component. Then check that the
-        component has a defined geometry."""
+        component has a defined geometry.
+
+        :return: The geometry.
+        """
         tag = self._geom_tag
         if tag is None:
             raise ValueError(error(E_GEOM_TAG))
@@ -125,18 +357,86 @@ class Mesh(dolfin.Mesh, Node):
         geom = self._parent.child_by_type(GEOMETRY, tag=tag)
         if geom is None:
             raise ValueError(error(E_GEOM))
+        return geom
+
+    def load_geometry(self):
+        r"""Generates the mesh of the geometry with gmsh, or loads it from
+        the mesh cache."""
+        geom = self.parent_geometry()
         geom.run()
-        return pygmsh.generate_mesh(geom)
+        cache = self.mesh_cache()
+        if cache is None:
+            return pygmsh.generate_mesh(geom, **self._options)
+        key = cache.key(geom.gmsh_code(), self._parent.dim, self._options)
+        return cache.load(
+            key, lambda: pygmsh.generate_mesh(geom, **self._options))
+
+    def mesh_cache(self):
+        r"""Returns the mesh cache, None if it is disabled. The default
+        cache (and its directory) is created on the first call."""
+        if self._cache is True:
+            self._cache = MeshCache()
+        return self._cache or None
 
     def mvc_bnd(self):
         r"""Mesh Value Collection"""
         self.run()
+        if self._mvc_bnd is None:
+            self._mvc_bnd = self._collection(self._boundaries)
         return self._mvc_bnd
 
     def mvc_dom(self):
         r"""Mesh Value Collection"""
         self.run()
+        if self._mvc_dom is None:
+            self._mvc_dom = self._collection(self._subdomains)
         return self._mvc_dom
 
     def set_data(self, column, value):
         pass
+
+    def _collection(self, markers):
+        r"""Returns the mesh value collection of the marked entities of a
+        mesh function."""
+        mvc = dolfin.MeshValueCollection("size_t", self, markers.dim())
+        mesh_builder().assign_collection(mvc, markers)
+        return mvc
+
+    def _copy(self, markers):
+        r"""Returns a copy of the markers, so that the cached markers are not
+        changed by the callers."""
+        out = dolfin.cpp.mesh.MeshFunctionSizet(self, markers.dim(), 0)
+        out.array()[:] = markers.array()
+        return out
+
+    @staticmethod
+    def _match(entities, rows):
+        r"""Returns the index of the entity with the same vertices (in any
+        order) as each row, -1 if there is none.
+
+        The sorted vertices of the entities and of the rows are sorted
+        together lexicographically, column by column, so that the equal rows
+        are adjacent; unlike an integer key built from the vertices, this
+        can't overflow on large meshes.
+
+        :param entities: The (n, k) vertices of the entities, e.g. the
+          facets of the mesh.
+        :type entities: array-like
+        :param rows: The (m, k) vertices to be found.
+        :type rows: array-like
+        :return: The (m,) array of entity indices.
+        """
+        if len(rows) == 0 or len(entities) == 0:
+            return -np.ones(len(rows), dtype=np.int64)
+        entities = np.sort(np.asarray(entities, dtype=np.int64), axis=1)
+        rows = np.sort(np.asarray(rows, dtype=np.int64), axis=1)
+        both = np.concatenate([entities, rows])
+        order = np.lexsort(both.T[::-1])
+        ordered = both[order]
+        new = np.ones(len(both), dtype=bool)
+        new[1:] = np.any(ordered[1:] != ordered[:-1], axis=1)
+        group = np.empty(len(both), dtype=np.int64)
+        group[order] = np.cumsum(new) - 1
+        index = -np.ones(group[order[-1]] + 1, dtype=np.int64)
+        index[group[:len(entities)]] = np.arange(len(entities))
+        return index[group[len(entities):]]
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+fem.mesh_cache.py
+November 14, 2019
+@author Francois Roy
+"""
+import hashlib
+import json
+import re
+import subprocess
+import time
+from contextlib import contextmanager
+import meshio
+import pygmsh
+from utils import *
+try:
+    import fcntl
+except ImportError:  # Windows, the concurrent misses may mesh twice
+    fcntl = None
+
+# default directory of the generated meshes, shared by all the jobs
+MESH_CACHE_DIR = APP_DIR.child('meshes')
+# default maximum size of the cache in bytes
+MESH_CACHE_SIZE = 2 ** 30
+# the quoted strings (kept) and the ids of the gmsh entities (renumbered)
+_GMSH_TOKEN = re.compile(r'"[^"]*"|\b([A-Za-z_]+)(\d+)\b')
+_GMSH_VERSIONS = {}
+
+
+def canonical_code(code):
+    r"""Returns the gmsh code with the ids of the entities renumbered in the
+    order of their first appearance, e.g. ``p12``, ``p13`` become ``p0``,
+    ``p1``.
+
+    pygmsh numbers the entities with counters shared by all the geometries
+    of the process, so the same geometry has a different code in each run
+    (or after each generation); the canonical code is the same.
+
+    :param code: The gmsh code, see
+      :meth:`gmsh_code<fem.geometry.Geometry.gmsh_code>`.
+    :type code: list
+    """
+    if not isinstance(code, str):
+        code = '\n'.join(code)
+    ids = {}
+
+    def rename(match):
+        prefix = match.group(1)
+        if prefix is None:  # quoted string
+            return match.group(0)
+        names = ids.setdefault(prefix, {})
+        return '{}{}'.format(prefix, names.setdefault(match.group(2),
+                                                      len(names)))
+
+    return _GMSH_TOKEN.sub(rename, code)
+
+
+def gmsh_version(gmsh_path=None):
+    r"""Returns the version of the gmsh executable, None if it is not found.
+
+    :param gmsh_path: The gmsh executable, default = 'gmsh'.
+    :type gmsh_path: str
+    """
+    exe = 'gmsh' if gmsh_path is None else str(gmsh_path)
+    if exe not in _GMSH_VERSIONS:
+        try:
+            out = subprocess.check_output([exe, '--version'],
+                                          stderr=subprocess.STDOUT)
+            _GMSH_VERSIONS[exe] = out.decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            _GMSH_VERSIONS[exe] = None
+    return _GMSH_VERSIONS[exe]
+
+
+class MeshCache(object):
+    r"""Persistent cache of the meshes generated by gmsh, shared by the
+    processes.
+
+    A mesh is stored in ``<key>.npz`` (points, cells and physical tags of
+    each cell type) where the key is the hash of the canonical gmsh code of
+    the geometry (which includes the characteristic lengths), the dimension,
+    the options of :func:`pygmsh.generate_mesh` and the versions of gmsh and
+    pygmsh, see :meth:`key`. A geometry is meshed once for all the jobs of a
+    sweep and all the runs.
+
+    The files are written in a temporary file then renamed, so the readers
+    never see a partial mesh. A miss is meshed under a lock of its key, so
+    the concurrent workers missing the same mesh wait for the first one
+    instead of meshing it again. The cache is bounded by ``max_size``: the
+    least recently used meshes are removed first, the modification time of
+    a mesh being updated on each hit, and the lock file of a removed mesh
+    is removed with it unless a process holds it.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> cache = MeshCache()
+      >>> key = cache.key(geom.gmsh_code(), 2, {})
+      >>> msh = cache.load(key, lambda: pygmsh.generate_mesh(geom))
+      >>> cache.summary()
+      {'directory': '.../.fem/meshes', 'hits': 0, 'misses': 1,
+       'num_meshes': 1, 'size': 81234}
+
+    :param directory: The cache directory, default to the
+      ``FEM_MESH_CACHE_DIR`` environment variable if defined, else
+      :data:`MESH_CACHE_DIR`.
+    :type directory: str
+    :param max_size: The maximum size of the cache in bytes, default to
+      :data:`MESH_CACHE_SIZE`.
+    :type max_size: int
+    """
+    def __init__(self, directory=None, max_size=MESH_CACHE_SIZE):
+        if directory is None:
+            directory = os.environ.get('FEM_MESH_CACHE_DIR', MESH_CACHE_DIR)
+        self._directory = Path(os.path.abspath(str(directory)))
+        os.makedirs(self._directory, exist_ok=True)
+        self._max_size = int(max_size)
+        self._hits = 0
+        self._misses = 0
+
+    def directory(self):
+        r"""Returns the cache directory."""
+        return self._directory
+
+    def evict(self, keep=None):
+        r"""Removes the least recently used meshes until the size of the
+        cache is below ``max_size``.
+
+        :param keep: The key of a mesh that is not removed, e.g. the mesh
+          just stored.
+        :type keep: str
+        :return: The keys of the removed meshes.
+        """
+        removed = []
+        with self._lock('cache'):
+            entries = self._entries()
+            size = sum(e[2] for e in entries)
+            for key, _, entry_size in entries:
+                if size <= self._max_size:
+                    break
+                if key == keep:
+                    continue
+                try:
+                    os.remove(self.path(key))
+                except OSError:  # removed by another process
+                    continue
+                self._remove_lock(key)
+                size -= entry_size
+                removed.append(key)
+        for key in removed:
+            logging.debug("mesh cache: evicted {}".format(key))
+        return removed
+
+    def get(self, key):
+        r"""Reads a mesh from the cache.
+
+        :param key: The key of the mesh, see :meth:`key`.
+        :type key: str
+        :return: The mesh, None if it is not in the cache.
+        """
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)  # most recently used
+        except (OSError, ValueError):  # missing, evicted or corrupted
+            return None
+        cells = {}
+        cell_data = {}
+        for name, array in arrays.items():
+            if name.startswith('cells:'):
+                cells[name.split(':', 1)[1]] = array
+            elif name.startswith('data:'):
+                _, cell_type, data_name = name.split(':', 2)
+                cell_data.setdefault(cell_type, {})[data_name] = array
+        return meshio.Mesh(arrays['points'], cells, cell_data=cell_data)
+
+    def hits(self):
+        r"""Returns the number of meshes found in the cache."""
+        return self._hits
+
+    def key(self, code, dim, options):
+        r"""Returns the key of a mesh.
+
+        :param code: The gmsh code of the geometry, see
+          :func:`canonical_code`.
+        :type code: list
+        :param dim: The dimension of the mesh.
+        :type dim: int
+        :param options: The extra arguments of :func:`pygmsh.generate_mesh`.
+        :type options: dict
+        """
+        data = json.dumps({'code': canonical_code(code), 'dim': dim,
+                           'options': options,
+                           'gmsh': gmsh_version(options.get('gmsh_path')),
+                           'pygmsh': pygmsh.__version__,
+                           'meshio': meshio.__version__},
+                          sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def load(self, key, generate):
+        r"""Reads a mesh from the cache, or generates and stores it.
+
+        :param key: The key of the mesh, see :meth:`key`.
+        :type key: str
+        :param generate: The function generating the mesh on a miss, e.g.
+          ``lambda: pygmsh.generate_mesh(geom)``.
+        :type generate: callable
+        :return: The mesh.
+        """
+        msh = self.get(key)
+        if msh is None:
+            with self._lock(key):
+                msh = self.get(key)  # meshed by another process meanwhile
+                if msh is None:
+                    t0 = time.perf_counter()
+                    msh = generate()
+                    self.put(key, msh)
+                    self._misses += 1
+                    logging.debug("mesh cache: {} generated in {:.3f}s"
+                                  .format(key, time.perf_counter() - t0))
+                    self.evict(keep=key)
+                    return msh
+        self._hits += 1
+        logging.debug("mesh cache: {} loaded".format(key))
+        return msh
+
+    def misses(self):
+        r"""Returns the number of meshes generated by :meth:`load`."""
+        return self._misses
+
+    def path(self, key):
+        r"""Returns the path of a mesh."""
+        return self._directory.child(key + '.npz')
+
+    def put(self, key, msh):
+        r"""Stores a mesh atomically.
+
+        :param key: The key of the mesh, see :meth:`key`.
+        :type key: str
+        :param msh: The mesh.
+        :type msh: meshio.Mesh
+        """
+        arrays = {'points': msh.points}
+        for cell_type, cells in msh.cells.items():
+            arrays['cells:' + cell_type] = cells
+        for cell_type, data in msh.cell_data.items():
+            for name, values in data.items():
+                arrays['data:{}:{}'.format(cell_type, name)] = values
+        tmp = self._directory.child('{}.{}.tmp'.format(key, os.getpid()))
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self.path(key))
+
+    def size(self):
+        r"""Returns the size of the cache in bytes."""
+        return sum(e[2] for e in self._entries())
+
+    def summary(self):
+        r"""Returns the hits and misses of :meth:`load`, and the number and
+        size of the meshes in the cache.
+
+        :return: A dictionary.
+        """
+        entries = self._entries()
+        return {'directory': self._directory, 'hits': self._hits,
+                'misses': self._misses, 'num_meshes': len(entries),
+                'size': sum(e[2] for e in entries)}
+
+    def _lock_file(self, name):
+        r"""Returns the lock file of a key, or of the whole cache."""
+        return self._directory.child(name + '.lock')
+
+    def _entries(self):
+        r"""Returns the key, modification time and size of the meshes, the
+        least recently used first."""
+        entries = []
+        for name in os.listdir(self._directory):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(self._directory.child(name))
+            except OSError:  # removed by another process
+                continue
+            entries.append((name[:-len('.npz')], stat.st_mtime, stat.st_size))
+        return sorted(entries, key=lambda e: e[1])
+
+    @contextmanager
+    def _lock(self, name):
+        r"""Holds an exclusive lock on ``<name>.lock`` shared by the
+        processes.
+
+        The lock file may be removed by :meth:`evict` while a process waits
+        for it, the process then locks the new lock file instead.
+        """
+        path = self._lock_file(name)
+        while True:
+            f = open(path, 'a')
+            try:
+                if fcntl is None or self._locked(f, path):
+                    break
+            except BaseException:
+                f.close()
+                raise
+            f.close()
+        with f:
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _locked(self, f, path, blocking=True):
+        r"""Locks an open lock file.
+
+        :param f: The open lock file.
+        :param path: The path of the lock file.
+        :type path: str
+        :param blocking: Wait for the lock, default = True.
+        :type blocking: bool
+        :return: False if the lock is held by another process (not
+          blocking) or if the file was removed or replaced meanwhile.
+        """
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking
+                        else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+        except OSError:  # removed
+            return False
+
+    def _remove_lock(self, name):
+        r"""Removes the lock file of a key, unless a process holds it; the
+        processes waiting for it lock a new file, see :meth:`_lock`.
+
+        :return: True if the lock file is removed.
+        """
+        if fcntl is None:  # cannot tell if the lock file is in use
+            return False
+        path = self._lock_file(name)
+        try:
+            f = open(path, 'r')
+        except OSError:  # no lock file
+            return False
+        with f:
+            if not self._locked(f, path, blocking=False):
+                return False
+            try:
+                os.remove(path)
+            except OSError:
+                return False
+        return True
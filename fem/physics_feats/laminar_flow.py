@@ -6,53 +6,135 @@ November 14, 2019
 """
 from fem.physics_feature import *
 from fem.geom_feats.utils import *
+from fem.subdomain_cache import LazySubDomain
+
+# (family, degree) of the velocity and pressure elements of each
+# discretization
+DISCRETIZATIONS = {
+    P2P1: (('P', 2), ('P', 1)),  # Taylor-Hood
+    P1P1: (('P', 1), ('P', 1)),  # equal order, stabilized
+}
 
 
 class LaminarFlow(PhysicsFeature):
-    r"""Creates a rectangle.
+    r"""The incompressible laminar flow of a newtonian fluid.
+
+    The discretization is either the Taylor-Hood elements P2/P1 (default),
+    or the equal-order elements P1/P1 stabilized by the solvers with the
+    residual-based PSPG/SUPG terms and the grad-div (LSIC) term, see
+    :meth:`stabilization_parameters`. On the same mesh, P1/P1 has about
+    four times fewer velocity degrees of freedom than P2/P1.
 
-    :param tag: The rectangle tag.
+    :param tag: The physics feature tag.
     :type tag: str
+    :param discretization: The discretization, 'p2p1' (default) or 'p1p1',
+      see :data:`DISCRETIZATIONS`.
+    :type discretization: str
     """
-    def __init__(self, tag, **kwargs):
+    def __init__(self, tag, discretization=P2P1, **kwargs):
         super().__init__(tag, **kwargs)
         self._physics = LAMINAR_FLOW
         self._bcs = {}
+        if discretization not in DISCRETIZATIONS.keys():
+            raise ValueError(error(E_VALID, discretization,
+                                   'discretization'))
+        self._discretization = discretization
+        # definitions of the boundary conditions, see boundary_conditions
+        self._bcs_revision = 0
+        self._spaces = None
+        self._mixed_space = None
+        self._dirichlet_bcs = {}
+        self._boundaries = None
 
     def inflow(self, expression, **kwargs):
         r""""""
-        inflow = {'subdomain': dolfin.CompiledSubDomain(expression, tol=1e-14)}
+        inflow = {'subdomain': LazySubDomain(expression, tol=1e-14)}
         if 'value' in kwargs.keys():
             inflow['value'] = kwargs['value']
         self._bcs['inflow'] = inflow
+        self._bcs_revision += 1
 
     def outflow(self, expression, **kwargs):
         r""""""
-        outflow = {'subdomain': dolfin.CompiledSubDomain(expression, tol=1e-14)}
+        outflow = {'subdomain': LazySubDomain(expression, tol=1e-14)}
         if 'value' in kwargs.keys():
             outflow['value'] = kwargs['value']
         self._bcs['outflow'] = outflow
+        self._bcs_revision += 1
 
     def wall(self, expression, **kwargs):
         r""""""
-        wall = {'subdomain': dolfin.CompiledSubDomain(expression, tol=1e-14)}
+        wall = {'subdomain': LazySubDomain(expression, tol=1e-14)}
         if 'value' in kwargs.keys():
             wall['value'] = kwargs['value']
         self._bcs['wall'] = wall
+        self._bcs_revision += 1
+
+    def axis(self, expression):
+        r"""Defines the symmetry axis of an axisymmetric component, where the
+        radial velocity vanishes.
+
+        :param expression: The subdomain expression, e.g.
+          ``'on_boundary && near(x[0], 0.0, tol)'``.
+        :type expression: str
+        """
+        self._bcs['axis'] = {
+            'subdomain': LazySubDomain(expression, tol=1e-14),
+            'value': dolfin.Constant(0.)}
+        self._bcs_revision += 1
+
+    def divergence(self, u):
+        r"""Returns the divergence of the velocity field, in axisymmetric
+        coordinates (:math:`r,~z`):
+
+        .. math:: \nabla\cdot\mathbf{u} = \frac{\partial u_r}{\partial r} +
+            \frac{u_r}{r} + \frac{\partial u_z}{\partial z}
+
+        :param u: The velocity field.
+        :return: The divergence.
+        """
+        if not self.is_axi():
+            return dolfin.div(u)
+        r = self.weight()
+        return u[0].dx(0) + u[0] / r + u[1].dx(1)
+
+    def discretization(self):
+        r"""Returns the discretization, see :data:`DISCRETIZATIONS`."""
+        return self._discretization
+
+    def elements(self):
+        r"""Returns the (family, degree) of the velocity and pressure
+        elements of the discretization."""
+        return DISCRETIZATIONS[self._discretization]
 
     def fes(self):
-        r""""""
-        comp = self.component()
-        mesh = comp.mesh()
-        # TODO: Elements should be defined by the model
-        v_space = dolfin.VectorFunctionSpace(mesh, 'P', 2)
-        q_space = dolfin.FunctionSpace(mesh, 'P', 1)
-        return v_space, q_space
+        r"""Returns the velocity and pressure spaces. The spaces are created
+        once per mesh generation and element choice, see :meth:`space_key`.
+        """
+        key = self.space_key()
+        if self._spaces is None or self._spaces[0] != key:
+            mesh = self.component().mesh()
+            (v_family, v_degree), (q_family, q_degree) = self.elements()
+            v_space = dolfin.VectorFunctionSpace(mesh, v_family, v_degree)
+            q_space = dolfin.FunctionSpace(mesh, q_family, q_degree)
+            self._spaces = key, v_space, q_space
+            self._mixed_space = None
+        return self._spaces[1], self._spaces[2]
+
+    def is_stabilized(self):
+        r"""Returns True if the discretization must be stabilized, i.e. for
+        the equal-order elements."""
+        return self._discretization == P1P1
+
+    def is_axi(self):
+        r"""Returns True if the component is axisymmetric, the first and
+        second coordinates are then the radial and axial coordinates."""
+        return self.component().is_axi
 
     def initial_conditions(self):
-        r""""""
+        r"""Returns the initial velocity and pressure."""
         # TODO: Elements should be defined by the model
-        return dolfin.Constant((0., 0.))
+        return dolfin.Constant((0., 0.)), dolfin.Constant(0.)
 
     def volumetric_force(self):
         r""""""
@@ -69,9 +151,37 @@ class LaminarFlow(PhysicsFeature):
         rho = mat.density()
         return rho, mu
 
-    def boundary_conditions(self):
-        r"""Generates boundary conditions"""
-        v_space, q_space = self.fes()
+    def boundaries(self):
+        r"""Returns the boundary markers of the boundary conditions (1 for
+        the inflow, 2 for the outflow, 3 for the wall and 4 for the axis),
+        see :meth:`boundary_conditions`."""
+        if self._boundaries is None:
+            self.boundary_conditions()
+        return self._boundaries
+
+    def boundary_conditions(self, mixed=False):
+        r"""Generates boundary conditions.
+
+        The boundary conditions are created once per mesh generation, element
+        choice and definition of the boundaries. Their values can be updated
+        in place without creating them again, see :meth:`set_value` and
+        :meth:`set_time`.
+
+        :param mixed: Create the boundary conditions on the sub-spaces of
+          the mixed space (see :meth:`mixed_space`) instead of the spaces
+          returned by :meth:`fes`, default = False.
+        :type mixed: bool
+        :return: The velocity and pressure Dirichlet boundary conditions.
+        """
+        cache_key = self.space_key(), self._bcs_revision
+        cached = self._dirichlet_bcs.get(mixed)
+        if cached is not None and cached[0] == cache_key:
+            return cached[1], cached[2]
+        if mixed:
+            w_space = self.mixed_space()
+            v_space, q_space = w_space.sub(0), w_space.sub(1)
+        else:
+            v_space, q_space = self.fes()
         # Define boundary conditions
         comp = self.component()
         boundaries = comp.boundaries()
@@ -84,40 +194,190 @@ class LaminarFlow(PhysicsFeature):
                 bcp.append(dolfin.DirichletBC(
                     q_space,
                     self._bcs[key]['value'],
-                    self._bcs[key]['subdomain']))
+                    self._bcs[key]['subdomain'].compiled()))
             elif key == 'outflow':
                 self._bcs[key]['subdomain'].mark(boundaries, 2)
                 bcp.append(dolfin.DirichletBC(
                     q_space,
                     self._bcs[key]['value'],
-                    self._bcs[key]['subdomain']))
+                    self._bcs[key]['subdomain'].compiled()))
             elif key == 'wall':
                 self._bcs[key]['subdomain'].mark(boundaries, 3)
                 bcu.append(dolfin.DirichletBC(
                     v_space,
                     self._bcs[key]['value'],
-                    self._bcs[key]['subdomain']))
-
+                    self._bcs[key]['subdomain'].compiled()))
+            elif key == 'axis':
+                self._bcs[key]['subdomain'].mark(boundaries, 4)
+                bcu.append(dolfin.DirichletBC(
+                    v_space.sub(0),
+                    self._bcs[key]['value'],
+                    self._bcs[key]['subdomain'].compiled()))
+        self._boundaries = boundaries
+        self._dirichlet_bcs[mixed] = cache_key, bcu, bcp
         return bcu, bcp
 
-    def molecular_stress_tensor(self, u, p):
+    def mixed_space(self):
+        r"""Returns the mixed (velocity, pressure) space built from the
+        elements of :meth:`fes`, e.g. the Taylor-Hood space P2/P1."""
+        v_space, q_space = self.fes()
+        if self._mixed_space is None:
+            self._mixed_space = dolfin.FunctionSpace(
+                self.component().mesh(), dolfin.MixedElement(
+                    [v_space.ufl_element(), q_space.ufl_element()]))
+        return self._mixed_space
+
+    def molecular_stress_tensor(self, u, p, mu):
         r"""Define the molecular stress tensor:
 
         .. math:: \bar{\pi} = 2\mu\bar{\epsilon}-p\bar{I}
 
+        The tensor is 3x3 in axisymmetric coordinates, see
+        :meth:`strain_rate_tensor`.
+
         :param u: The velocity field.
         :param p: The pressure field.
+        :param mu: The dynamic viscosity.
         :return: The molecular stress tensor.
         """
-        mu = self._mu.magnitude
-        epsilon = LaminarFlow.strain_rate_tensor(u)
-        return 2 * mu * epsilon - p * dolfin.Identity(len(u))
+        epsilon = self.strain_rate_tensor(u)
+        dim = 3 if self.is_axi() else len(u)
+        return 2 * mu * epsilon - p * dolfin.Identity(dim)
+
+    def set_discretization(self, value):
+        r"""Sets the discretization, the spaces and the boundary conditions
+        are created again on the next call.
+
+        :param value: The discretization, see :data:`DISCRETIZATIONS`.
+        :type value: str
+        """
+        if value not in DISCRETIZATIONS.keys():
+            raise ValueError(error(E_VALID, value, 'discretization'))
+        self._discretization = value
+
+    def set_time(self, t):
+        r"""Updates in place the time of the time-dependent boundary values,
+        i.e. the expressions with a parameter ``t``.
+
+        :param t: The time.
+        :type t: float
+        """
+        for bc in self._bcs.values():
+            value = bc.get('value')
+            if value is not None and hasattr(value, 't'):
+                value.t = t
+
+    def set_value(self, name, value):
+        r"""Updates the value of a boundary condition. The value of a
+        :class:`dolfin.Constant` is assigned in place, the boundary conditions
+        are then not created again.
+
+        :param name: The boundary name, e.g. 'inflow'.
+        :type name: str
+        :param value: The new value, e.g. a float or a tuple for a
+          constant, or an expression.
+        """
+        if name not in self._bcs.keys():
+            raise ValueError(error(E_VALID, name, 'boundary condition'))
+        current = self._bcs[name].get('value')
+        if (isinstance(current, dolfin.Constant) and
+                not isinstance(value, dolfin.GenericFunction)):
+            current.assign(dolfin.Constant(value))
+        else:
+            self._bcs[name]['value'] = value
+            self._bcs_revision += 1
+
+    def space_key(self):
+        r"""Returns the key of the cached spaces and boundary conditions,
+        i.e. the mesh, its generation and the elements."""
+        mesh = self.component().mesh()
+        return id(mesh), mesh.revision(), self.elements()
+
+    def stabilization_parameters(self, u, rho, mu, k=None):
+        r"""Returns the parameters of the stabilization terms of the
+        equal-order discretization, i.e.
+
+        .. math:: \tau_M = \left(\left(\frac{2}{k}\right)^2 +
+            \left(\frac{2|\mathbf{u}|}{h}\right)^2 +
+            \left(\frac{4\nu}{h^2}\right)^2\right)^{-1/2},\quad
+            \tau_C = \frac{h|\mathbf{u}|}{2}
+
+        where :math:`h` is the cell diameter and :math:`\nu=\mu/\rho`.
+        With the momentum residual :math:`\mathbf{R}_M`, the SUPG, PSPG and
+        grad-div (LSIC) terms are respectively
+
+        .. math:: \int_\Omega\tau_M\rho(\nabla\mathbf{v}\,\mathbf{u})
+            \cdot\mathbf{R}_M~d\mathbf{x},\quad
+            -\int_\Omega\frac{\tau_M}{\rho}\nabla q\cdot\mathbf{R}_M
+            ~d\mathbf{x},\quad
+            \int_\Omega\tau_C\rho(\nabla\cdot\mathbf{u})
+            (\nabla\cdot\mathbf{v})~d\mathbf{x}
+
+        The viscous term of the residual vanishes in the linear cells and is
+        dropped.
+
+        :param u: The advecting velocity, None for the Stokes problem.
+        :param rho: The density.
+        :param mu: The dynamic viscosity.
+        :param k: The time step, None for the steady problems.
+        :return: :math:`\tau_M` and :math:`\tau_C`.
+        """
+        mesh = self.component().mesh()
+        h = dolfin.CellDiameter(mesh)
+        nu = mu / rho
+        inv_tau2 = (4. * nu / h**2)**2
+        tau_c = dolfin.Constant(0.)
+        if u is not None:
+            # avoid the singular derivative of |u| at u = 0
+            u_norm = dolfin.sqrt(dolfin.inner(u, u) + 1e-16)
+            inv_tau2 = inv_tau2 + (2. * u_norm / h)**2
+            tau_c = 0.5 * h * u_norm
+        if k is not None:
+            inv_tau2 = inv_tau2 + (2. / k)**2
+        return inv_tau2**(-0.5), tau_c
+
+    def strain_rate_tensor(self, u):
+        r"""Define the symmetric strain-rate tensor. In axisymmetric
+        coordinates (:math:`r,~\theta,~z`) with :math:`u_\theta=0`, see
+        :class:`PoiseuilleAxi
+        <cfd.models_2d.axi_symmetric.poiseuille_axi.PoiseuilleAxi>`:
 
-    @staticmethod
-    def strain_rate_tensor(u):
-        r"""Define the symmetric strain-rate tensor
+        .. math:: \bar{\epsilon} = \left(
+            \begin{array}{ccc}
+              \frac{\partial u_r}{\partial r} & 0 &
+              \frac{1}{2}\left(\frac{\partial u_z}{\partial r}+
+              \frac{\partial u_r}{\partial z}\right)\\
+              0 & \frac{u_r}{r} & 0\\
+              \frac{1}{2}\left(\frac{\partial u_r}{\partial z}
+              +\frac{\partial u_z}{\partial r}\right) & 0 &
+              \frac{\partial u_z}{\partial z}
+            \end{array}
+            \right)
 
         :param u: The velocity field (2D).
         :return: The strain rate tensor.
         """
-        return dolfin.sym(dolfin.nabla_grad(u))
+        if not self.is_axi():
+            return dolfin.sym(dolfin.nabla_grad(u))
+        r = self.weight()
+        ur = u[0]
+        uz = u[1]
+        ur_r = ur.dx(0)
+        ur_z = ur.dx(1)
+        uz_r = uz.dx(0)
+        uz_z = uz.dx(1)
+        return dolfin.sym(
+            dolfin.as_tensor(
+                [
+                    [ur_r, 0, 0.5 * (uz_r + ur_z)],
+                    [0, ur / r, 0],
+                    [0.5 * (uz_r + ur_z), 0, uz_z]
+                ]))
+
+    def weight(self):
+        r"""Returns the weight of the integrands, i.e. the radial coordinate
+        :math:`r` in axisymmetric coordinates (:math:`dx = 2\pi r~d\omega`,
+        the constant :math:`2\pi` is dropped) and 1 otherwise."""
+        if not self.is_axi():
+            return dolfin.Constant(1.)
+        return dolfin.SpatialCoordinate(self.component().mesh())[0]
@@ -5,6 +5,7 @@ November 14, 2019
 @author Francois Roy
 """
 from fem.results_feature import *
+from fem.results_feats.sampling import *
 
 
 class LinePlot(ResultsFeature):
@@ -21,10 +22,32 @@ class LinePlot(ResultsFeature):
                 setattr(self, "_"+key, kwargs[key])
         self._results_type = LINE_PLOT
         self._line = None
+        self._sampler = None
+
+    def evaluate(self, u):
+        r"""Evaluates a function on the points of the line, see
+        :class:`Sampler<fem.results_feats.sampling.Sampler>`. The points are
+        located once per function space, the next evaluations are sparse
+        matrix-vector products.
+
+        :param u: The function.
+        :type u: dolfin.Function
+        :return: The values at the points of the line.
+        """
+        space = u.function_space()
+        if self._sampler is None or self._sampler[0] is not space:
+            self._sampler = space, Sampler(space, self._line)
+        return self._sampler[1].evaluate(u)
 
     def line(self, line):
-        r"""line over which data are evaluated."""
-        self._line = line
+        r"""line over which data are evaluated.
+
+        :param line: The (n, dim) array of points, e.g.
+          :func:`line_points<fem.results_feats.sampling.line_points>`.
+        :type line: array-like
+        """
+        self._line = np.asarray(line, dtype=float)
+        self._sampler = None
 
     def plot(self):
         r""""""
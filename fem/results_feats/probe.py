@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+fem.results_feats.probe.py
+November 14, 2019
+@author Francois Roy
+"""
+import json
+import dolfin
+from fem.results_feature import *
+from fem.results_feats.sampling import *
+
+
+class Probe(ResultsFeature):
+    r"""Records the values of the fields at fixed points (e.g. the locations
+    of the sensors) along the time loop of a solver.
+
+    The points are located and their interpolation weights computed once per
+    function space, see :class:`Sampler<fem.results_feats.sampling.Sampler>`,
+    and each record is a row (time, then the values of the fields at the
+    points) of a preallocated buffer of ``chunk_size`` rows. Full buffers are
+    appended to the binary file ``<directory>/<tag>.bin`` (float64, C order),
+    described by the metadata file ``<directory>/<tag>.json`` (the columns,
+    the points and the number of rows), so that the records of a long run
+    are written in a few large writes. In parallel, only the process of rank
+    0 writes the files.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> probe = model.results('res').create(PROBE, 'sensors',
+      ...                                     stride=10)
+      >>> probe.add_point('p1', [0.0, 0.025])
+      >>> probe.add_point('p2', [0.0, 0.05])
+      >>> solver.add_probe(probe)
+      >>> solver.solve()
+      >>> probe.data()['p[p1]']  # the pressure at p1
+      >>> probe.times()
+
+    :param tag: The probe tag.
+    :type tag: str
+    :param points: The points by name, default = None.
+    :type points: dict
+    :param fields: The names of the recorded fields, default = ('u', 'p').
+    :type fields: tuple
+    :param stride: Number of steps between two records, default = 1.
+    :type stride: int
+    :param chunk_size: Number of rows of the buffer, default = 1024.
+    :type chunk_size: int
+    :param directory: The output directory, default to
+      :func:`utils.out_dir`.
+    :type directory: str
+    """
+    def __init__(self, tag, parent=None, points=None, fields=('u', 'p'),
+                 stride=1, chunk_size=1024, directory=None, **kwargs):
+        super().__init__(tag=tag, parent=parent)
+        self._valid_children_type = []
+        if parent is not None:
+            # automatically add class instance to parent if exists
+            parent.add_child(self)
+        if kwargs.keys():
+            for key in kwargs.keys():
+                setattr(self, "_"+key, kwargs[key])
+        self._results_type = PROBE
+        self._points = {}
+        if points is not None:
+            for name, point in points.items():
+                self.add_point(name, point)
+        self._fields = tuple(fields)
+        self._stride = max(int(stride), 1)
+        self._chunk_size = max(int(chunk_size), 1)
+        self._directory = out_dir() if directory is None else directory
+        self._samplers = {}
+        self._columns = None
+        self._buffer = None
+        self._num_buffered = 0
+        self._num_rows = 0
+        self._rank = 0
+
+    def add_point(self, name, point):
+        r"""Adds a probe point.
+
+        :param name: The name of the point, e.g. the sensor name.
+        :type name: str
+        :param point: The coordinates of the point.
+        :type point: array-like
+        """
+        self._points[name] = np.asarray(point, dtype=float)
+
+    def close(self):
+        r"""Flushes the buffer."""
+        self.flush()
+
+    def columns(self):
+        r"""Returns the names of the columns of the records, e.g. ``'t'``,
+        ``'p[p1]'``, ``'u_0[p1]'``."""
+        return self._columns
+
+    def data(self, column=None):
+        r"""Reads the records from the files.
+
+        :param column: The name of a column, default = None (all columns).
+        :type column: str
+        :return: The values of the column, or the values of all the
+          columns by name.
+        """
+        with open(self.file_name('.json')) as f:
+            meta = json.load(f)
+        values = np.fromfile(self.file_name('.bin'), dtype=np.float64)
+        num_columns = len(meta['columns'])
+        values = values[:meta['num_rows'] * num_columns]
+        values = values.reshape(-1, num_columns)
+        data = {name: values[:, i] for i, name in enumerate(meta['columns'])}
+        if column is not None:
+            return data[column]
+        return data
+
+    def file_name(self, extension):
+        r"""Returns the name of the output file of given extension."""
+        return os.path.join(str(self._directory), self._tag + extension)
+
+    def flush(self):
+        r"""Appends the buffered records to the binary file and updates the
+        metadata file."""
+        if self._buffer is None or self._num_buffered == 0:
+            return
+        if self._rank == 0:
+            with open(self.file_name('.bin'), 'ab') as f:
+                self._buffer[:self._num_buffered].tofile(f)
+        self._num_rows += self._num_buffered
+        self._num_buffered = 0
+        self._write_metadata()
+
+    def plot(self):
+        r""""""
+        pass
+
+    def points(self):
+        r"""Returns the probe points by name."""
+        return self._points
+
+    def record(self, step, t, functions):
+        r"""Records the fields if the step is a record step.
+
+        :param step: The step index.
+        :type step: int
+        :param t: The time.
+        :type t: float
+        :param functions: The fields by name.
+        :type functions: dict
+        :return: True if the fields have been recorded.
+        """
+        if step % self._stride != 0:
+            return False
+        if self._buffer is None:
+            self.start(functions)
+        row = self._buffer[self._num_buffered]
+        row[0] = t
+        i = 1
+        for name in self._fields:
+            values = self._sampler(functions[name]).evaluate(functions[name])
+            values = values.ravel()
+            row[i:i + len(values)] = values
+            i += len(values)
+        self._num_buffered += 1
+        if self._num_buffered == self._chunk_size:
+            self.flush()
+        return True
+
+    def start(self, functions, t=None):
+        r"""Creates the buffer and the files of the records.
+
+        :param functions: The fields by name, used for the columns.
+        :type functions: dict
+        :param t: The restart time, the records of the existing files up to
+          this time are kept and the next ones are appended, default = None
+          (new files).
+        :type t: float
+        """
+        names = list(self._points.keys())
+        columns = ['t']
+        for name in self._fields:
+            func = functions[name]
+            if func.value_rank() == 0:
+                columns += ['{}[{}]'.format(name, p) for p in names]
+            else:
+                columns += ['{}_{}[{}]'.format(name, j, p) for p in names
+                            for j in range(func.value_size())]
+        comm = list(functions.values())[0].function_space().mesh().mpi_comm()
+        self._rank = dolfin.MPI.rank(comm)
+        self._columns = columns
+        self._buffer = np.zeros((self._chunk_size, len(columns)))
+        self._num_buffered = 0
+        self._num_rows = 0
+        if t is not None and os.path.isfile(self.file_name('.json')):
+            with open(self.file_name('.json')) as f:
+                meta = json.load(f)
+            if meta['columns'] == columns:
+                # drop the records after the restart time
+                times = self.data('t')
+                self._num_rows = int(np.searchsorted(
+                    times, t * (1. + 1e-12) + 1e-300, side='right'))
+                if self._rank == 0:
+                    os.truncate(self.file_name('.bin'),
+                                self._num_rows * len(columns) * 8)
+                self._write_metadata()
+                return
+        if self._rank == 0:
+            os.makedirs(str(self._directory), exist_ok=True)
+            open(self.file_name('.bin'), 'wb').close()
+        self._write_metadata()
+
+    def times(self):
+        r"""Returns the times of the records."""
+        return self.data('t')
+
+    def _sampler(self, func):
+        r"""Returns the sampler of the probe points for the function space of
+        the function."""
+        space = func.function_space()
+        sampler = self._samplers.get(id(space))
+        if sampler is None or sampler[0] is not space:
+            sampler = space, Sampler(space, list(self._points.values()))
+            self._samplers[id(space)] = sampler
+        return sampler[1]
+
+    def _write_metadata(self):
+        r"""Writes the metadata file, atomically."""
+        if self._rank != 0:
+            return
+        meta = {'columns': self._columns, 'dtype': 'float64',
+                'num_rows': self._num_rows, 'stride': self._stride,
+                'points': {name: point.tolist()
+                           for name, point in self._points.items()}}
+        tmp = self.file_name('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self.file_name('.json'))
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+fem.results_feats.sampling.py
+November 14, 2019
+@author Francois Roy
+"""
+import dolfin
+import ufl
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+from utils import *
+
+# local vertices of the edges of the simplices, in the UFC order of the
+# edge degrees of freedom of the P2 elements
+EDGES = {
+    2: [(1, 2), (0, 2), (0, 1)],
+    3: [(2, 3), (1, 3), (1, 2), (0, 3), (0, 2), (0, 1)],
+}
+
+
+def grid_points(lower, upper, shape):
+    r"""Returns the points of a structured grid, in C order (the last
+    coordinate varies the fastest).
+
+    :param lower: The lower corner of the grid.
+    :type lower: array-like
+    :param upper: The upper corner of the grid.
+    :type upper: array-like
+    :param shape: The number of points along each direction.
+    :type shape: array-like
+    :return: The (n, dim) array of points.
+    """
+    axes = [np.linspace(a, b, int(n)) for a, b, n in zip(lower, upper, shape)]
+    mesh = np.meshgrid(*axes, indexing='ij')
+    return np.stack([m.ravel() for m in mesh], axis=1)
+
+
+def line_points(start, end, num):
+    r"""Returns equally spaced points on a segment.
+
+    :param start: The first point.
+    :type start: array-like
+    :param end: The last point.
+    :type end: array-like
+    :param num: The number of points.
+    :type num: int
+    :return: The (num, dim) array of points.
+    """
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    s = np.linspace(0., 1., int(num))[:, None]
+    return start + s * (end - start)
+
+
+class Sampler(object):
+    r"""Evaluates the functions of a space at a fixed set of points, e.g. the
+    points of a line (:func:`line_points`), of a point cloud or of a
+    structured grid (:func:`grid_points`).
+
+    The points are located once for all: the cells candidates are the
+    nearest cells (by midpoint) of each point, found at once with a k-d
+    tree, and the points are tested against them with their barycentric
+    coordinates; the few points which are not found this way are located
+    with the bounding box tree of the mesh. The values of the basis
+    functions at the points are then stored in a sparse matrix, so that
+    the evaluation of a function (e.g. at each time step) is a sparse
+    matrix-vector product with its degrees of freedom.
+
+    The basis functions of the Lagrange elements P1 and P2 (and of the
+    vector elements built from them) are computed from the barycentric
+    coordinates of the points, the other elements use
+    ``evaluate_basis_all`` point by point.
+
+    In parallel, each point is evaluated by the process of lowest rank
+    owning a cell containing it, and the values are shared by all the
+    processes.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> points = line_points([0., 0.], [0., 0.1], 101)
+      >>> sampler = Sampler(v_space, points)
+      >>> for step in range(num_steps):
+      ...     # solve
+      ...     values = sampler.evaluate(u1)  # (101, 2) array
+
+    :param space: The function space of the sampled functions.
+    :type space: dolfin.FunctionSpace
+    :param points: The (n, dim) array of points.
+    :type points: array-like
+    :param shape: The shape of the output values, e.g. the shape of the
+      grid, default = (n,).
+    :type shape: tuple
+    :param tol: The tolerance on the barycentric coordinates of the points
+      inside a cell, default = 1e-10.
+    :type tol: float
+    """
+    def __init__(self, space, points, shape=None, tol=1e-10):
+        mesh = space.mesh()
+        gdim = mesh.geometry().dim()
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points.reshape(-1, 1) if gdim == 1 else points[None, :]
+        if points.shape[1] != gdim:
+            raise ValueError(error(E_POINTS, gdim))
+        self._space = space
+        self._points = points
+        self._shape = (len(points),) if shape is None else tuple(shape)
+        self._value_size = space.element().value_dimension(0) \
+            if space.element().value_rank() else 1
+        self._comm = mesh.mpi_comm()
+        self._tol = tol
+        cells, bary = self.locate(mesh, points)
+        found = cells >= 0
+        # in parallel, the process of lowest rank owning the point
+        rank = dolfin.MPI.rank(self._comm)
+        size = dolfin.MPI.size(self._comm)
+        owner = np.ascontiguousarray(np.where(found, rank, size),
+                                     dtype=np.int64)
+        if size > 1:
+            MPI = _mpi()
+            self._comm.Allreduce(MPI.IN_PLACE, owner, op=MPI.MIN)
+        self._owned = owner == rank
+        self._found = owner < size
+        cells[~self._owned] = -1
+        self._build_matrix(mesh, cells, bary)
+
+    def evaluate(self, u):
+        r"""Evaluates a function at the points.
+
+        :param u: A function of the space.
+        :type u: dolfin.Function
+        :return: The values at the points, an array of shape ``shape`` for
+          scalar functions and ``shape + (value_size,)`` otherwise, NaN at
+          the points outside the mesh.
+        """
+        if dolfin.MPI.size(self._comm) > 1:
+            x = u.vector().gather(self._global_dofs)
+        else:
+            x = u.vector().get_local()[self._dofs]
+        values = np.ascontiguousarray(self._matrix.dot(x), dtype=float)
+        if dolfin.MPI.size(self._comm) > 1:
+            # each point is evaluated by its owner only, the others add 0
+            MPI = _mpi()
+            self._comm.Allreduce(MPI.IN_PLACE, values, op=MPI.SUM)
+        values = values.reshape(-1, self._value_size)
+        values[~self._found] = np.nan
+        if self._value_size == 1:
+            return values.reshape(self._shape)
+        return values.reshape(self._shape + (self._value_size,))
+
+    def found(self):
+        r"""Returns the mask of the points inside the mesh."""
+        return self._found
+
+    def locate(self, mesh, points):
+        r"""Locates the points in the cells of the (local) mesh.
+
+        :param mesh: The mesh.
+        :param points: The (n, dim) array of points.
+        :return: The cell of each point (-1 if not found) and the
+          barycentric coordinates of the points in their cell.
+        """
+        tdim = mesh.topology().dim()
+        gdim = mesh.geometry().dim()
+        num_points = len(points)
+        cells = -np.ones(num_points, dtype=np.int64)
+        bary = np.zeros((num_points, tdim + 1))
+        num_cells = mesh.num_cells()
+        if num_cells == 0:
+            return cells, bary
+        if gdim == tdim:
+            vertices = mesh.coordinates()[mesh.cells()]
+            tree = cKDTree(vertices.mean(axis=1))
+            k = min(8, num_cells)
+            candidates = tree.query(points, k=k)[1].reshape(num_points, k)
+            for j in range(k):
+                todo = np.flatnonzero(cells < 0)
+                if len(todo) == 0:
+                    break
+                c = candidates[todo, j]
+                lmbda = self._barycentric(vertices[c], points[todo])
+                inside = lmbda.min(axis=1) >= -self._tol
+                cells[todo[inside]] = c[inside]
+                bary[todo[inside]] = lmbda[inside]
+        # fall back on the bounding box tree
+        todo = np.flatnonzero(cells < 0)
+        if len(todo) > 0:
+            tree = mesh.bounding_box_tree()
+            for i in todo:
+                c = tree.compute_first_entity_collision(
+                    dolfin.Point(*points[i]))
+                if c < num_cells:
+                    cells[i] = c
+            if gdim == tdim:
+                done = todo[cells[todo] >= 0]
+                vertices = mesh.coordinates()[mesh.cells()[cells[done]]]
+                bary[done] = self._barycentric(vertices, points[done])
+        return cells, bary
+
+    def points(self):
+        r"""Returns the sample points."""
+        return self._points
+
+    @staticmethod
+    def _barycentric(vertices, points):
+        r"""Returns the barycentric coordinates of the points in the
+        simplices of given vertices (n, d+1, d)."""
+        t = np.transpose(vertices[:, 1:, :] - vertices[:, :1, :], (0, 2, 1))
+        b = (points - vertices[:, 0, :])[:, :, None]
+        mu = np.linalg.solve(t, b)[:, :, 0]
+        return np.concatenate([1. - mu.sum(axis=1)[:, None], mu], axis=1)
+
+    def _basis(self, mesh, cells, bary):
+        r"""Returns the values of the basis functions of the scalar element
+        at the points, (n, space_dim), or None if the element is not a
+        Lagrange element of degree 1 or 2 on simplices."""
+        element = self._space.ufl_element()
+        if isinstance(element, ufl.VectorElement):
+            element = element.sub_elements()[0]
+        elif element.num_sub_elements() > 0:
+            return None
+        tdim = mesh.topology().dim()
+        if (element.family() not in ('Lagrange', 'P') or
+                element.cell().cellname() not in ('triangle',
+                                                  'tetrahedron') or
+                mesh.geometry().dim() != tdim):
+            return None
+        if element.degree() == 1:
+            return bary
+        if element.degree() == 2:
+            vertex = bary * (2. * bary - 1.)
+            edge = np.stack([4. * bary[:, a] * bary[:, b]
+                             for a, b in EDGES[tdim]], axis=1)
+            return np.concatenate([vertex, edge], axis=1)
+        return None
+
+    def _build_matrix(self, mesh, cells, bary):
+        r"""Builds the sparse matrix of the basis values at the points."""
+        dofmap = self._space.dofmap()
+        value_size = self._value_size
+        points = np.flatnonzero(cells >= 0)
+        rows = []
+        cols = []
+        data = []
+        basis = self._basis(mesh, cells[points], bary[points])
+        if len(points) > 0:
+            unique_cells, inverse = np.unique(cells[points],
+                                              return_inverse=True)
+            cell_dofs = np.array([dofmap.cell_dofs(int(c))
+                                  for c in unique_cells])[inverse]
+        for j in range(value_size):
+            if len(points) == 0:
+                break
+            if basis is not None:
+                # vector elements: the dofs of the components are blocks
+                n = basis.shape[1]
+                values = basis
+                dofs = cell_dofs[:, j * n:(j + 1) * n]
+            else:
+                values, dofs = self._evaluate_basis(
+                    mesh, cells[points], self._points[points], cell_dofs, j)
+            rows.append(np.repeat(points * value_size + j, values.shape[1]))
+            cols.append(dofs.ravel())
+            data.append(values.ravel())
+        if rows:
+            rows = np.concatenate(rows)
+            cols = np.concatenate(cols)
+            data = np.concatenate(data)
+        else:
+            rows = cols = np.zeros(0, dtype=np.int64)
+            data = np.zeros(0)
+        # compress the columns on the dofs in use
+        self._dofs, cols = np.unique(cols, return_inverse=True)
+        self._global_dofs = np.array(
+            [dofmap.local_to_global_index(int(d)) for d in self._dofs],
+            dtype=np.int64) if dolfin.MPI.size(self._comm) > 1 else None
+        self._matrix = csr_matrix(
+            (data, (rows, cols)),
+            shape=(len(self._points) * value_size, len(self._dofs)))
+
+    def _evaluate_basis(self, mesh, cells, points, cell_dofs, component):
+        r"""Returns the values of the basis functions of the cells for one
+        component, point by point with ``evaluate_basis_all``."""
+        element = self._space.element()
+        value_size = self._value_size
+        values = np.zeros(cell_dofs.shape)
+        for i, c in enumerate(cells):
+            cell = dolfin.Cell(mesh, int(c))
+            basis = element.evaluate_basis_all(
+                points[i], cell.get_vertex_coordinates(), cell.orientation())
+            values[i] = basis.reshape(-1, value_size)[:, component]
+        return values, cell_dofs
+
+
+def _mpi():
+    r"""Returns the mpi4py MPI module, for the buffer reductions."""
+    from mpi4py import MPI
+    return MPI
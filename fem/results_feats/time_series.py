@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+fem.results_feats.time_series.py
+November 14, 2019
+@author Francois Roy
+"""
+import json
+import queue
+import sys
+import threading
+import dolfin
+from utils import *
+
+# the XDMF topology types of the dolfin cells
+TOPOLOGY_TYPES = {'interval': 'Polyline', 'triangle': 'Triangle',
+                  'tetrahedron': 'Tetrahedron'}
+_ENDIAN = 'Little' if sys.byteorder == 'little' else 'Big'
+_FOOTER = '    </Grid>\n  </Domain>\n</Xdmf>\n'
+
+
+class TimeSeriesWriter(object):
+    r"""Writes the solution fields of a time loop in XDMF time series, one
+    XDMF file per field.
+
+    The solver calls :meth:`write` at each step. On output steps (every
+    ``stride`` steps, or at the first step after each of the output
+    ``times``), the values of the fields at the vertices of the mesh are
+    computed and queued by the solver thread. A background thread appends
+    them to raw binary files with plain file writes, which release the
+    GIL, and appends the snapshot to the XDMF files, while the solver
+    computes the next steps. The queue is bounded, so that the solver waits
+    if the writer falls more than ``max_pending`` snapshots behind.
+
+    The files of the series in ``directory`` are raw arrays in the native
+    byte order, C order:
+
+    - ``mesh_<rank>.bin``: the vertices and the cells of the (local) mesh,
+      written once, float64 (num_vertices, 3) then int64 (num_cells,
+      vertices_per_cell),
+    - ``<name>_<rank>.bin``: the vertex values of the field, float64
+      (num_snapshots, num_vertices, num_components),
+    - ``times.bin``: the times of the snapshots, float64 (num_snapshots,),
+    - ``<name>.xdmf``: the description of the snapshots, e.g. for ParaView,
+    - ``time_series.json``: the number of components of the fields, the
+      cell type and the number of vertices and cells of each partition.
+
+    The series are read back with :class:`TimeSeriesReader`.
+
+    In parallel, each process writes the binary files of its partition from
+    its own thread (no collective call), and the process of rank 0 writes
+    the XDMF files, one spatial collection of the partitions per snapshot;
+    a snapshot may thus be listed shortly before all the processes have
+    written it. :meth:`flush` waits for the snapshots of the process.
+
+    On restart (``t`` is given), the snapshots up to the restart time are
+    kept and the next ones are appended, provided the fields and the
+    partition have not changed.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> writer = TimeSeriesWriter(OUT_DIR, {'u': u1, 'p': p1}, stride=10)
+      >>> for step in range(1, num_steps + 1):
+      ...     t += dt
+      ...     # solve
+      ...     writer.write(step, t, {'u': u1, 'p': p1})
+      >>> writer.close()
+
+    :param directory: The output directory.
+    :type directory: str
+    :param functions: The fields to be written by name, on the same mesh.
+    :type functions: dict
+    :param stride: Number of steps between two outputs, default = 1.
+    :type stride: int
+    :param times: The output times, overrides ``stride`` if not None.
+    :type times: array-like
+    :param asynchronous: Write from a background thread, default = True.
+    :type asynchronous: bool
+    :param max_pending: Maximum number of queued snapshots, default = 2.
+    :type max_pending: int
+    :param t: The restart time, default = None (new series).
+    :type t: float
+    """
+    def __init__(self, directory, functions, stride=1, times=None,
+                 asynchronous=True, max_pending=2, t=None):
+        self._directory = Path(directory)
+        self._stride = max(int(stride), 1)
+        self._times = None if times is None else np.sort(np.asarray(times))
+        self._next_time = 0
+        mesh = list(functions.values())[0].function_space().mesh()
+        self._mesh = mesh
+        self._comm = mesh.mpi_comm()
+        self._rank = dolfin.MPI.rank(self._comm)
+        self._size = dolfin.MPI.size(self._comm)
+        self._components = {name: self._num_components(func)
+                            for name, func in functions.items()}
+        partition = [(mesh.num_vertices(), mesh.num_cells())]
+        if self._size > 1:
+            partition = self._comm.allgather(partition[0])
+        self._meta = {'fields': self._components,
+                      'cell': mesh.ufl_cell().cellname(),
+                      'vertices_per_cell': mesh.cells().shape[1],
+                      'partition': [list(p) for p in partition]}
+        if self._rank == 0:
+            os.makedirs(self._directory, exist_ok=True)
+        dolfin.MPI.barrier(self._comm)
+        self._num_snapshots = self._restart(t) if t is not None else None
+        if self._num_snapshots is None:
+            self._num_snapshots = 0
+            self._new_series()
+        self._files = {name: open(self._file_name(name), 'ab')
+                       for name in self._components}
+        self._times_file = open(self._directory.child('times.bin'), 'ab') \
+            if self._rank == 0 else None
+        self._error = None
+        self._thread = None
+        if asynchronous:
+            self._queue = queue.Queue(maxsize=max(int(max_pending), 1))
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def close(self):
+        r"""Waits for the queued snapshots to be written and closes the
+        files."""
+        if self._thread is not None:
+            self._put(None)
+            self._thread.join()
+            self._thread = None
+        for f in self._files.values():
+            f.close()
+        if self._times_file is not None:
+            self._times_file.close()
+        if self._error is not None:
+            raise self._error
+
+    def flush(self):
+        r"""Waits for the queued snapshots to be written, e.g. before a
+        checkpoint, so that the snapshots up to the checkpoint survive a
+        restart."""
+        if self._thread is not None:
+            self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def is_output(self, step, t):
+        r"""Returns True if the step is an output step.
+
+        :param step: The step index.
+        :type step: int
+        :param t: The time.
+        :type t: float
+        """
+        if self._times is None:
+            return step % self._stride == 0
+        output = False
+        while (self._next_time < len(self._times) and
+               t >= self._times[self._next_time] * (1. - 1e-12)):
+            self._next_time += 1
+            output = True
+        return output
+
+    def num_snapshots(self):
+        r"""Returns the number of snapshots of the series, including the
+        ones kept on restart."""
+        return self._num_snapshots
+
+    def write(self, step, t, functions):
+        r"""Writes the fields if the step is an output step.
+
+        :param step: The step index.
+        :type step: int
+        :param t: The time.
+        :type t: float
+        :param functions: The fields by name.
+        :type functions: dict
+        :return: True if the fields have been written (or queued).
+        """
+        if not self.is_output(step, t):
+            return False
+        if self._error is not None:
+            raise self._error
+        # copy the values, the solver keeps updating the functions
+        data = {name: self._vertex_values(func)
+                for name, func in functions.items()}
+        if self._thread is not None:
+            self._put((t, data))
+        else:
+            self._write(t, data)
+        return True
+
+    def _file_name(self, name):
+        r"""Returns the binary file of the values of a field."""
+        return self._directory.child('{}_{}.bin'.format(name, self._rank))
+
+    def _grid(self, name, t, index):
+        r"""Returns the XDMF grid of a snapshot of a field."""
+        meta = self._meta
+        size = self._components[name]
+        attribute = 'Scalar' if size == 1 else \
+            'Vector' if size == 3 else 'Matrix'
+        grids = []
+        for rank, (num_vertices, num_cells) in enumerate(meta['partition']):
+            mesh_file = 'mesh_{}.bin'.format(rank)
+            grids.append(
+                '<Grid Name="{name}_{rank}" GridType="Uniform">\n'
+                '<Topology TopologyType="{topology}" '
+                'NumberOfElements="{cells}" NodesPerElement="{npe}">\n'
+                '{topo}</Topology>\n'
+                '<Geometry GeometryType="XYZ">\n{geom}</Geometry>\n'
+                '<Attribute Name="{name}" AttributeType="{attribute}" '
+                'Center="Node">\n{values}</Attribute>\n'
+                '</Grid>\n'.format(
+                    name=name, rank=rank, cells=num_cells,
+                    topology=TOPOLOGY_TYPES[meta['cell']],
+                    npe=meta['vertices_per_cell'], attribute=attribute,
+                    topo=_data_item((num_cells, meta['vertices_per_cell']),
+                                    'Int', mesh_file, num_vertices * 3 * 8),
+                    geom=_data_item((num_vertices, 3), 'Float', mesh_file, 0),
+                    values=_data_item(
+                        (num_vertices, size), 'Float',
+                        '{}_{}.bin'.format(name, rank),
+                        index * num_vertices * size * 8)))
+        time = '<Time Value="{!r}"/>\n'.format(float(t))
+        if len(grids) == 1:
+            return grids[0].replace('>\n', '>\n' + time, 1)
+        return ('<Grid Name="{}" GridType="Collection" '
+                'CollectionType="Spatial">\n{}{}</Grid>\n'.format(
+                    name, time, ''.join(grids)))
+
+    def _new_series(self):
+        r"""Writes the mesh and the metadata, and creates empty files."""
+        mesh = self._mesh
+        vertices = np.zeros((mesh.num_vertices(), 3))
+        vertices[:, :mesh.geometry().dim()] = mesh.coordinates()
+        with open(self._directory.child('mesh_{}.bin'.format(self._rank)),
+                  'wb') as f:
+            vertices.tofile(f)
+            mesh.cells().astype(np.int64).tofile(f)
+        for name in self._components:
+            open(self._file_name(name), 'wb').close()
+        if self._rank == 0:
+            open(self._directory.child('times.bin'), 'wb').close()
+            for name in self._components:
+                self._write_xdmf(name, [])
+            tmp = self._directory.child('time_series.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(self._meta, f, indent=2)
+            os.replace(tmp, self._directory.child('time_series.json'))
+        dolfin.MPI.barrier(self._comm)
+
+    @staticmethod
+    def _num_components(func):
+        r"""Returns the number of written components of a field, the 2d
+        vectors are written as 3d vectors."""
+        if func.value_rank() == 1:
+            return max(func.value_size(), 3)
+        return func.value_size()
+
+    def _put(self, item):
+        r"""Queues an item, raises an error if the thread has stopped
+        instead of blocking forever on a full queue."""
+        while True:
+            try:
+                self._queue.put(item, timeout=1.)
+                return
+            except queue.Full:
+                if not self._thread.is_alive():
+                    raise RuntimeError(error(E_WRITER, self._error))
+
+    def _restart(self, t):
+        r"""Keeps the snapshots up to the time ``t`` of an existing series.
+
+        :return: The number of kept snapshots, None if the series can't be
+          continued (missing files, other fields or partition).
+        """
+        directory = self._directory
+        try:
+            with open(directory.child('time_series.json')) as f:
+                meta = json.load(f)
+            times = np.fromfile(directory.child('times.bin'),
+                                dtype=np.float64)
+        except (OSError, ValueError):
+            meta = None
+        found = meta == json.loads(json.dumps(self._meta)) and all(
+            os.path.isfile(self._file_name(name))
+            for name in self._components)
+        if dolfin.MPI.min(self._comm, float(found)) < 1.:
+            return None
+        num = int(np.searchsorted(times, t * (1. + 1e-12) + 1e-300,
+                                  side='right'))
+        num_vertices = self._mesh.num_vertices()
+        for name, size in self._components.items():
+            os.truncate(self._file_name(name), num * num_vertices * size * 8)
+        dolfin.MPI.barrier(self._comm)  # all the processes have read times
+        if self._rank == 0:
+            os.truncate(directory.child('times.bin'), num * 8)
+            for name in self._components:
+                self._write_xdmf(name, times[:num])
+        dolfin.MPI.barrier(self._comm)
+        return num
+
+    def _run(self):
+        r"""Writes the queued snapshots until the ``None`` sentinel. After
+        an error, the queue is still drained so that the solver never
+        blocks, and the error is raised by the solver thread."""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                if self._error is None:
+                    self._write(*item)
+            except Exception as e:
+                logging.error("{}".format(e))
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _vertex_values(self, func):
+        r"""Returns a copy of the values of a field at the vertices, one row
+        per vertex."""
+        size = func.value_size()
+        values = func.compute_vertex_values(self._mesh)
+        values = values.reshape(size, -1).T
+        out = np.zeros((len(values), self._num_components(func)))
+        out[:, :size] = values
+        return out
+
+    def _write(self, t, data):
+        r"""Appends a snapshot to the files."""
+        for name, values in data.items():
+            f = self._files[name]
+            values.tofile(f)
+            f.flush()
+        if self._rank == 0:
+            np.array([t], dtype=np.float64).tofile(self._times_file)
+            self._times_file.flush()
+            for name in data:
+                filename = self._directory.child(name + XDMF)
+                with open(filename, 'r+b') as f:
+                    f.seek(-len(_FOOTER), os.SEEK_END)
+                    f.write((self._grid(name, t, self._num_snapshots) +
+                             _FOOTER).encode())
+        self._num_snapshots += 1
+
+    def _write_xdmf(self, name, times):
+        r"""Writes the XDMF file of a field with the snapshots of the given
+        times."""
+        with open(self._directory.child(name + XDMF), 'w',
+                  newline='\n') as f:
+            f.write('<?xml version="1.0"?>\n<Xdmf Version="2.0">\n'
+                    '  <Domain>\n    <Grid Name="{}" GridType="Collection" '
+                    'CollectionType="Temporal">\n'.format(name))
+            for i, t in enumerate(times):
+                f.write(self._grid(name, t, i))
+            f.write(_FOOTER)
+
+
+class TimeSeriesReader(object):
+    r"""Reads the time series written by :class:`TimeSeriesWriter`.
+
+    The values of a snapshot are read as arrays (one row per vertex of a
+    partition) or into a function of a P1 space on the mesh that has been
+    written, distributed on the same number of processes.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> reader = TimeSeriesReader(OUT_DIR)
+      >>> reader.times()
+      array([0. , 0.1, 0.2])
+      >>> reader.read('p', p, index=-1)  # the last snapshot
+
+    :param directory: The directory of the series.
+    :type directory: str
+    """
+    def __init__(self, directory):
+        self._directory = Path(directory)
+        filename = self._directory.child('time_series.json')
+        if not os.path.isfile(filename):
+            raise ValueError(error(E_PATH, filename))
+        with open(filename) as f:
+            self._meta = json.load(f)
+        self._times = np.fromfile(self._directory.child('times.bin'),
+                                  dtype=np.float64)
+
+    def fields(self):
+        r"""Returns the number of components of the fields by name."""
+        return dict(self._meta['fields'])
+
+    def mesh(self, rank=0):
+        r"""Returns the vertices (num_vertices, 3) and the cells of the mesh
+        of a partition.
+
+        :param rank: The rank of the process that wrote the partition,
+          default = 0.
+        :type rank: int
+        """
+        num_vertices, num_cells = self._meta['partition'][rank]
+        filename = self._directory.child('mesh_{}.bin'.format(rank))
+        vertices = np.fromfile(filename, dtype=np.float64,
+                               count=num_vertices * 3)
+        cells = np.fromfile(filename, dtype=np.int64,
+                            count=num_cells * self._meta['vertices_per_cell'],
+                            offset=num_vertices * 3 * 8)
+        return vertices.reshape(num_vertices, 3), \
+            cells.reshape(num_cells, self._meta['vertices_per_cell'])
+
+    def num_snapshots(self):
+        r"""Returns the number of snapshots."""
+        return len(self._times)
+
+    def read(self, name, func, index=-1):
+        r"""Sets a function to the values of a snapshot of a field.
+
+        :param name: The field name.
+        :type name: str
+        :param func: A function of a P1 (scalar or vector) space on the
+          written mesh, with the same distribution.
+        :type func: dolfin.Function
+        :param index: The index of the snapshot, default = -1 (the last
+          one).
+        :type index: int
+        """
+        space = func.function_space()
+        mesh = space.mesh()
+        comm = mesh.mpi_comm()
+        rank = dolfin.MPI.rank(comm)
+        partition = self._meta['partition']
+        if (len(partition) != dolfin.MPI.size(comm) or
+                partition[rank] != [mesh.num_vertices(), mesh.num_cells()]):
+            raise ValueError(error(E_TIME_SERIES, self._directory))
+        element = space.ufl_element()
+        if element.family() not in ('Lagrange', 'P') or \
+                element.degree() != 1:
+            raise ValueError(error(E_VALID, element, 'space'))
+        values = self.values(name, index, rank)[:, :func.value_size()]
+        # the dof of each component of each vertex
+        dofs = dolfin.vertex_to_dof_map(space)
+        x = func.vector().get_local()
+        owned = dofs < len(x)
+        x[dofs[owned]] = values.ravel()[owned]
+        func.vector().set_local(x)
+        func.vector().apply('insert')
+
+    def times(self):
+        r"""Returns the times of the snapshots."""
+        return self._times
+
+    def values(self, name, index=-1, rank=0):
+        r"""Returns the values of a snapshot of a field at the vertices of a
+        partition, (num_vertices, num_components).
+
+        :param name: The field name.
+        :type name: str
+        :param index: The index of the snapshot, default = -1 (the last
+          one).
+        :type index: int
+        :param rank: The rank of the process that wrote the partition,
+          default = 0.
+        :type rank: int
+        """
+        size = self._meta['fields'][name]
+        num_vertices = self._meta['partition'][rank][0]
+        if index < 0:
+            index += self.num_snapshots()
+        if not 0 <= index < self.num_snapshots():
+            raise ValueError(error(E_VALID, index, 'index'))
+        return np.fromfile(
+            self._directory.child('{}_{}.bin'.format(name, rank)),
+            dtype=np.float64, count=num_vertices * size,
+            offset=index * num_vertices * size * 8).reshape(num_vertices,
+                                                            size)
+
+
+def _data_item(dimensions, number_type, filename, seek):
+    r"""Returns an XDMF data item of a raw binary file."""
+    return ('<DataItem Dimensions="{}" NumberType="{}" Precision="8" '
+            'Format="Binary" Endian="{}" Seek="{}">{}</DataItem>\n'.format(
+                ' '.join(str(d) for d in dimensions), number_type, _ENDIAN,
+                seek, filename))
@@ -4,7 +4,16 @@ fem.solvers.ipcs.py
 November 14, 2019
 @author Francois Roy
 """
+import time
 from fem.solver_feature import *
+from fem.results_feats.time_series import TimeSeriesWriter
+
+# default (method, preconditioner) of the linear solver of each sub-step
+LINEAR_SOLVERS = {
+    'tentative_velocity': ('gmres', 'ilu'),
+    'pressure': ('gmres', 'hypre_amg'),
+    'velocity_correction': ('gmres', 'ilu'),
+}
 
 
 class Ipcs(SolverFeature):
@@ -30,8 +39,81 @@ class Ipcs(SolverFeature):
     The IPCS scheme involves three steps...
 
     https://bazaar.launchpad.net/~nsbench/nsbench/main/files
+
+    :param tag: The solver tag.
+    :type tag: str
+    :param num_steps: Number of time steps, default = 101.
+    :type num_steps: int
+    :param dt: The time step, default = 0.1 s.
+    :type dt: float
+    :param solvers: The (method, preconditioner) of the linear solver of the
+      sub-steps 'tentative_velocity', 'pressure' and 'velocity_correction'
+      overriding :data:`LINEAR_SOLVERS`, e.g.
+      ``{'pressure': ('cg', 'hypre_amg')}``.
+    :type solvers: dict
+    :param adaptive: Adapt the time step to the Courant number and to the
+      local error estimate, default = False. The final time is then
+      ``num_steps * dt`` and ``dt`` is the initial time step.
+    :type adaptive: bool
+    :param cfl: Maximum Courant number of the adaptive mode, default = 0.5.
+    :type cfl: float
+    :param tol: Relative local error tolerance of the adaptive mode,
+      default = 1e-3.
+    :type tol: float
+    :param dt_min: Smallest time step of the adaptive mode, default = dt/100.
+    :type dt_min: float
+    :param dt_max: Largest time step of the adaptive mode, default = 100*dt.
+    :type dt_max: float
+    :param u_tol: Steady-state tolerance on the relative change of the
+      velocity between two steps, the time loop stops as soon as the
+      steady-state tolerances are met. Default = None (no steady-state
+      detection).
+    :type u_tol: float
+    :param p_tol: Steady-state tolerance on the relative change of the
+      pressure between two steps, default = u_tol.
+    :type p_tol: float
+    :param div_tol: Steady-state tolerance on the L2 norm of the divergence
+      of the velocity, default = None (not checked).
+    :type div_tol: float
+    :param stokes_init: Use the solution of the Stokes problem as initial
+      condition, default = False.
+    :type stokes_init: bool
+    :param checkpoint_interval: Number of steps between two checkpoints,
+      default = None (no checkpoint on step count).
+    :type checkpoint_interval: int
+    :param checkpoint_wall_time: Wall time in seconds between two
+      checkpoints, default = None (no checkpoint on wall time).
+    :type checkpoint_wall_time: float
+    :param checkpoint_file: The HDF5 checkpoint file, default to
+      :meth:`checkpoint_file<fem.solver_feature.SolverFeature.checkpoint_file>`.
+    :type checkpoint_file: str
+    :param restart: Continue from the checkpoint file when solving,
+      default = False.
+    :type restart: bool
+    :param output_dir: The directory of the XDMF time series of the velocity
+      and pressure (``u.xdmf`` and ``p.xdmf``), default = None (no output).
+    :type output_dir: str
+    :param output_stride: Number of steps between two outputs, default = 1.
+    :type output_stride: int
+    :param output_times: The output times, overrides ``output_stride`` if not
+      None.
+    :type output_times: array-like
+    :param scheme: The time scheme of the tentative velocity step, 'euler'
+      (first order, default), 'cn' (Crank-Nicolson) or 'bdf2', see
+      :meth:`scheme_coefficients`.
+    :type scheme: str
+    :param convection: The explicit treatment of the convective term of the
+      second order schemes, 'extrapolation' (linear extrapolation of the
+      advecting velocity, default) or 'ab2' (Adams-Bashforth).
+    :type convection: str
     """
-    def __init__(self, tag, parent=None, num_steps=101, dt=0.1, **kwargs):
+    def __init__(self, tag, parent=None, num_steps=101, dt=0.1, solvers=None,
+                 adaptive=False, cfl=0.5, tol=1e-3, dt_min=None, dt_max=None,
+                 u_tol=None, p_tol=None, div_tol=None, stokes_init=False,
+                 checkpoint_interval=None, checkpoint_wall_time=None,
+                 checkpoint_file=None, restart=False, output_dir=None,
+                 output_stride=1, output_times=None, scheme=EULER,
+                 convection=EXTRAPOLATION, **kwargs):
         super().__init__(tag=tag, parent=parent)
         self._valid_children_type = []
         if parent is not None:
@@ -43,19 +125,442 @@ class Ipcs(SolverFeature):
         self._solver_type = IPCS
         self._num_steps = num_steps
         self._dt = dt
+        self._solvers = dict(LINEAR_SOLVERS)
+        if solvers is not None:
+            self._solvers.update(solvers)
+        self._adaptive = adaptive
+        self._cfl = cfl
+        self._tol = tol
+        self._dt_min = dt / 100. if dt_min is None else dt_min
+        self._dt_max = dt * 100. if dt_max is None else dt_max
+        self._time_steps = []
+        self._u_tol = u_tol
+        self._p_tol = u_tol if p_tol is None else p_tol
+        self._div_tol = div_tol
+        self._stokes_init = stokes_init
+        self._checkpoint_interval = checkpoint_interval
+        self._checkpoint_wall_time = checkpoint_wall_time
+        self._checkpoint_file = checkpoint_file
+        self._restart = restart
+        self._output_dir = output_dir
+        self._output_stride = output_stride
+        self._output_times = output_times
+        if scheme not in (EULER, CN, BDF2):
+            raise ValueError(error(E_VALID, scheme, 'scheme'))
+        if convection not in (EXTRAPOLATION, AB2):
+            raise ValueError(error(E_VALID, convection, 'convection'))
+        self._scheme = scheme
+        self._convection = convection
+
+    def scheme_coefficients(self, dt, dt0=None):
+        r"""Returns the coefficients of the time scheme for the time step
+        ``dt`` following the time step ``dt0``.
+
+        The time derivative of the tentative velocity step is
+
+        .. math:: \frac{\partial\mathbf{u}}{\partial t} \approx
+            \frac{\gamma_0\mathbf{u}^{n+1} + \gamma_1\mathbf{u}^n +
+            \gamma_2\mathbf{u}^{n-1}}{k}
+
+        and the convective term is explicit, evaluated from the
+        extrapolation :math:`c_0\mathbf{u}^n + c_1\mathbf{u}^{n-1}` at
+        :math:`t^{n+1}` (Euler, BDF2) or :math:`t^{n+1/2}` (Crank-Nicolson).
+        With :math:`\omega = k/k_0`, the variable step BDF2 coefficients are
+
+        .. math:: \gamma_0 = \frac{1 + 2\omega}{1 + \omega},~
+            \gamma_1 = -(1 + \omega),~
+            \gamma_2 = \frac{\omega^2}{1 + \omega}
+
+        The first step (``dt0`` is None) uses the Euler coefficients.
+
+        :param dt: The time step.
+        :type dt: float
+        :param dt0: The previous time step, None if there is no previous
+          step.
+        :type dt0: float
+        :return: The coefficients :math:`(\gamma_0, \gamma_1, \gamma_2)`
+          and :math:`(c_0, c_1)`.
+        """
+        if self._scheme == EULER or dt0 is None:
+            return (1., -1., 0.), (1., 0.)
+        w = dt / dt0
+        if self._scheme == BDF2:
+            return ((1. + 2. * w) / (1. + w), -(1. + w), w**2 / (1. + w)), \
+                (1. + w, -w)
+        return (1., -1., 0.), (1. + 0.5 * w, -0.5 * w)
+
+    def forms(self):
+        r"""Returns the forms of the three steps (and of the Stokes problem
+        if ``stokes_init``) by name, see :meth:`variational_problem`."""
+        forms = self.variational_problem()[0]
+        if self._stokes_init:
+            forms.update(self.stokes_forms())
+        return forms
+
+    def time_steps(self):
+        r"""Returns the list of time steps taken by the last solve."""
+        return self._time_steps
+
+    def solve(self, restart=None):
+        r"""Solves the three steps of the IPCS over ``num_steps`` time steps.
+
+        The left-hand sides of the three steps don't depend on the time, the
+        matrices are assembled once (with the boundary conditions applied)
+        before the time loop and reused at each step. Only the right-hand
+        sides are assembled in the time loop. The linear solvers of the three
+        steps are created once, see
+        :meth:`linear_solver<fem.solver_feature.SolverFeature.linear_solver>`.
+        When the pressure has no Dirichlet boundary conditions, the constant
+        nullspace is attached to the pressure operator.
+
+        When the component is axisymmetric, the integrands are weighted by
+        the radial coordinate and the strain-rate tensor and the divergence
+        are the axisymmetric ones, see
+        :class:`LaminarFlow<fem.physics_feats.laminar_flow.LaminarFlow>`.
+        With the equal-order discretization, the SUPG and grad-div terms are
+        evaluated explicitly on the previous step (in the right-hand side of
+        the tentative velocity step), and the pressure is stabilized by the
+        pressure correction step.
+
+        The convective term is explicit for all the time schemes, see
+        :meth:`scheme_coefficients`. The tentative velocity matrix (the only
+        operator depending on :math:`\gamma_0/k`) is therefore assembled
+        again only when the time step or :math:`\gamma_0` change, i.e. after
+        the first step of the BDF2 scheme and after the time step changes.
+        In adaptive mode the time step is updated after each step, see
+        :meth:`adapt_time_step`; a step exceeding the Courant number or the
+        error tolerance is rejected and computed again with the smaller time
+        step (unless the time step is already ``dt_min``), and a last step
+        shorter than ``dt_min`` is merged into the previous one.
+
+        When ``u_tol`` is defined, the time loop stops as soon as the
+        relative changes of the velocity and pressure between two steps (and
+        the divergence of the velocity if ``div_tol`` is defined) are below
+        the tolerances. The stop reason and the number of steps are recorded
+        on the parent study.
+
+        The wall time of each phase of each step (right-hand side assembly,
+        boundary conditions, linear solves, outputs) and the linear solver
+        iterations are recorded in
+        :meth:`stats<fem.solver_feature.SolverFeature.stats>`.
+
+        The velocity (at the last two steps), pressure, time, time steps
+        and step index are saved periodically in the checkpoint file (every
+        ``checkpoint_interval`` steps and/or ``checkpoint_wall_time``
+        seconds) and at the end of the time loop. On restart, the fields are
+        read from the checkpoint file (on the same mesh) and the time loop
+        continues from the saved time.
 
-    def solve(self):
-        r""""""
-        pc = "ilu"  # pre-conditioner
+        When ``output_dir`` is defined, the velocity and pressure are written
+        in XDMF time series by a
+        :class:`TimeSeriesWriter<fem.results_feats.time_series.TimeSeriesWriter>`
+        that does the I/O in a background thread. On restart, the snapshots
+        up to the restart time are kept and the next ones are appended.
 
-        # Get problem parameters
+        The probes added with
+        :meth:`add_probe<fem.solver_feature.SolverFeature.add_probe>` record
+        the velocity and pressure at their points along the time loop, see
+        :class:`Probe<fem.results_feats.probe.Probe>`; on restart, their
+        records are continued from the restart time.
 
+        :param restart: Continue from the checkpoint file, default to the
+          ``restart`` argument of the solver.
+        :type restart: bool
+        :return: The velocity and pressure fields at the final time.
+        """
+        forms, functions, constants = self.variational_problem()
+        a1, l1, a2, l2, a3, l3, speed, div_u = [
+            forms[key] for key in ('a1', 'l1', 'a2', 'l2', 'a3', 'l3',
+                                   'speed', 'div_u')]
+        u0, u00, u1, p0, p1 = [
+            functions[key] for key in ('u0', 'u00', 'u1', 'p0', 'p1')]
+        k, g0, g1, g2, c0, c1 = [
+            constants[key] for key in ('k', 'g0', 'g1', 'g2', 'c0', 'c1')]
+        q_space = p1.function_space()
+
+        # Get boundary conditions
+        bcu, bcp = self._physics.boundary_conditions()
+
+        t = 0.
+        step = 0
+        dt0 = None  # previous time step
+        if restart is None:
+            restart = self._restart
+        if restart:
+            attr = self.load_checkpoint({'u': u0, 'p': p0, 'u00': u00})
+            t = float(attr['t'])
+            step = int(attr['step'])
+            k.assign(float(attr['dt']))
+            if float(attr['dt0']) > 0.:
+                dt0 = float(attr['dt0'])
+            u1.assign(u0)
+            p1.assign(p0)
+            logging.info("{} restarted from t = {} s (step {})".format(
+                self._tag, t, step))
+        elif self._stokes_init:
+            w = self.stokes()
+            dolfin.assign(u0, w.sub(0))
+            dolfin.assign(p0, w.sub(1))
+            u1.assign(u0)
+            p1.assign(p0)
+        if dt0 is None:
+            u00.assign(u0)
+
+        # Assemble the time-invariant matrices once, the tentative velocity
+        # matrix is assembled in the time loop when k or g0 change
+        a_2 = dolfin.assemble(a2)
+        a_3 = dolfin.assemble(a3)
+        [bc.apply(a_2) for bc in bcp]
+        [bc.apply(a_3) for bc in bcu]
+        a1_key = None
+
+        # Create the linear solvers once
+        self.clear_linear_solvers()
+        nullspace = None
+        if len(bcp) == 0:
+            nullspace = self.constant_nullspace(q_space, p1.vector())
+        self.linear_solver('pressure', a_2, *self._solvers['pressure'],
+                           nullspace=nullspace)
+        self.linear_solver('velocity_correction', a_3,
+                           *self._solvers['velocity_correction'])
+
+        stop_reason = END_TIME
+
+        def checkpoint():
+            self.save_checkpoint({'u': u1, 'p': p1, 'u00': u00}, t=t,
+                                 dt=float(k), step=step,
+                                 dt0=0. if dt0 is None else dt0)
+            # the records up to the checkpoint survive a restart
+            [probe.flush() for probe in self._probes]
+            if writer is not None:
+                writer.flush()
+
+        checkpointing = (self._checkpoint_interval is not None or
+                         self._checkpoint_wall_time is not None)
+        wall_time = time.perf_counter()
+
+        writer = None
+        if self._output_dir is not None:
+            writer = TimeSeriesWriter(self._output_dir, {'u': u1, 'p': p1},
+                                      stride=self._output_stride,
+                                      times=self._output_times,
+                                      t=t if restart else None)
+            if not restart:
+                writer.write(step, t, {'u': u0, 'p': p0})
+        for probe in self._probes:
+            probe.start({'u': u0, 'p': p0}, t=t if restart else None)
+            if not restart:
+                probe.record(step, t, {'u': u0, 'p': p0})
+
+        # Time-stepping
+        t_end = self._num_steps * self._dt
+        self._time_steps = []
+        stats = self._stats
+        stats.clear()
+        while t_end - t > 1e-8 * self._dt:
+            # Update current time
+            dt = float(k)
+            t += dt
+            step += 1
+            stats.start_step(step, t=t, dt=dt)
+            # time-dependent boundary values, updated in place
+            self._physics.set_time(t)
+
+            # Update the coefficients of the time scheme
+            gamma, c = self.scheme_coefficients(dt, dt0)
+            [g.assign(value) for g, value in zip((g0, g1, g2), gamma)]
+            [ci.assign(value) for ci, value in zip((c0, c1), c)]
+            if a1_key != (dt, gamma[0]):
+                # the tentative velocity matrix depends on g0/k
+                with stats.timer('assemble_lhs'):
+                    a_1 = dolfin.assemble(a1)
+                    [bc.apply(a_1) for bc in bcu]
+                self.clear_linear_solvers('tentative_velocity')
+                self.linear_solver('tentative_velocity', a_1,
+                                   *self._solvers['tentative_velocity'])
+                a1_key = (dt, gamma[0])
+
+            # Step 1: Tentative velocity step
+            with stats.timer('assemble_rhs'):
+                b1 = dolfin.assemble(l1)
+            with stats.timer('apply_bcs'):
+                [bc.apply(b1) for bc in bcu]
+            self.linear_solve('tentative_velocity', u1.vector(), b1)
+
+            # Step 2: Pressure correction step
+            with stats.timer('assemble_rhs'):
+                b2 = dolfin.assemble(l2)
+            with stats.timer('apply_bcs'):
+                [bc.apply(b2) for bc in bcp]
+            self.linear_solve('pressure', p1.vector(), b2)
+
+            # Step 3: Velocity correction step
+            with stats.timer('assemble_rhs'):
+                b3 = dolfin.assemble(l3)
+            with stats.timer('apply_bcs'):
+                [bc.apply(b3) for bc in bcu]
+            self.linear_solve('velocity_correction', u1.vector(), b3)
+
+            if self._adaptive:
+                with stats.timer('adapt'):
+                    courant = dt * dolfin.assemble(speed).max()
+                    error = None
+                    if dt0 is not None:
+                        # compare with the linear extrapolation of the
+                        # previous steps
+                        r = dt / dt0
+                        e = u0.vector().copy()
+                        e *= 1. + r
+                        e.axpy(-r, u00.vector())
+                        e.axpy(-1., u1.vector())
+                        norm = u1.vector().norm('l2')
+                        if norm > 0.:
+                            error = e.norm('l2') / norm
+                    accepted, new_dt = self.accept_time_step(
+                        dt, courant, error, t_end - t)
+                stats.add('courant', courant)
+                if not accepted:
+                    # reject the step, u0, u00 and p0 are unchanged
+                    stats.add('rejected', True)
+                    t -= dt
+                    step -= 1
+                    k.assign(new_dt)
+                    continue
+                if new_dt > 1e-8 * self._dt:
+                    k.assign(new_dt)
+            self._time_steps.append(dt)
+
+            steady = False
+            if self._u_tol is not None:
+                with stats.timer('monitor'):
+                    steady = self.is_steady(u0, u1, p0, p1, div_u)
+
+            # Update previous solutions
+            u00.assign(u0)
+            u0.assign(u1)
+            p0.assign(p1)
+            dt0 = dt
+
+            with stats.timer('output'):
+                if writer is not None:
+                    writer.write(step, t, {'u': u1, 'p': p1})
+                for probe in self._probes:
+                    probe.record(step, t, {'u': u1, 'p': p1})
+                if ((self._checkpoint_interval is not None and
+                     step % self._checkpoint_interval == 0) or
+                        (self._checkpoint_wall_time is not None and
+                         time.perf_counter() - wall_time >=
+                         self._checkpoint_wall_time)):
+                    checkpoint()
+                    wall_time = time.perf_counter()
+
+            if steady:
+                stop_reason = STEADY_STATE
+                break
+        if checkpointing:
+            checkpoint()
+        if writer is not None:
+            writer.close()
+        for probe in self._probes:
+            probe.close()
+        self._solution = u1, p1
+        self.set_status(stop_reason=stop_reason, num_steps=step, t=t)
+        return u1, p1
+
+    def is_steady(self, u0, u1, p0, p1, div_u=None):
+        r"""Checks the steady-state criteria between two steps.
+
+        :param u0: The velocity at the previous step.
+        :param u1: The velocity at the current step.
+        :param p0: The pressure at the previous step.
+        :param p1: The pressure at the current step.
+        :param div_u: The form of the squared divergence of the velocity.
+        :return: True if the tolerances are met.
+        """
+        def change(x0, x1):
+            norm = x1.vector().norm('l2')
+            diff = x1.vector() - x0.vector()
+            return diff.norm('l2') / norm if norm > 0. else diff.norm('l2')
+
+        if change(u0, u1) > self._u_tol or change(p0, p1) > self._p_tol:
+            return False
+        if self._div_tol is not None and div_u is not None:
+            return np.sqrt(abs(dolfin.assemble(div_u))) <= self._div_tol
+        return True
+
+    def adapt_time_step(self, dt, courant, error=None):
+        r"""Returns the next time step from the maximum cell-wise Courant
+        number and the relative local error estimate of the last step.
+
+        The time step is decreased as soon as one of the criteria is
+        violated, but it is only increased when it can grow by more than 25%,
+        so that the operators are not rebuilt for small variations.
+
+        :param dt: The current time step.
+        :type dt: float
+        :param courant: The maximum Courant number of the last step.
+        :type courant: float
+        :param error: The relative difference between the computed velocity
+          and its extrapolation from the previous steps, None if unknown.
+        :type error: float
+        :return: The next time step, bounded by ``dt_min`` and ``dt_max``.
+        """
+        safety = 0.9
+        factor = 2.  # maximum growth per step
+        if courant > 0.:
+            factor = min(factor, safety * self._cfl / courant)
+        if error is not None and error > 0.:
+            # the extrapolation error is O(dt^2)
+            factor = min(factor, safety * np.sqrt(self._tol / error))
+        factor = max(factor, 0.2)
+        if 1. <= factor < 1.25:
+            return dt
+        return float(np.clip(dt * factor, self._dt_min, self._dt_max))
+
+    def accept_time_step(self, dt, courant, error=None, remaining=None):
+        r"""Decides whether the last step is accepted and returns the next
+        time step, see :meth:`adapt_time_step`.
+
+        A step violating the CFL or the error criterion is rejected and
+        repeated with a smaller time step, unless the time step cannot be
+        decreased any more (``dt_min``). After an accepted step, a last step
+        that would leave less than ``dt_min`` before the end time is merged
+        with the remaining time.
+
+        :param dt: The current time step.
+        :type dt: float
+        :param courant: The maximum Courant number of the last step.
+        :type courant: float
+        :param error: The relative difference between the computed velocity
+          and its extrapolation from the previous steps, None if unknown.
+        :type error: float
+        :param remaining: The time remaining after the last step, None if
+          the end time is not limiting.
+        :type remaining: float
+        :return: True if the step is accepted, and the next time step.
+        """
+        new_dt = self.adapt_time_step(dt, courant, error)
+        if (courant > self._cfl or
+                (error is not None and error > self._tol)) and new_dt < dt:
+            return False, new_dt
+        if remaining is not None and remaining - new_dt < self._dt_min:
+            new_dt = remaining
+        return True, new_dt
+
+    def variational_problem(self):
+        r"""Creates the variational forms of the three steps of the IPCS.
+
+        :return: The forms ('a1', 'l1', 'a2', 'l2', 'a3', 'l3', and the
+          monitors 'speed' and 'div_u'), the functions ('u0', 'u00', 'u1',
+          'p0', 'p1', initialized with the initial conditions) and the
+          constants ('k', 'g0', 'g1', 'g2', 'c0', 'c1') of the forms, by
+          name.
+        """
         # Define function spaces
         v_space, q_space = self._physics.fes()
 
-        # Get initial and boundary conditions
-        u0, p0 = self._physics.initial_conditions()
-        bcu, bcp = self._physics.boundary_conditions()
+        # Get initial conditions
+        u_init, p_init = self._physics.initial_conditions()
 
         beta = dolfin.Constant(1)
 
@@ -66,101 +571,78 @@ class Ipcs(SolverFeature):
         p = dolfin.TrialFunction(q_space)
 
         # Functions
-        u0 = dolfin.interpolate(u0, v_space)
+        u0 = dolfin.interpolate(u_init, v_space)
+        u00 = dolfin.Function(v_space)  # solution at the previous-previous step
         u1 = dolfin.Function(v_space)
-        p0 = dolfin.interpolate(p0, q_space)
-        p1 = dolfin.interpolate(p0, q_space)
-        mu, rho = self._physics.fluid_properties()
+        p0 = dolfin.interpolate(p_init, q_space)
+        p1 = dolfin.interpolate(p_init, q_space)
+        rho, mu = self._physics.fluid_properties()
         k = dolfin.Constant(self._dt)
         f = self._physics.volumetric_force()
         n = dolfin.FacetNormal(self._mesh)
         epsilon = self._physics.strain_rate_tensor
-        sigma = self._physics.molecuar_stress_tensor
+        sigma = self._physics.molecular_stress_tensor
+        div = self._physics.divergence
+        r = self._physics.weight()  # radial coordinate if axisymmetric
         dx = dolfin.dx
         ds = dolfin.ds
 
-        # Tentative velocity step
-        u_mid = 0.5 * (u0 + u)
-        f1 = ((1 / k) * dolfin.inner(v, u - u0) * dx +
-              dolfin.inner(v, dolfin.grad(u0) * u0) * dx +
-              dolfin.inner(epsilon(v), sigma(u_mid, p0, mu)) * dx +
-              dolfin.inner(v, p0 * n) * ds -
-              beta * mu * dolfin.inner(dolfin.grad(u_mid).T * n, v) * ds -
-              dolfin.inner(v, f) * dx)
+        # Coefficients of the time scheme, updated at each step
+        g0, g1, g2 = [dolfin.Constant(c) for c in (1., -1., 0.)]
+        c0, c1 = [dolfin.Constant(c) for c in (1., 0.)]
+        theta = 1. if self._scheme == BDF2 else 0.5
+
+        # Tentative velocity step, explicit convection
+        if self._convection == AB2:
+            convection = (c0 * dolfin.grad(u0) * u0 +
+                          c1 * dolfin.grad(u00) * u00)
+        else:
+            u_star = c0 * u0 + c1 * u00
+            convection = dolfin.grad(u_star) * u_star
+        u_mid = theta * u + (1. - theta) * u0
+        f1 = (rho / k * dolfin.inner(v, g0 * u + g1 * u0 + g2 * u00) * r * dx +
+              rho * dolfin.inner(v, convection) * r * dx +
+              dolfin.inner(epsilon(v), sigma(u_mid, p0, mu)) * r * dx +
+              dolfin.inner(v, p0 * n) * r * ds -
+              beta * mu * dolfin.inner(dolfin.grad(u_mid).T * n, v) * r * ds -
+              dolfin.inner(v, f) * r * dx)
+        if self._physics.is_stabilized():
+            # explicit SUPG and grad-div terms of the equal-order elements,
+            # the pressure is stabilized by the pressure correction
+            tau_m, tau_c = self._physics.stabilization_parameters(u0, rho, mu,
+                                                                  k)
+            res_m = (rho * (u0 - u00) / k + rho * dolfin.grad(u0) * u0 +
+                     dolfin.grad(p0) - f)
+            f1 += (tau_m * dolfin.inner(rho * dolfin.grad(v) * u0, res_m) *
+                   r * dx +
+                   tau_c * rho * div(u0) * div(v) * r * dx)
         a1 = dolfin.lhs(f1)
         l1 = dolfin.rhs(f1)
 
-        """
         # Pressure correction
-        a2 = inner(grad(q), grad(p)) * dx
-        L2 = inner(grad(q), grad(p0)) * dx - (1 / k) * q * div(u1) * dx
+        a2 = dolfin.inner(dolfin.grad(q), dolfin.grad(p)) * r * dx
+        l2 = (dolfin.inner(dolfin.grad(q), dolfin.grad(p0)) * r * dx -
+              (g0 * rho / k) * q * div(u1) * r * dx)
 
         # Velocity correction
-        a3 = inner(v, u) * dx
-        L3 = inner(v, u1) * dx - k * inner(v, grad(p1 - p0)) * dx
-
-        # Assemble matrices
-        A1 = assemble(a1)
-        A2 = assemble(a2)
-        A3 = assemble(a3)
-
-        # Time loop
-        self.start_timing()
-        for t in t_range:
-
-            # Get boundary conditions
-            bcu, bcp = problem.boundary_conditions(V, Q, t)
-
-            # Compute tentative velocity step
-            b = assemble(L1)
-            [bc.apply(A1, b) for bc in bcu]
-            solve(A1, u1.vector(), b, "gmres", "ilu")
-
-            # Pressure correction
-            b = assemble(L2)
-            if len(bcp) == 0 or is_periodic(bcp): normalize(b)
-            [bc.apply(A2, b) for bc in bcp]
-            if is_periodic(bcp):
-                solve(A2, p1.vector(), b)
-            else:
-                solve(A2, p1.vector(), b, 'gmres', 'hypre_amg')
-            if len(bcp) == 0 or is_periodic(bcp): normalize(p1.vector())
-
-            # Velocity correction
-            b = assemble(L3)
-            [bc.apply(A3, b) for bc in bcu]
-            solve(A3, u1.vector(), b, "gmres", pc)
-
-            # Update
-            self.update(problem, t, u1, p1)
-            u0.assign(u1)
-            p0.assign(p1)
-        
-        # Time-stepping
-        t = 0
-        for n in range(self._num_steps):
-            # Update current time
-            t += self._dt
+        a3 = dolfin.inner(v, u) * r * dx
+        l3 = (dolfin.inner(v, u1) * r * dx -
+              (k / (g0 * rho)) * dolfin.inner(v, dolfin.grad(p1 - p0)) * r *
+              dx)
 
-            # Step 1: Tentative velocity step
-            b1 = dolfin.assemble(L1)
-            [bc.apply(b1) for bc in bcu]
-            dolfin.solve(A1, u_.vector(), b1)
+        # Cell-wise |u|/h, the Courant number is dt * |u|/h
+        w_space = dolfin.FunctionSpace(self._mesh, 'DG', 0)
+        speed = (dolfin.TestFunction(w_space) *
+                 dolfin.sqrt(dolfin.inner(u1, u1)) /
+                 dolfin.CellDiameter(self._mesh) /
+                 dolfin.CellVolume(self._mesh) * dx)
 
-            # Step 2: Pressure correction step
-            b2 = dolfin.assemble(L2)
-            [bc.apply(b2) for bc in bcp]
-            dolfin.solve(A2, p_.vector(), b2)
-
-            # Step 3: Velocity correction step
-            b3 = dolfin.assemble(L3)
-            dolfin.solve(A3, u_.vector(), b3)
-
-            # Update previous solution
-            u_n.assign(u_)
-            p_n.assign(p_)
-        self._solution = u_n, p_n
-        return u_n, p_n
-        """
-        return None
+        # Steady-state monitor
+        div_u = div(u1)**2 * r * dx
 
+        forms = {'a1': a1, 'l1': l1, 'a2': a2, 'l2': l2, 'a3': a3, 'l3': l3,
+                 'speed': speed, 'div_u': div_u}
+        functions = {'u0': u0, 'u00': u00, 'u1': u1, 'p0': p0, 'p1': p1}
+        constants = {'k': k, 'g0': g0, 'g1': g1, 'g2': g2, 'c0': c0,
+                     'c1': c1}
+        return forms, functions, constants
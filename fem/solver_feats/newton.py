@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+fem.solvers.newton.py
+November 14, 2019
+@author Francois Roy
+"""
+from fem.solver_feature import *
+
+
+class Newton(SolverFeature):
+    r"""Solves the steady incompressible Navier-Stokes equations directly
+    with Newton iterations on the mixed (velocity, pressure) space built
+    from the spaces of the physics, e.g. the Taylor-Hood space P2/P1.
+
+    The residual of the steady problem is
+
+    .. math:: F(\mathbf{u}, p) = \int_\Omega \lambda\rho
+        (\mathbf{u}\cdot\nabla\mathbf{u})\cdot\mathbf{v}
+        + \bar{\pi}:\bar{\epsilon}(\mathbf{v})
+        - q\nabla\cdot\mathbf{u} - \mathbf{F}\cdot\mathbf{v}~d\mathbf{x}
+        + \int_{\delta\Omega} p\hat{\mathbf{n}}\cdot\mathbf{v}
+        - \mu(\nabla\mathbf{u})^T\hat{\mathbf{n}}\cdot\mathbf{v}~ds
+
+    where the boundary terms are the same as the ones of the tentative
+    velocity step of :class:`fem.solver_feats.ipcs.Ipcs` (weighted by the
+    radial coordinate if the component is axisymmetric), plus the PSPG, SUPG
+    and grad-div terms of the equal-order discretization, see
+    :meth:`stabilization_parameters
+    <fem.physics_feats.laminar_flow.LaminarFlow.stabilization_parameters>`.
+    The Jacobian is
+    derived automatically, and each Newton update is damped by a
+    backtracking line search on the norm of the residual.
+
+    The Reynolds number continuation increases the factor :math:`\lambda` of
+    the convective term from :math:`1/n` to 1 in ``n`` stages, each stage
+    starting from the solution of the previous one. The first stage starts
+    from the solution of the Stokes problem.
+
+    :param tag: The solver tag.
+    :type tag: str
+    :param max_iter: Maximum number of Newton iterations per continuation
+      stage, default = 25.
+    :type max_iter: int
+    :param rtol: Relative tolerance on the norm of the residual,
+      default = 1e-8.
+    :type rtol: float
+    :param atol: Absolute tolerance on the norm of the residual,
+      default = 1e-10.
+    :type atol: float
+    :param line_search: Damp the Newton updates, default = True.
+    :type line_search: bool
+    :param continuation: Number of Reynolds number continuation stages,
+      default = 1 (no continuation).
+    :type continuation: int
+    :param stokes_init: Use the solution of the Stokes problem as initial
+      guess, default = True.
+    :type stokes_init: bool
+    :param method: The LU method of the linear solves, default = 'lu'.
+    :type method: str
+    """
+    def __init__(self, tag, parent=None, max_iter=25, rtol=1e-8, atol=1e-10,
+                 line_search=True, continuation=1, stokes_init=True,
+                 method='lu', **kwargs):
+        super().__init__(tag=tag, parent=parent)
+        self._valid_children_type = []
+        if parent is not None:
+            # automatically add class instance to parent if exists
+            parent.add_child(self)
+        if kwargs.keys():
+            for key in kwargs.keys():
+                setattr(self, "_"+key, kwargs[key])
+        self._solver_type = NEWTON
+        self._max_iter = int(max_iter)
+        self._rtol = rtol
+        self._atol = atol
+        self._line_search = line_search
+        self._continuation = max(int(continuation), 1)
+        self._stokes_init = stokes_init
+        self._method = method
+        self._iterations = []
+
+    def forms(self):
+        r"""Returns the forms of the Newton iterations (and of the Stokes
+        problem if ``stokes_init``) by name."""
+        w_space = self.mixed_space()
+        forms = self.variational_problem(w_space)[0]
+        if self._stokes_init:
+            forms.update(self.stokes_forms(w_space))
+        return forms
+
+    def iterations(self):
+        r"""Returns the number of Newton iterations of each continuation
+        stage of the last solve."""
+        return self._iterations
+
+    def newton(self, residual, jacobian, w, bcs):
+        r"""Newton iterations with backtracking line search.
+
+        :param residual: The residual form.
+        :param jacobian: The Jacobian form.
+        :param w: The mixed solution, used as initial guess.
+        :param bcs: The homogeneous Dirichlet boundary conditions of the
+          updates.
+        :return: The number of iterations.
+        """
+        dw = dolfin.Function(w.function_space())
+        norm0 = None
+        stats = self._stats
+        for i in range(self._max_iter + 1):
+            stats.start_step(len(stats.steps()) + 1, iteration=i)
+            with stats.timer('assemble_system'):
+                a, b = dolfin.assemble_system(jacobian, -residual, bcs)
+            norm = b.norm('l2')
+            stats.add('residual', norm)
+            if norm0 is None:
+                norm0 = norm
+            logging.debug("{} iteration {}: residual {:.3e}".format(
+                self._tag, i, norm))
+            if norm <= self._atol or norm <= self._rtol * norm0:
+                return i
+            if i == self._max_iter:
+                break
+            with stats.timer('solve_newton'):
+                dolfin.solve(a, dw.vector(), b, self._method)
+            w0 = w.vector().copy()
+            alpha = 1.
+            while True:
+                w.vector().zero()
+                w.vector().axpy(1., w0)
+                w.vector().axpy(alpha, dw.vector())
+                if not self._line_search or alpha < 1. / 32:
+                    break
+                with stats.timer('line_search'):
+                    b = dolfin.assemble(-residual)
+                    [bc.apply(b) for bc in bcs]
+                # sufficient decrease of the residual norm
+                if b.norm('l2') <= (1. - 1e-4 * alpha) * norm:
+                    break
+                alpha *= 0.5
+            stats.add('alpha', alpha)
+        self.set_status(converged=False, iterations=self._iterations)
+        raise RuntimeError(error(E_CONVERGENCE, self._solver_type,
+                                 self._max_iter))
+
+    def solve(self, restart=None):
+        r"""Solves the steady problem.
+
+        :param restart: Ignored, the steady problem has no checkpoint; same
+          signature as the other solvers, see :meth:`Study.run
+          <fem.study.Study.run>`.
+        :type restart: bool
+        :return: The velocity and pressure fields.
+        """
+        w_space = self.mixed_space()
+        bcu, bcp = self._physics.boundary_conditions(mixed=True)
+        bcs = bcu + bcp
+        # the Newton updates satisfy homogeneous boundary conditions
+        bcs0 = [dolfin.DirichletBC(bc) for bc in bcs]
+        [bc.homogenize() for bc in bcs0]
+
+        forms, w, lmbda = self.variational_problem(w_space)
+        if self._stokes_init:
+            w.assign(self.stokes(w_space))
+        [bc.apply(w.vector()) for bc in bcs]
+
+        residual = forms['residual']
+        jacobian = forms['jacobian']
+
+        self._iterations = []
+        self._stats.clear()
+        for i in range(1, self._continuation + 1):
+            lmbda.assign(float(i) / self._continuation)
+            self._iterations.append(self.newton(residual, jacobian, w, bcs0))
+        u1, p1 = w.split(deepcopy=True)
+        self._solution = u1, p1
+        self.set_status(converged=True, iterations=self._iterations)
+        return u1, p1
+
+    def variational_problem(self, w_space=None):
+        r"""Creates the residual and the Jacobian of the steady problem.
+
+        :param w_space: The mixed space, default to
+          :meth:`mixed_space<fem.solver_feature.SolverFeature.mixed_space>`.
+        :return: The forms ('residual' and 'jacobian') by name, the mixed
+          solution and the continuation factor of the forms.
+        """
+        if w_space is None:
+            w_space = self.mixed_space()
+        w = dolfin.Function(w_space)
+        u, p = dolfin.split(w)
+        v, q = dolfin.TestFunctions(w_space)
+        rho, mu = self._physics.fluid_properties()
+        f = self._physics.volumetric_force()
+        n = dolfin.FacetNormal(self._mesh)
+        epsilon = self._physics.strain_rate_tensor
+        sigma = self._physics.molecular_stress_tensor
+        div = self._physics.divergence
+        r = self._physics.weight()  # radial coordinate if axisymmetric
+        lmbda = dolfin.Constant(1.)  # continuation factor
+        dx = dolfin.dx
+        ds = dolfin.ds
+
+        convection = lmbda * rho * dolfin.inner(v, dolfin.grad(u) * u)
+        residual = (convection * r * dx +
+                    dolfin.inner(epsilon(v), sigma(u, p, mu)) * r * dx +
+                    dolfin.inner(v, p * n) * r * ds -
+                    mu * dolfin.inner(dolfin.grad(u).T * n, v) * r * ds -
+                    q * div(u) * r * dx -
+                    dolfin.inner(v, f) * r * dx)
+        if self._physics.is_stabilized():
+            # PSPG/SUPG/grad-div terms of the equal-order elements
+            tau_m, tau_c = self._physics.stabilization_parameters(u, rho, mu)
+            res_m = (lmbda * rho * dolfin.grad(u) * u + dolfin.grad(p) - f)
+            residual += (
+                tau_m * dolfin.inner(lmbda * rho * dolfin.grad(v) * u,
+                                     res_m) * r * dx -
+                tau_m / rho * dolfin.inner(dolfin.grad(q), res_m) * r * dx +
+                tau_c * rho * div(u) * div(v) * r * dx)
+        jacobian = dolfin.derivative(residual, w,
+                                     dolfin.TrialFunction(w_space))
+        return {'residual': residual, 'jacobian': jacobian}, w, lmbda
@@ -5,8 +5,10 @@ November 14, 2019
 @author Francois Roy
 """
 from collections import namedtuple
+import dolfin
 from utils import *
 from utils.node import *
+from fem.solver_stats import SolverStats
 
 CONTAINER = namedtuple('container', ['code', 'label'])
 
@@ -29,7 +31,11 @@ class SolverFeature(Node):
         self._valid_children_type = [IPCS]
         self._physics = None
         self._mesh = None
+        self._probes = []
         self._solution = None
+        self._linear_solvers = {}
+        self._checkpoint_file = None
+        self._stats = SolverStats()
         if parent is not None:
             # automatically add class instance to parent if exists
             parent.add_child(self)
@@ -45,13 +51,280 @@ class SolverFeature(Node):
         r""""""
         self._mesh = mesh
 
+    def add_probe(self, probe):
+        r"""Adds a probe recording the fields along the time loop, see
+        :class:`Probe<fem.results_feats.probe.Probe>`."""
+        self._probes.append(probe)
+
+    def checkpoint_file(self):
+        r"""Returns the checkpoint file name, default to
+        ``out_dir()/<model>_<study>_<solver>_checkpoint.h5``, see
+        :func:`utils.out_dir`."""
+        if self._checkpoint_file is not None:
+            return self._checkpoint_file
+        tags = []
+        node = self
+        while node is not None:
+            tags.insert(0, node.tag)
+            node = node.parent()
+        return out_dir().child("_".join(tags) + CHECKPOINT_H5)
+
+    def clear_linear_solvers(self, key=None):
+        r"""Deletes the linear solvers, the preconditioners and
+        factorizations are rebuilt on the next call to
+        :meth:`linear_solver`.
+
+        :param key: The sub-step name, delete all the solvers if None.
+        :type key: str
+        """
+        if key is None:
+            self._linear_solvers = {}
+        else:
+            self._linear_solvers.pop(key, None)
+
+    @staticmethod
+    def constant_nullspace(space, vector):
+        r"""Returns the (normalized) basis of the constant functions of a
+        scalar function space, i.e. the nullspace of a pure Neumann problem.
+
+        :param space: The scalar function space.
+        :param vector: A vector with the parallel layout of the space.
+        :return: The nullspace basis.
+        """
+        null_vec = dolfin.Vector(vector)
+        space.dofmap().set(null_vec, 1.0)
+        null_vec *= 1.0 / null_vec.norm("l2")
+        return dolfin.VectorSpaceBasis([null_vec])
+
     def data(self, column):
         pass
 
+    def forms(self):
+        r"""Returns the variational forms compiled by :meth:`solve` by name,
+        e.g. to fill the cache of compiled forms ahead of the solve, see
+        :class:`fem.jit_cache.JitCache`."""
+        return {}
+
+    def has_checkpoint(self):
+        r"""Returns True if the checkpoint file exists."""
+        return os.path.exists(self.checkpoint_file())
+
+    def linear_solve(self, key, x, b):
+        r"""Solves the linear system of a given sub-step with the solver
+        created by :meth:`linear_solver`. The right-hand side is made
+        orthogonal to the nullspace of the operator if any. The wall time,
+        the number of iterations and the final residual (Krylov solvers,
+        requires petsc4py) are recorded in :meth:`stats`.
+
+        :param key: The sub-step name.
+        :type key: str
+        :param x: The solution vector, also used as initial guess.
+        :param b: The right-hand side vector.
+        :return: The number of iterations.
+        """
+        solver, nullspace = self._linear_solvers[key]
+        if nullspace is not None:
+            nullspace.orthogonalize(b)
+        with self._stats.timer('solve_' + key):
+            iterations = solver.solve(x, b)
+        self._stats.add('iterations_' + key, iterations)
+        if (isinstance(solver, dolfin.PETScKrylovSolver) and
+                dolfin.has_petsc4py()):
+            self._stats.add('residual_' + key,
+                            solver.ksp().getResidualNorm())
+        return iterations
+
+    def linear_solver(self, key, matrix, method='gmres',
+                      preconditioner='ilu', nullspace=None):
+        r"""Returns the linear solver of a given sub-step, the solver is
+        created and configured on the first call only.
+
+        The operator of the solver is set once, which means that the
+        preconditioner (or the LU factorization if ``method`` is a LU
+        method) of the matrix is computed on the first solve and reused
+        afterwards. Krylov solvers use the current value of the solution
+        vector (the solution of the previous time step) as initial guess.
+        In parallel, the ILU preconditioner is replaced by block Jacobi with
+        ILU blocks.
+
+        :param key: The sub-step name, e.g. 'pressure'.
+        :type key: str
+        :param matrix: The assembled matrix (boundary conditions applied).
+        :param method: A Krylov method or a LU method, default 'gmres'.
+        :type method: str
+        :param preconditioner: The preconditioner of the Krylov method,
+          default 'ilu'.
+        :type preconditioner: str
+        :param nullspace: The nullspace of the matrix, see
+          :meth:`constant_nullspace`. Only supported by Krylov methods.
+        :return: The linear solver.
+        """
+        if key in self._linear_solvers.keys():
+            return self._linear_solvers[key][0]
+        matrix = dolfin.as_backend_type(matrix)
+        if method == 'lu' or dolfin.has_lu_solver_method(method):
+            if nullspace is not None:
+                raise ValueError(error(E_VALID, method, key))
+            solver = dolfin.PETScLUSolver(
+                'default' if method == 'lu' else method)
+            solver.set_operator(matrix)
+        else:
+            if nullspace is not None:
+                matrix.set_nullspace(nullspace)
+            if (preconditioner == 'ilu' and
+                    dolfin.MPI.size(matrix.mpi_comm()) > 1):
+                # PETSc ILU is sequential, use block Jacobi with ILU blocks
+                preconditioner = 'bjacobi'
+            solver = dolfin.PETScKrylovSolver(method, preconditioner)
+            solver.set_operator(matrix)
+            solver.set_reuse_preconditioner(True)
+            solver.parameters['nonzero_initial_guess'] = True
+        self._linear_solvers[key] = solver, nullspace
+        return solver
+
     def set_data(self, column, value):
         pass
 
+    def physics(self):
+        r"""Returns the physics feature solved by the solver."""
+        return self._physics
+
+    def save_checkpoint(self, functions, **kwargs):
+        r"""Saves functions and scalar attributes (e.g. the time, the time
+        step and the step index) in the HDF5 checkpoint file.
+
+        The file is first written next to the checkpoint then renamed, so
+        that an interrupted job always leaves the last complete checkpoint.
+
+        :param functions: The functions to be saved by name.
+        :type functions: dict
+        :param kwargs: The scalar attributes.
+        """
+        filename = self.checkpoint_file()
+        comm = self._mesh.mpi_comm()
+        rank = dolfin.MPI.rank(comm)
+        directory = os.path.dirname(filename)
+        if rank == 0 and directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        dolfin.MPI.barrier(comm)
+        tmp_filename = filename + '.tmp'
+        f = dolfin.HDF5File(comm, tmp_filename, 'w')
+        names = list(functions.keys())
+        for name in names:
+            f.write(functions[name], name)
+        attr = f.attributes(names[0])
+        attr['num_cells'] = self._mesh.num_entities_global(
+            self._mesh.topology().dim())
+        for k, v in kwargs.items():
+            attr[k] = v
+        f.close()
+        dolfin.MPI.barrier(comm)
+        if rank == 0:
+            os.replace(tmp_filename, filename)
+        dolfin.MPI.barrier(comm)
+
+    def set_status(self, **kwargs):
+        r"""Records the status of the last solve on the parent study, if
+        any -- see :meth:`fem.study.Study.set_status`."""
+        if self._parent is not None and self._parent.type_info == STUDY:
+            self._parent.set_status(self._tag, **kwargs)
+
+    def stats(self):
+        r"""Returns the timings and linear solver statistics of the last
+        solve -- see :class:`fem.solver_stats.SolverStats`."""
+        return self._stats
+
+    def solution(self):
+        r"""Returns the solution of the last call to :meth:`solve`, None if
+        the problem hasn't been solved yet."""
+        return self._solution
+
+    def load_checkpoint(self, functions):
+        r"""Reads the functions saved by :meth:`save_checkpoint`.
+
+        :param functions: The functions to be read by name, they must be
+          defined on the same mesh and function spaces as the saved ones.
+        :type functions: dict
+        :return: The scalar attributes saved with the functions.
+        """
+        filename = self.checkpoint_file()
+        if not os.path.exists(filename):
+            raise ValueError(error(E_PATH, filename))
+        names = list(functions.keys())
+        f = dolfin.HDF5File(self._mesh.mpi_comm(), filename, 'r')
+        try:
+            attr = f.attributes(names[0])
+            num_cells = self._mesh.num_entities_global(
+                self._mesh.topology().dim())
+            if int(attr['num_cells']) != num_cells:
+                raise ValueError(error(E_CHECKPOINT, filename))
+            out = {k: attr[k] for k in attr.list_attributes()}
+            for name in names:
+                f.read(functions[name], name)
+        finally:
+            f.close()
+        return out
+
+    def mixed_space(self):
+        r"""Returns the mixed (velocity, pressure) space built from the
+        spaces of the physics, e.g. the Taylor-Hood space P2/P1."""
+        return self._physics.mixed_space()
+
+    def stokes(self, w_space=None):
+        r"""Solves the steady Stokes problem (the convective term is
+        neglected) on the mixed space of the physics.
+        The solution is used as initial guess of the Navier-Stokes solvers.
+
+        :param w_space: The mixed space, default to :meth:`mixed_space`.
+        :return: The mixed solution (velocity, pressure).
+        """
+        if w_space is None:
+            w_space = self.mixed_space()
+        bcu, bcp = self._physics.boundary_conditions(mixed=True)
+        forms = self.stokes_forms(w_space)
+        w = dolfin.Function(w_space)
+        dolfin.solve(forms['stokes_a'] == forms['stokes_l'], w, bcu + bcp)
+        return w
+
+    def stokes_forms(self, w_space=None):
+        r"""Creates the bilinear and linear forms of the Stokes problem, see
+        :meth:`stokes`.
+
+        :param w_space: The mixed space, default to :meth:`mixed_space`.
+        :return: The forms ('stokes_a' and 'stokes_l') by name.
+        """
+        if w_space is None:
+            w_space = self.mixed_space()
+        u, p = dolfin.TrialFunctions(w_space)
+        v, q = dolfin.TestFunctions(w_space)
+        rho, mu = self._physics.fluid_properties()
+        f = self._physics.volumetric_force()
+        n = dolfin.FacetNormal(self._mesh)
+        epsilon = self._physics.strain_rate_tensor
+        sigma = self._physics.molecular_stress_tensor
+        div = self._physics.divergence
+        r = self._physics.weight()  # radial coordinate if axisymmetric
+        dx = dolfin.dx
+        ds = dolfin.ds
+        a = (dolfin.inner(epsilon(v), sigma(u, p, mu)) * r * dx +
+             dolfin.inner(v, p * n) * r * ds -
+             mu * dolfin.inner(dolfin.grad(u).T * n, v) * r * ds -
+             q * div(u) * r * dx)
+        l = dolfin.inner(v, f) * r * dx
+        if self._physics.is_stabilized():
+            # PSPG term of the equal-order elements
+            tau_m = self._physics.stabilization_parameters(None, rho, mu)[0]
+            a -= tau_m / rho * dolfin.inner(dolfin.grad(q), dolfin.grad(p)) * \
+                r * dx
+            l -= tau_m / rho * dolfin.inner(dolfin.grad(q), f) * r * dx
+        return {'stokes_a': a, 'stokes_l': l}
+
     @abstractmethod
-    def solve(self):
-        r""""""
+    def solve(self, restart=None):
+        r"""Solves the problem.
+
+        :param restart: Continue from the checkpoint file, if the solver
+          supports it.
+        :type restart: bool
+        """
         pass
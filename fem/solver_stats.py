@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+fem.solver_stats.py
+November 14, 2019
+@author Francois Roy
+"""
+import csv
+import json
+import time
+from contextlib import contextmanager
+from utils import *
+
+
+class SolverStats(object):
+    r"""In-memory record of the wall time of each phase of each step of a
+    solver, and of the iterations and final residuals of the linear solves.
+
+    Each step is a flat dictionary, e.g.
+
+    .. code-block:: python
+
+      {'step': 12, 't': 0.24, 'dt': 0.02,
+       'assemble_rhs': 1.2e-3, 'apply_bcs': 2.1e-4,
+       'solve_pressure': 3.4e-3, 'iterations_pressure': 7,
+       'residual_pressure': 2.3e-11, 'output': 0.0}
+
+    usage:
+
+    .. code-block:: python
+
+      >>> stats = SolverStats()
+      >>> stats.start_step(1, t=0.02, dt=0.02)
+      >>> with stats.timer('assemble_rhs'):
+      ...     b = dolfin.assemble(l1)
+      >>> stats.add('iterations_pressure', 7)
+      >>> stats.to_json('stats.json')
+    """
+    def __init__(self):
+        self._steps = []
+        self._current = None
+        self._phases = set()
+
+    def add(self, key, value):
+        r"""Records a value for the current step.
+
+        :param key: The name of the value.
+        :type key: str
+        :param value: The value.
+        """
+        if self._current is not None:
+            self._current[key] = value
+
+    def clear(self):
+        r"""Deletes the records."""
+        self._steps = []
+        self._current = None
+        self._phases = set()
+
+    def start_step(self, step, **kwargs):
+        r"""Starts the record of a new step.
+
+        :param step: The step index.
+        :type step: int
+        :param kwargs: Values of the step, e.g. the time and the time step.
+        """
+        self._current = {'step': step}
+        self._current.update(kwargs)
+        self._steps.append(self._current)
+
+    def steps(self):
+        r"""Returns the list of the records of the steps."""
+        return self._steps
+
+    def summary(self):
+        r"""Returns the total time of each phase (see :meth:`timer`) and the
+        total number of iterations of each linear solve (``iterations_*``)
+        over the steps. The other values (e.g. the residuals, the Courant
+        number) can't be added: their last and maximum values are returned
+        as ``<name>_last`` and ``<name>_max``.
+
+        :return: A dictionary.
+        """
+        out = {'num_steps': len(self._steps)}
+        for record in self._steps:
+            for k, v in record.items():
+                if k in ('step', 't', 'dt') or isinstance(v, bool) or \
+                        not isinstance(v, (int, float)):
+                    continue
+                if k in self._phases or k.startswith('iterations_'):
+                    out[k] = out.get(k, 0) + v
+                else:
+                    out[k + '_last'] = v
+                    out[k + '_max'] = max(out.get(k + '_max', v), v)
+        return out
+
+    @contextmanager
+    def timer(self, phase):
+        r"""Adds the wall time of the block to the phase of the current step.
+
+        :param phase: The name of the phase, e.g. 'assemble_rhs'.
+        :type phase: str
+        """
+        self._phases.add(phase)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                self._current[phase] = (self._current.get(phase, 0.) +
+                                        time.perf_counter() - t0)
+
+    def to_csv(self, filename):
+        r"""Saves the records, one row per step.
+
+        :param filename: The CSV file name.
+        :type filename: str
+        """
+        columns = []
+        for record in self._steps:
+            for k in record.keys():
+                if k not in columns:
+                    columns.append(k)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self._steps)
+
+    def to_json(self, filename):
+        r"""Saves the summary and the records.
+
+        :param filename: The JSON file name.
+        :type filename: str
+        """
+        with open(filename, 'w') as f:
+            json.dump({'summary': self.summary(), 'steps': self._steps}, f,
+                      indent=4)
@@ -17,6 +17,7 @@ class Study(Node):
         self._type_info = STUDY
         self._valid_children_type = [SOLVER_FEATURE]
         self._physics_tag = physics_tag
+        self._status = {}
         if parent is not None:
             # automatically add class instance to parent if exists
             parent.add_child(self)
@@ -28,5 +29,70 @@ class Study(Node):
         r""""""
         return self.child_by_tag(tag).dataset()
 
+    def run(self, restart=False, stats_dir=None):
+        r"""Solves the problems of the solver features in the children list.
+
+        :param restart: Continue from the last checkpoint of the solvers
+          that have one, default = False.
+        :type restart: bool
+        :param stats_dir: Directory where the timings and linear solver
+          statistics of the solvers are saved, see :meth:`save_stats`.
+          Default = None (not saved).
+        :type stats_dir: str
+        :return: A dictionary of the solutions by solver tag.
+        """
+        out = {}
+        for child in self._children:
+            if restart and child.has_checkpoint():
+                out[child.tag] = child.solve(restart=True)
+            else:
+                out[child.tag] = child.solve()
+        if stats_dir is not None:
+            self.save_stats(stats_dir)
+        return out
+
+    def save_stats(self, directory):
+        r"""Saves the timings and linear solver statistics of the solver
+        features in ``<study>_<solver>_stats.json`` (summary and steps) and
+        ``<study>_<solver>_stats.csv`` (one row per step).
+
+        The statistics of the process of rank 0 are saved when running in
+        parallel.
+
+        :param directory: The output directory.
+        :type directory: str
+        """
+        if dolfin.MPI.rank(dolfin.MPI.comm_world) != 0:
+            return
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for child in self._children:
+            name = "{}_{}".format(self._tag, child.tag)
+            child.stats().to_json(Path(directory).child(name + STATS_JSON))
+            child.stats().to_csv(Path(directory).child(name + STATS_CSV))
+
     def set_data(self, column, value):
         pass
+
+    def set_status(self, tag, **kwargs):
+        r"""Records the status of the last solve of a solver feature, e.g.
+        the stop reason and the number of steps.
+
+        :param tag: The tag of the solver feature.
+        :type tag: str
+        :param kwargs: The status entries.
+        """
+        self._status[tag] = kwargs
+
+    def status(self, tag=None):
+        r"""Returns the status of the last solve of a solver feature. If tag
+        is None, returns the status of all the solver features.
+
+        :param tag: The tag of the solver feature.
+        :type tag: str
+        :return: A dictionary, e.g. ``{'stop_reason': 'steady_state',
+          'num_steps': 120}``.
+        """
+        if tag is None:
+            return self._status
+        return self._status.get(tag)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+fem.subdomain_cache.py
+November 14, 2019
+@author Francois Roy
+"""
+import threading
+import dolfin
+from utils import *
+
+# compiled subdomains of the process by (expression, parameters)
+_SUBDOMAINS = {}
+_LOCK = threading.Lock()
+_INFO = {'hits': 0, 'misses': 0}
+
+
+def cache_info():
+    r"""Returns the number of compiled subdomains in the cache, and the hits
+    and misses of :func:`compiled_subdomain`.
+
+    :return: A dictionary.
+    """
+    with _LOCK:
+        return {'size': len(_SUBDOMAINS), 'hits': _INFO['hits'],
+                'misses': _INFO['misses']}
+
+
+def clear_cache():
+    r"""Deletes the compiled subdomains of the cache."""
+    with _LOCK:
+        _SUBDOMAINS.clear()
+        _INFO['hits'] = 0
+        _INFO['misses'] = 0
+
+
+def compiled_subdomain(expression, **kwargs):
+    r"""Returns the compiled subdomain of the expression and parameters,
+    compiled once per process.
+
+    The subdomains are shared, their parameters must not be modified.
+
+    :param expression: The C++ expression of the subdomain, e.g.
+      ``'on_boundary && near(x[0], 0.0, tol)'``.
+    :type expression: str
+    :param kwargs: The parameters of the expression, e.g. ``tol=1e-14``.
+    :return: The :class:`dolfin.CompiledSubDomain`.
+    """
+    key = (expression, tuple(sorted(kwargs.items())))
+    with _LOCK:
+        subdomain = _SUBDOMAINS.get(key)
+        if subdomain is not None:
+            _INFO['hits'] += 1
+            return subdomain
+        _INFO['misses'] += 1
+        subdomain = dolfin.CompiledSubDomain(expression, **kwargs)
+        _SUBDOMAINS[key] = subdomain
+        return subdomain
+
+
+class LazySubDomain(object):
+    r"""A subdomain defined by a C++ expression, compiled on first use from
+    the process-wide cache, see :func:`compiled_subdomain`. The attributes
+    of the compiled subdomain, e.g. :meth:`mark`, are available from the
+    instance.
+
+    usage:
+
+    .. code-block:: python
+
+      >>> inflow = LazySubDomain('on_boundary && near(x[0], 0.0, tol)',
+      ...                        tol=1e-14)  # not compiled yet
+      >>> inflow.mark(boundaries, 1)  # compiled or loaded from the cache
+      >>> bc = dolfin.DirichletBC(q_space, pin, inflow.compiled())
+
+    :param expression: The C++ expression of the subdomain.
+    :type expression: str
+    :param kwargs: The parameters of the expression.
+    """
+    def __init__(self, expression, **kwargs):
+        self._expression = expression
+        self._kwargs = kwargs
+        self._subdomain = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.compiled(), name)
+
+    def compiled(self):
+        r"""Returns the compiled subdomain."""
+        if self._subdomain is None:
+            self._subdomain = compiled_subdomain(self._expression,
+                                                 **self._kwargs)
+        return self._subdomain
+
+    def expression(self):
+        r"""Returns the C++ expression of the subdomain."""
+        return self._expression
@@ -13,9 +13,15 @@ __version__ = '2020.1'
 
 
 # STRINGS
+AB2 = 'ab2'
+BDF2 = 'bdf2'
 BUILT_IN = 'built_in'
+CN = 'cn'
 COMPONENT = 'component'
+END_TIME = 'end_time'
+EULER = 'euler'
 EXPORT = 'export'
+EXTRAPOLATION = 'extrapolation'
 FILLET = 'fillet'
 GEOMETRY = 'geometry'
 GEOMETRY_FEATURE = 'geometry_feature'
@@ -27,27 +33,38 @@ MATERIALS = 'materials'
 MESH = 'mesh'
 MESH_FEATURE = 'mesh_feature'
 MODEL = 'model'
+NEWTON = 'newton'
 NODE = 'node'
 OPEN_CASCADE = 'open_cascade'
+P1P1 = 'p1p1'
+P2P1 = 'p2p1'
 PHYSICAL = 'physical'
 PHYSICS = 'physics'
 PHYSICS_FEATURE = 'physics_feature'
 PRIMITIVES = 'primitives'
+PROBE = 'probe'
 RECTANGLE = 'rectangle'
 RESULTS = 'results'
 RESULTS_FEATURE = 'result_feature'
 SOLVER_FEATURE = 'solver_feature'
+STEADY_STATE = 'steady_state'
 STUDY = 'study'
 
 # EXTENSIONS
 BND_XDMF = '_bnd.xdmf'
+CHECKPOINT_H5 = '_checkpoint.h5'
 DOM_XDMF = '_dom.xdmf'
+STATS_CSV = '_stats.csv'
+STATS_JSON = '_stats.json'
 VTK = '.vtk'
 XDMF = '.xdmf'
 
 # ERROR STRINGS
+E_CHECKPOINT = ("The checkpoint '{}' has not been saved on the mesh of the "
+                "solver.")
 E_CHILD_NODE_TYPE = ("The child node type '{}' is not a supported children of "
                      "the parent node type '{}'.")
+E_CONVERGENCE = "The {} solver did not converge after {} iterations."
 E_CREATE = ("The feature failed to be created with the following error "
             "message:\n{}")
 E_DIM = "The dimension must be an integer between 1 and 3."
@@ -56,13 +73,20 @@ E_GEOM_TAG = "The mesh node has no assigned geometry."
 E_QTY = "The entered dimensionality {} is not compatible with {}."
 E_PARENT_NODE_TYPE = ("The parent node type '{}' is not valid for child "
                       "type '{}'.")
+E_MATERIAL = ("{} cells are not in the selection of any material, the "
+              "property '{}' is undefined there.")
 E_MESH = "There is no defined mesh node in the parent's children list."
 E_MESH_TAG = "The physics node has no assigned mesh."
 E_NA = "This feature has not been implemented yet."
 E_PATH = "The path to {} does not exist."
+E_POINTS = "The sample points must have {} coordinates."
+E_PROPERTY = "The property '{}' is not defined for the material '{}'."
 E_TAG = ("The node with tag '{}' is not in the children list of the "
          "parent '{}'.")
+E_TIME_SERIES = ("The time series '{}' has not been written on the mesh of "
+                 "the function.")
 E_VALID = "The value '{}' is not valid for the property '{}'."
+E_WRITER = "The time series writer has stopped: {}."
 
 
 def error(error_code, *args):
@@ -4,6 +4,7 @@ run.py
 November 14, 2019
 @author Francois Roy
 """
+import json
 import sys
 import click
 import traceback
@@ -13,6 +14,14 @@ from gui.app import App
 from fem import *
 from resources import __application__, __version__
 from cfd.models_2d.axi_symmetric.poiseuille_axi import *
+from cfd.models_2d.poiseuille_plane import PoiseuillePlane
+from cfd.job_queue import JobQueue
+from cfd.sweep import Sweep, run_record
+from cfd.validation import ConvergenceStudy
+
+# wall time in seconds between two checkpoints of the batch job, the last
+# one is written at the end of the time loop
+CHECKPOINT_WALL_TIME = 600.
 
 
 def print_version(ctx, param, value):
@@ -40,12 +49,40 @@ def print_version(ctx, param, value):
               help="Start the graphical user interface.")
 @click.option('-r', '--run', is_flag=True,
               help="Run the batch job and exit.")
+@click.option('--restart', is_flag=True,
+              help="Continue the batch job from the last checkpoints.")
+@click.option('--precompile', is_flag=True,
+              help="Compile the forms of the Poiseuille models (all the "
+                   "discretizations, IPCS schemes and convection terms, "
+                   "and Newton) in the cache and exit.")
+@click.option('--validate', is_flag=True,
+              help="Run the mesh convergence study of the Poiseuille flows "
+                   "and exit.")
+@click.option('--sweep', type=click.Path(exists=True), default=None,
+              help="Run the parameter sweep of a JSON file, e.g. "
+                   "{\"model\": \"PoiseuilleAxi\", \"grid\": {\"pin\": "
+                   "[4.0, 8.0]}, \"fixed\": {\"t_end\": 1.0}}, and exit.")
+@click.option('--workers', type=int, default=None,
+              help="The number of worker processes of the sweep, default to "
+                   "the number of cores divided by the threads per worker.")
+@click.option('--threads', type=int, default=1,
+              help="The number of threads per worker of the sweep.")
+@click.option('--queue', type=click.Path(), default=None,
+              help="The directory of the durable job queue, default to "
+                   "outputs/queue.")
+@click.option('--submit', type=click.Path(exists=True), default=None,
+              help="Add the jobs of a sweep JSON file (see --sweep) to the "
+                   "job queue and exit.")
+@click.option('--worker', is_flag=True,
+              help="Run the jobs of the job queue until it is empty, any "
+                   "number of workers can share the queue.")
 @click.option(
     '-v', '--version',
     is_flag=True, help='Show version information and exit.',
     callback=print_version, expose_value=False, is_eager=True,
 )
-def main(gui, run):
+def main(gui, run, restart, precompile, validate, sweep, workers,
+         threads, queue, submit, worker):
     r"""CFD: A user interface to solve CFD problems using FEniCS
     """
     if gui:
@@ -64,19 +101,80 @@ def main(gui, run):
         # except Exception as exc:
         #    print(exc)
         #    traceback.print_tb(sys.exc_info()[2])
-    elif run:
+    elif run or precompile:
         # define batch job here
         # model list with parameters
         # the run option launch a basic gui showing statistics, log and status.
         # selected results are saved on file at each time steps, the job can
         # be stopped and resumed at anytime, starting from the last
         # saved solution.
-        models = [PoiseuilleAxi('pa1')]
+        # the batch job can run in parallel, e.g.
+        # mpirun -n 8 python run.py --run
+        if dolfin.MPI.rank(dolfin.MPI.comm_world) > 0:
+            # log from the process of rank 0 only
+            logging.getLogger().setLevel(logging.WARNING)
+            dolfin.set_log_level(dolfin.LogLevel.WARNING)
+        # the compiled forms are shared by the runs and the processes
+        cache = JitCache()
+        if precompile:
+            # one model instance per variant of the forms, the forms don't
+            # depend on the mesh size or on the parameter values
+            variants = [{'solver': NEWTON}] + [
+                {'solver': IPCS, 'scheme': scheme, 'convection': convection}
+                for scheme in (EULER, CN, BDF2)
+                for convection in (EXTRAPOLATION, AB2)]
+            for model_class in (PoiseuilleAxi, PoiseuillePlane):
+                for discretization in DISCRETIZATIONS.keys():
+                    for kwargs in variants:
+                        m = model_class('pre')
+                        cache.precompile(m.setup(
+                            discretization=discretization, **kwargs).forms())
+            models = []
+        else:
+            models = [PoiseuilleAxi('pa1')]
         for m in models:
-            m.compute()
+            m.compute(restart=restart, stats_dir=out_dir(),
+                      checkpoint_wall_time=CHECKPOINT_WALL_TIME)
             # p, uz = model.exact_solution()
             # print(p)
             # print(uz)
+        logging.info("form cache: {}".format(cache.summary()))
+    elif submit is not None or worker:
+        q = JobQueue(out_dir().child('queue') if queue is None else queue)
+        if submit is not None:
+            with open(submit) as f:
+                spec = json.load(f)
+            ids = Sweep(spec['model'], spec['grid'],
+                        **spec.get('fixed', {})).submit(q)
+            logging.info("{} jobs submitted".format(len(ids)))
+        else:
+            # the compiled forms are shared by the workers
+            JitCache()
+            num_jobs = q.work(run_record, wait=True)
+            logging.info("{} jobs run".format(num_jobs))
+        logging.info("queue: {}".format(q.counts()))
+    elif sweep is not None:
+        with open(sweep) as f:
+            spec = json.load(f)
+        # the compiled forms are shared by the workers
+        JitCache()
+        s = Sweep(spec['model'], spec['grid'], directory=spec.get('directory'),
+                  max_workers=workers, threads=threads,
+                  **spec.get('fixed', {}))
+        summary = s.run()
+        logging.info("sweep: {}/{} jobs done".format(
+            sum(job['status'] == 'done' for job in summary), len(summary)))
+    elif validate:
+        # errors against the analytic solutions on refined meshes
+        for model_class, ne in ((PoiseuilleAxi, {'ne_r': 4, 'ne_z': 20}),
+                                (PoiseuillePlane, {'ne_x': 20, 'ne_y': 4})):
+            study = ConvergenceStudy(model_class, ne, levels=(1, 2, 4),
+                                     discretizations=(P1P1, P2P1))
+            study.run()
+            logging.info("{}\n{}".format(model_class.__name__,
+                                          study.report()))
+            study.save(out_dir().child(model_class.__name__ +
+                                       '_convergence.json'))
 
     else:
         pass
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+tests.cfd.conftest.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+from collections import namedtuple
+
+from cfd.job_queue import JobQueue
+
+Container = namedtuple('Container', ['object'])
+
+
+@pytest.fixture()
+def fix(tmp_path):
+    r"""The fixture for testing the job queue and the sweeps, with a
+    temporary directory.
+
+    :return: The fixture for cfd tests.
+      (:func:`Container<tests.cfd.conftest.Container>`)
+    """
+    queue = JobQueue(str(tmp_path.joinpath('queue')), timeout=60.,
+                     heartbeat=0.1, max_attempts=2)
+    return Container({'queue': queue, 'dir': tmp_path})
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+tests.cfd.test_job_queue.py
+November 14, 2019
+@author Francois Roy
+"""
+import time
+import pytest
+from utils import *
+from cfd.job_queue import *
+
+
+class TestJobQueue:
+    def test_submit(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        queue = fix.object.get('queue')
+        i = queue.submit({'model': 'PoiseuilleAxi', 'params': {'pin': 8.0}})
+        j = queue.submit({'params': {'pin': 8.0}, 'model': 'PoiseuilleAxi'})
+        assert i == j
+        assert queue.counts() == {PENDING: 1, RUNNING: 0, DONE: 0,
+                                  FAILED: 0}
+
+    def test_work(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        queue = fix.object.get('queue')
+        for pin in (4.0, 8.0):
+            queue.submit({'model': 'PoiseuilleAxi', 'params': {'pin': pin}})
+
+        def run(record):
+            if record['spec']['params']['pin'] == 4.0:
+                raise RuntimeError('diverged')
+            return {'status': DONE}
+
+        # the failed job is queued again once, then moved to failed
+        assert queue.work(run) == 3
+        assert queue.counts() == {PENDING: 0, RUNNING: 0, DONE: 1,
+                                  FAILED: 1}
+        record = queue.records(FAILED)[0]
+        assert record['attempts'] == 2
+        assert record['error'] == 'diverged'
+        # the done jobs are never run again
+        queue.submit({'model': 'PoiseuilleAxi', 'params': {'pin': 8.0}})
+        assert queue.claim() is None
+
+    def test_requeue_stale(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        queue = fix.object.get('queue')
+        i = queue.submit({'model': 'PoiseuilleAxi', 'params': {}})
+        record = queue.claim()
+        assert record['id'] == i
+        assert queue.claim() is None
+        assert queue.requeue_stale() == []
+        # no heartbeat for two minutes, e.g. the host rebooted
+        old = time.time() - 120.
+        os.utime(queue.path(RUNNING, i), (old, old))
+        assert queue.requeue_stale() == [i]
+        assert queue.claim()['attempts'] == 2
+
+    def test_requeued_job_owner(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        queue = fix.object.get('queue')
+        other = JobQueue(queue.directory(), timeout=60., max_attempts=3,
+                         worker='other:1')
+        i = queue.submit({'model': 'PoiseuilleAxi', 'params': {}})
+        record = queue.claim()
+        # the heartbeat of the first worker was starved
+        old = time.time() - 120.
+        os.utime(queue.path(RUNNING, i), (old, old))
+        assert other.requeue_stale() == [i]
+        assert other.records(PENDING)[0]['status'] == PENDING
+        claimed = other.claim()
+        assert claimed['worker'] == 'other:1'
+        # the first worker no longer owns the job
+        queue.complete(record, {'status': DONE})
+        assert queue.counts() == {PENDING: 0, RUNNING: 1, DONE: 0,
+                                  FAILED: 0}
+        other.complete(claimed, {'status': DONE})
+        assert queue.records(DONE)[0]['worker'] == 'other:1'
+
+    def test_claim_old_job(self, fix, monkeypatch):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        queue = fix.object.get('queue')
+        other = JobQueue(queue.directory(), timeout=60., worker='other:1')
+        i = queue.submit({'model': 'PoiseuilleAxi', 'params': {}})
+        # pending for two minutes, longer than the timeout
+        old = time.time() - 120.
+        os.utime(queue.path(PENDING, i), (old, old))
+        read = queue.record
+        requeued = []
+
+        def record(state, job_id):
+            # another worker looks for stale jobs right after the rename
+            requeued.extend(other.requeue_stale())
+            return read(state, job_id)
+
+        monkeypatch.setattr(queue, 'record', record)
+        claimed = queue.claim()
+        assert requeued == []
+        assert claimed['id'] == i
+        assert claimed['attempts'] == 1
+        assert queue.counts() == {PENDING: 0, RUNNING: 1, DONE: 0,
+                                  FAILED: 0}
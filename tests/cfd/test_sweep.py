@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+tests.cfd.test_sweep.py
+November 14, 2019
+@author Francois Roy
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from utils import *
+import cfd.sweep
+from cfd.sweep import *
+
+
+class Field(object):
+    r"""The velocity or the pressure returned by :class:`Model`."""
+    def __init__(self, values):
+        self._values = np.asarray(values, dtype=float)
+
+    def dim(self):
+        return len(self._values)
+
+    def function_space(self):
+        return self
+
+    def max(self):
+        return self._values.max()
+
+    def min(self):
+        return self._values.min()
+
+    def norm(self, norm_type):
+        return np.abs(self._values).max()
+
+    def vector(self):
+        return self
+
+
+class Model(object):
+    r"""A model recording its arguments, the solve fails if ``num_steps``
+    is 0."""
+    instances = []
+
+    def __init__(self, tag, **kwargs):
+        self.tag = tag
+        self.kwargs = kwargs
+        self.compute_kwargs = None
+        self.threads = None
+        Model.instances.append(self)
+
+    def compute(self, **kwargs):
+        self.compute_kwargs = kwargs
+        self.threads = {k: os.environ.get(k) for k in THREAD_VARIABLES}
+        if kwargs.get('num_steps') == 0:
+            raise RuntimeError('no step')
+        return Field([1., -2.]), Field([3., 5., 4.])
+
+
+class Executor(ThreadPoolExecutor):
+    r"""Runs the jobs in threads of the test process, with the mocked
+    models."""
+    def __init__(self, max_workers=None, mp_context=None):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture()
+def models(monkeypatch):
+    r"""Replaces the models of the sweeps by :class:`Model`, and restores
+    the environment variables set by the jobs."""
+    Model.instances = []
+    monkeypatch.setattr(cfd.sweep, 'models', lambda: {'Model': Model})
+    monkeypatch.setattr(cfd.sweep, 'ProcessPoolExecutor', Executor)
+    for key in ('FEM_APP_DIR', 'FEM_OUT_DIR'):
+        monkeypatch.setenv(key, '')
+    return Model.instances
+
+
+class TestSweep:
+    def test_jobs(self, fix, models):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        directory = fix.object.get('dir').joinpath('sweep')
+        sweep = Sweep('Model', {'pin': [4., 8.], 'mu': [1e-3, 2e-3, 3e-3]},
+                      directory=str(directory), t_end=1.)
+        jobs = sweep.jobs()
+        # the product of the grid, the parameters in alphabetical order
+        assert [job['id'] for job in jobs] == ['job_{:04d}'.format(i)
+                                               for i in range(6)]
+        assert [(job['params']['mu'], job['params']['pin'])
+                for job in jobs] == [(1e-3, 4.), (1e-3, 8.), (2e-3, 4.),
+                                     (2e-3, 8.), (3e-3, 4.), (3e-3, 8.)]
+        assert all(job['params']['t_end'] == 1. for job in jobs)
+        assert jobs[5]['directory'] == str(directory.joinpath('job_0005'))
+        assert all(job['model'] == 'Model' for job in jobs)
+        with pytest.raises(ValueError):
+            Sweep('Unknown', {'pin': [4.]})
+
+    def test_run_job(self, fix, models):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        directory = fix.object.get('dir').joinpath('job')
+        summary = run_job({'id': 'job_0000', 'model': 'Model',
+                           'directory': str(directory),
+                           'params': {'size': [0.01, 0.1], 'pin': 8.,
+                                      'ne_r': 10, 't_end': 2.,
+                                      'num_steps': 20}})
+        model = models[0]
+        # the parameters of the constructor, with units
+        assert sorted(model.kwargs.keys()) == ['ne_r', 'pin', 'size']
+        np.testing.assert_allclose(model.kwargs['size'].to('m').magnitude,
+                                   [0.01, 0.1])
+        assert model.kwargs['pin'].to('Pa').magnitude == 8.
+        assert model.kwargs['ne_r'] == 10
+        # the others go to compute, the statistics in the job directory
+        assert sorted(model.compute_kwargs.keys()) == [
+            'num_steps', 'stats_dir', 't_end']
+        assert model.compute_kwargs['t_end'].to('s').magnitude == 2.
+        assert model.compute_kwargs['num_steps'] == 20
+        assert model.compute_kwargs['stats_dir'] == str(
+            directory.joinpath('out'))
+        assert summary['status'] == 'done'
+        assert (summary['dofs'], summary['u_max'], summary['p_min'],
+                summary['p_max']) == (5, 2., 3., 5.)
+        assert summary['size'] == json.dumps([0.01, 0.1])
+        with open(str(directory.joinpath('summary.json'))) as f:
+            assert json.load(f)['status'] == 'done'
+
+    def test_run_job_failed(self, fix, models):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        directory = fix.object.get('dir').joinpath('job')
+        summary = run_job({'id': 'job_0000', 'model': 'Model',
+                           'directory': str(directory),
+                           'params': {'num_steps': 0}})
+        assert summary['status'] == 'failed'
+        assert summary['error'] == 'no step'
+
+    def test_run(self, fix, models, monkeypatch):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        monkeypatch.setenv('OMP_NUM_THREADS', '8')
+        for key in THREAD_VARIABLES[1:]:
+            monkeypatch.delenv(key, raising=False)
+        directory = fix.object.get('dir').joinpath('sweep')
+        sweep = Sweep('Model', {'num_steps': [10, 0, 20]},
+                      directory=str(directory), max_workers=1, threads=3)
+        summary = sweep.run()
+        assert [s['status'] for s in summary] == ['done', 'failed', 'done']
+        assert os.path.isfile(str(directory.joinpath('summary.csv')))
+        # the threads of the jobs are limited, then the variables restored
+        assert all(m.threads == {k: '3' for k in THREAD_VARIABLES}
+                   for m in models)
+        assert os.environ['OMP_NUM_THREADS'] == '8'
+        assert all(key not in os.environ for key in THREAD_VARIABLES[1:])
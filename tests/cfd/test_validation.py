@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+tests.cfd.test_validation.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+from utils import *
+from cfd.validation import *
+
+
+class TestConvergenceRate:
+    def test_rate(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        h = np.array([0.1, 0.05, 0.025, 0.0125])
+        np.testing.assert_allclose(convergence_rate(h, 3. * h**2), 2.)
+        # with respect to the number of degrees of freedom
+        num_dofs = 1. / h**2
+        np.testing.assert_allclose(convergence_rate(num_dofs, 3. * h**2),
+                                   -1.)
+
+    def test_non_positive(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        # the points with a zero error or mesh size are ignored
+        h = np.array([0.1, 0.05, 0.025, 0.])
+        e = np.array([0.01, 0.0025, 0., 1.])
+        np.testing.assert_allclose(convergence_rate(h, e), 2.)
+
+    def test_nan(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.cfd.conftest.fix>`
+        """
+        assert np.isnan(convergence_rate([], []))
+        assert np.isnan(convergence_rate([0.1], [0.01]))
+        assert np.isnan(convergence_rate([0.1, 0.05], [0.01, 0.]))
+        assert np.isnan(convergence_rate([0.1, 0.05], [np.nan, 0.01]))
@@ -16,12 +16,14 @@ Container = namedtuple('Container', ['object'])
 
 
 @pytest.fixture()
-def fix():
-    r"""The default fixture to test the fem package.
+def fix(tmp_path):
+    r"""The default fixture to test the fem package, with a small mesh of the
+    unit square and a temporary directory.
 
     :return: The fixture for fem tests.
       (:func:`Container<tests.fem.conftest.Container>`)
     """
     # m = fem.Model('m')
     m = dolfin.__version__
-    return Container({'m': m})
+    mesh = dolfin.UnitSquareMesh(4, 4)
+    return Container({'m': m, 'mesh': mesh, 'dir': tmp_path})
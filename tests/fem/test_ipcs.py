@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_ipcs.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+from utils import *
+from fem.solver_feats.ipcs import *
+
+
+class TestSchemeCoefficients:
+    def test_first_step(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        # the first step of all the schemes is an Euler step
+        for scheme in (EULER, CN, BDF2):
+            solver = Ipcs('ipcs', scheme=scheme)
+            assert solver.scheme_coefficients(0.1) == ((1., -1., 0.),
+                                                       (1., 0.))
+        # the Euler coefficients do not depend on the previous step
+        solver = Ipcs('ipcs', scheme=EULER)
+        assert solver.scheme_coefficients(0.1, 0.05) == ((1., -1., 0.),
+                                                         (1., 0.))
+
+    def test_bdf2(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        solver = Ipcs('ipcs', scheme=BDF2)
+        gamma, c = solver.scheme_coefficients(0.1, 0.1)
+        np.testing.assert_allclose(gamma, [1.5, -2., 0.5])
+        np.testing.assert_allclose(c, [2., -1.])
+        # a time step twice the previous one
+        gamma, c = solver.scheme_coefficients(0.2, 0.1)
+        np.testing.assert_allclose(gamma, [5. / 3., -3., 4. / 3.])
+        np.testing.assert_allclose(c, [3., -2.])
+        # exact for a linear function u = t, with t^n = 0
+        dt, dt0 = 0.07, 0.1
+        gamma, c = solver.scheme_coefficients(dt, dt0)
+        np.testing.assert_allclose(
+            (gamma[0] * dt - gamma[2] * dt0) / dt, 1.)
+        np.testing.assert_allclose(sum(gamma), 0., atol=1e-14)
+        np.testing.assert_allclose(-c[1] * dt0, dt)
+
+    def test_cn(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        solver = Ipcs('ipcs', scheme=CN)
+        gamma, c = solver.scheme_coefficients(0.1, 0.1)
+        np.testing.assert_allclose(gamma, [1., -1., 0.])
+        np.testing.assert_allclose(c, [1.5, -0.5])
+        # the extrapolation at the middle of a time step twice the previous
+        gamma, c = solver.scheme_coefficients(0.2, 0.1)
+        np.testing.assert_allclose(gamma, [1., -1., 0.])
+        np.testing.assert_allclose(c, [2., -1.])
+
+    def test_invalid(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        with pytest.raises(ValueError):
+            Ipcs('ipcs', scheme='rk4')
+        with pytest.raises(ValueError):
+            Ipcs('ipcs', convection='upwind')
+
+
+class TestAdaptiveTimeStep:
+    def test_adapt(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        solver = Ipcs('ipcs', dt=0.1, adaptive=True, cfl=0.5, tol=1e-3)
+        # the Courant number or the error limits the time step
+        assert solver.adapt_time_step(0.1, 0.25) == pytest.approx(0.18)
+        assert solver.adapt_time_step(0.1, 1.) == pytest.approx(0.045)
+        assert solver.adapt_time_step(0.1, 0.1, 4e-3) == pytest.approx(0.045)
+        # the growth is limited to 2 and the decrease to 0.2 per step
+        assert solver.adapt_time_step(0.1, 0.) == pytest.approx(0.2)
+        assert solver.adapt_time_step(0.1, 100.) == pytest.approx(0.02)
+        # the time step is kept if it would grow by less than 25%
+        assert solver.adapt_time_step(0.1, 0.4) == 0.1
+        assert solver.adapt_time_step(0.1, 0.45 / 1.2) == 0.1
+        # the bounds dt_min = dt / 100 and dt_max = 100 * dt
+        assert solver.adapt_time_step(8., 0.01) == pytest.approx(10.)
+        assert solver.adapt_time_step(0.002, 100.) == pytest.approx(0.001)
+        solver = Ipcs('ipcs', dt=0.1, adaptive=True, dt_min=0.05, dt_max=0.15)
+        assert solver.adapt_time_step(0.1, 0.) == pytest.approx(0.15)
+        assert solver.adapt_time_step(0.1, 1.) == pytest.approx(0.05)
+
+    def test_accept(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        solver = Ipcs('ipcs', dt=0.1, adaptive=True, cfl=0.5, tol=1e-3)
+        accepted, dt = solver.accept_time_step(0.1, 0.25, 1e-4)
+        assert accepted
+        assert dt == pytest.approx(0.18)
+        # the CFL or the error criterion is violated
+        accepted, dt = solver.accept_time_step(0.1, 1.)
+        assert not accepted
+        assert dt == pytest.approx(0.045)
+        accepted, dt = solver.accept_time_step(0.1, 0.1, 4e-3)
+        assert not accepted
+        assert dt == pytest.approx(0.045)
+        # accepted at dt_min, the time step cannot be decreased
+        accepted, dt = solver.accept_time_step(0.001, 1.)
+        assert accepted
+        assert dt == pytest.approx(0.001)
+        # accepted at the limits, the next time step is smaller
+        accepted, dt = solver.accept_time_step(0.1, 0.5, 1e-3)
+        assert accepted
+        assert dt == pytest.approx(0.09)
+
+    def test_last_step(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        solver = Ipcs('ipcs', dt=0.1, adaptive=True, cfl=0.5, tol=1e-3)
+        # a last step shorter than dt_min is merged with the previous one
+        assert solver.accept_time_step(0.1, 0.25, remaining=0.185)[1] == \
+            pytest.approx(0.18)
+        assert solver.accept_time_step(0.1, 0.25, remaining=0.1805)[1] == \
+            pytest.approx(0.1805)
+        # the end time is reached
+        assert solver.accept_time_step(0.1, 0.4, remaining=0.05)[1] == \
+            pytest.approx(0.05)
+        # not after a rejected step
+        assert solver.accept_time_step(0.1, 1., remaining=0.046) == \
+            (False, pytest.approx(0.045))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_mesh.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+import dolfin
+import meshio
+from utils import *
+from fem.component import Component
+from fem.mesh import Mesh
+
+
+def unit_square():
+    r"""Returns a meshio mesh of the unit square made of two triangles, the
+    left edge tagged 1 and the bottom edge tagged 2."""
+    points = np.array([[0., 0., 0.], [1., 0., 0.], [1., 1., 0.],
+                       [0., 1., 0.]])
+    cells = {'triangle': np.array([[0, 1, 2], [0, 2, 3]]),
+             'line': np.array([[3, 0], [0, 1]])}
+    cell_data = {'triangle': {'gmsh:physical': np.array([3, 4])},
+                 'line': {'gmsh:physical': np.array([1, 2])}}
+    return meshio.Mesh(points, cells, cell_data=cell_data)
+
+
+class TestMesh:
+    def test_match(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        entities = np.array([[0, 1, 2], [1, 2, 3], [2, 3, 4], [0, 3, 4]])
+        # any order of the vertices, repeated and missing rows
+        rows = np.array([[2, 1, 3], [4, 0, 3], [0, 1, 4], [3, 2, 1],
+                         [1, 0, 2]])
+        actual = Mesh._match(entities, rows)
+        np.testing.assert_array_equal(actual, [1, 3, -1, 1, 0])
+
+    def test_match_large(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        # vertex ids whose integer key n * i + j would overflow
+        big = 2 ** 40
+        entities = np.array([[big, big + 1], [big + 1, 3], [3, big]])
+        rows = np.array([[big + 1, big], [big, 3], [big + 1, big + 2]])
+        actual = Mesh._match(entities, rows)
+        np.testing.assert_array_equal(actual, [0, 2, -1])
+
+    def test_match_empty(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        entities = np.array([[0, 1], [1, 2]])
+        assert len(Mesh._match(entities, np.zeros((0, 2)))) == 0
+        np.testing.assert_array_equal(
+            Mesh._match(np.zeros((0, 2)), [[0, 1]]), [-1])
+
+    def test_from_meshio(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        comp = Component('comp', dim=2)
+        mesh = Mesh('mesh', parent=comp)
+        mesh.from_meshio(unit_square())
+        assert mesh.num_vertices() == 4
+        assert mesh.num_cells() == 2
+        np.testing.assert_array_equal(mesh.cells(), [[0, 1, 2], [0, 2, 3]])
+        np.testing.assert_array_equal(mesh._subdomains.array(), [3, 4])
+        boundaries = mesh._boundaries
+        marked = {}
+        for facet in dolfin.facets(mesh):
+            marker = boundaries[facet.index()]
+            if marker:
+                marked[marker] = sorted(facet.entities(0))
+        assert marked == {1: [0, 3], 2: [0, 1]}
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_mesh_cache.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+import meshio
+from utils import *
+from fem.mesh_cache import *
+
+
+CODE = ['p12 = newp;', 'Point(p12) = {0.0, 0.0, 0.0, 0.1};',
+        'p13 = newp;', 'Point(p13) = {1.0, 0.0, 0.0, 0.1};',
+        'l4 = newl;', 'Line(l4) = {p12, p13};',
+        'Physical Line("l4") = {l4};']
+
+
+def triangle(value):
+    r"""Returns a meshio mesh of one triangle tagged ``value``."""
+    points = np.array([[0., 0., 0.], [1., 0., 0.], [0., value, 0.]])
+    cells = {'triangle': np.array([[0, 1, 2]])}
+    cell_data = {'triangle': {'gmsh:physical': np.array([value])}}
+    return meshio.Mesh(points, cells, cell_data=cell_data)
+
+
+class TestMeshCache:
+    def test_canonical_code(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        renumbered = ['p40 = newp;', 'Point(p40) = {0.0, 0.0, 0.0, 0.1};',
+                      'p41 = newp;', 'Point(p41) = {1.0, 0.0, 0.0, 0.1};',
+                      'l9 = newl;', 'Line(l9) = {p40, p41};',
+                      'Physical Line("l4") = {l9};']
+        actual = canonical_code(renumbered)
+        assert actual == canonical_code(CODE)
+        # the quoted names are kept
+        assert actual.splitlines() == [
+            'p0 = newp;', 'Point(p0) = {0.0, 0.0, 0.0, 0.1};',
+            'p1 = newp;', 'Point(p1) = {1.0, 0.0, 0.0, 0.1};',
+            'l0 = newl;', 'Line(l0) = {p0, p1};',
+            'Physical Line("l4") = {l0};']
+
+    def test_key(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        cache = MeshCache(str(fix.object.get('dir')))
+        renumbered = [line.replace('p12', 'p40') for line in CODE]
+        key = cache.key(CODE, 2, {})
+        assert cache.key(renumbered, 2, {}) == key
+        assert cache.key(CODE, 3, {}) != key
+        assert cache.key(CODE, 2, {'extra_gmsh_arguments': ['-clscale',
+                                                             '0.5']}) != key
+        coarse = [line.replace('0.1}', '0.2}') for line in CODE]
+        assert cache.key(coarse, 2, {}) != key
+
+    def test_put_get(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        cache = MeshCache(str(fix.object.get('dir')))
+        assert cache.get('missing') is None
+        cache.put('a', triangle(2))
+        msh = cache.get('a')
+        np.testing.assert_array_equal(msh.points, triangle(2).points)
+        np.testing.assert_array_equal(msh.cells['triangle'], [[0, 1, 2]])
+        np.testing.assert_array_equal(
+            msh.cell_data['triangle']['gmsh:physical'], [2])
+        # no temporary file is left
+        assert sorted(os.listdir(cache.directory())) == ['a.npz']
+
+    def test_load(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        directory = str(fix.object.get('dir'))
+        cache = MeshCache(directory)
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return triangle(3)
+
+        key = cache.key(CODE, 2, {})
+        cache.load(key, generate)
+        msh = cache.load(key, generate)
+        assert len(calls) == 1
+        assert (cache.hits(), cache.misses()) == (1, 1)
+        np.testing.assert_array_equal(
+            msh.cell_data['triangle']['gmsh:physical'], [3])
+        # shared by the processes
+        other = MeshCache(directory)
+        other.load(key, generate)
+        assert len(calls) == 1
+        assert (other.hits(), other.misses()) == (1, 0)
+
+    def test_evict(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        directory = str(fix.object.get('dir'))
+        cache = MeshCache(directory)
+        for i, key in enumerate(['a', 'b', 'c']):
+            cache.load(key, lambda: triangle(i + 1))
+            os.utime(cache.path(key), (1000. + i, 1000. + i))
+        entry_size = os.path.getsize(cache.path('a'))
+        # a hit makes 'a' the most recently used mesh
+        assert cache.get('a') is not None
+        cache = MeshCache(directory, max_size=2 * entry_size)
+        assert cache.evict() == ['b']
+        assert not os.path.exists(cache.path('b'))
+        assert not os.path.exists(cache.directory().child('b.lock'))
+        assert os.path.exists(cache.directory().child('a.lock'))
+        # the kept mesh is not removed, even if least recently used
+        cache = MeshCache(directory, max_size=entry_size)
+        assert cache.evict(keep='c') == ['a']
+        assert cache.summary()['num_meshes'] == 1
+        assert cache.size() <= entry_size
+
+    def test_evict_locked(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        directory = str(fix.object.get('dir'))
+        cache = MeshCache(directory)
+        for i, key in enumerate(['a', 'b']):
+            cache.load(key, lambda: triangle(i + 1))
+            os.utime(cache.path(key), (1000. + i, 1000. + i))
+        cache = MeshCache(directory, max_size=0)
+        # the lock file held by a process is kept
+        with cache._lock('a'):
+            assert cache.evict() == ['a', 'b']
+        assert os.path.exists(cache.directory().child('a.lock'))
+        assert not os.path.exists(cache.directory().child('b.lock'))
+        # a removed lock file is created again
+        with cache._lock('b'):
+            assert os.path.exists(cache.directory().child('b.lock'))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_probe.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+import dolfin
+from utils import *
+from fem.results_feats.probe import *
+
+
+POINTS = {'a': [0.25, 0.5], 'b': [0.75, 0.5]}
+
+
+def functions(mesh):
+    r"""Returns the recorded fields on the mesh."""
+    u = dolfin.Function(dolfin.VectorFunctionSpace(mesh, 'P', 2))
+    p = dolfin.Function(dolfin.FunctionSpace(mesh, 'P', 1))
+    return {'u': u, 'p': p}
+
+
+def run(probe, funcs, steps, dt=0.1):
+    r"""Records the steps, the pressure being the step index."""
+    for step in steps:
+        funcs['p'].assign(dolfin.Constant(float(step)))
+        funcs['u'].assign(dolfin.Constant((1., float(step))))
+        probe.record(step, step * dt, funcs)
+
+
+class TestProbe:
+    def test_flush(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        funcs = functions(fix.object.get('mesh'))
+        probe = Probe('probe', points=POINTS, stride=2, chunk_size=2,
+                      directory=str(fix.object.get('dir')))
+        run(probe, funcs, range(5))
+        assert probe.columns() == ['t', 'u_0[a]', 'u_1[a]', 'u_0[b]',
+                                   'u_1[b]', 'p[a]', 'p[b]']
+        # the first full buffer only is written
+        np.testing.assert_allclose(probe.times(), [0., 0.2])
+        probe.flush()
+        data = probe.data()
+        np.testing.assert_allclose(data['t'], [0., 0.2, 0.4])
+        np.testing.assert_allclose(data['p[a]'], [0., 2., 4.])
+        np.testing.assert_allclose(data['p[b]'], [0., 2., 4.])
+        np.testing.assert_allclose(data['u_0[b]'], [1., 1., 1.])
+        np.testing.assert_allclose(data['u_1[a]'], [0., 2., 4.])
+        size = os.path.getsize(probe.file_name('.bin'))
+        assert size == 3 * len(probe.columns()) * 8
+
+    def test_restart(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        funcs = functions(fix.object.get('mesh'))
+        directory = str(fix.object.get('dir'))
+        probe = Probe('probe', points=POINTS, chunk_size=4,
+                      directory=directory)
+        run(probe, funcs, range(6))
+        probe.close()
+        np.testing.assert_allclose(probe.times(), 0.1 * np.arange(6))
+        # the records after the restart time are dropped
+        probe = Probe('probe', points=POINTS, chunk_size=4,
+                      directory=directory)
+        probe.start(funcs, t=0.3)
+        np.testing.assert_allclose(probe.times(), [0., 0.1, 0.2, 0.3])
+        size = os.path.getsize(probe.file_name('.bin'))
+        assert size == 4 * len(probe.columns()) * 8
+        funcs['p'].assign(dolfin.Constant(40.))
+        probe.record(4, 0.4, funcs)
+        probe.close()
+        np.testing.assert_allclose(probe.times(), [0., 0.1, 0.2, 0.3, 0.4])
+        np.testing.assert_allclose(probe.data('p[a]'), [0., 1., 2., 3., 40.])
+
+    def test_new(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        funcs = functions(fix.object.get('mesh'))
+        directory = str(fix.object.get('dir'))
+        probe = Probe('probe', points=POINTS, directory=directory)
+        run(probe, funcs, range(3))
+        probe.close()
+        # without restart time, the files are overwritten
+        probe = Probe('probe', points=POINTS, directory=directory)
+        probe.start(funcs)
+        assert len(probe.times()) == 0
+        run(probe, funcs, [5])
+        probe.close()
+        np.testing.assert_allclose(probe.data('p[b]'), [5.])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_sampling.py
+November 14, 2019
+@author Francois Roy
+"""
+import pytest
+import dolfin
+from utils import *
+from fem.results_feats.sampling import *
+
+
+def exact(points, values):
+    r"""Returns the values of the expressions ``values`` (functions of x, y)
+    at the points."""
+    x, y = points[:, 0], points[:, 1]
+    return np.stack([v(x, y) for v in values], axis=-1)
+
+
+class TestSampler:
+    def test_linear(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        space = dolfin.FunctionSpace(mesh, 'P', 1)
+        u = dolfin.interpolate(
+            dolfin.Expression('1 + 2*x[0] - 3*x[1]', degree=1), space)
+        # the grid points include the vertices and the midpoints of the
+        # edges, shared by several cells (and processes)
+        points = grid_points([0., 0.], [1., 1.], (9, 5))
+        actual = Sampler(space, points, shape=(9, 5)).evaluate(u)
+        desired = exact(points, [lambda x, y: 1 + 2 * x - 3 * y])
+        np.testing.assert_allclose(actual, desired.reshape(9, 5),
+                                   atol=1e-12)
+
+    def test_quadratic(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        space = dolfin.FunctionSpace(mesh, 'P', 2)
+        u = dolfin.interpolate(dolfin.Expression(
+            'x[0]*x[0] + x[0]*x[1] - x[1]*x[1]', degree=2), space)
+        points = np.random.RandomState(0).uniform(0., 1., (50, 2))
+        actual = Sampler(space, points).evaluate(u)
+        desired = exact(points, [lambda x, y: x * x + x * y - y * y])
+        np.testing.assert_allclose(actual, desired[:, 0], atol=1e-12)
+
+    def test_vector(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        space = dolfin.VectorFunctionSpace(mesh, 'P', 2)
+        u = dolfin.interpolate(dolfin.Expression(
+            ('x[0]*x[1]', '1 - x[1]*x[1]'), degree=2), space)
+        points = line_points([0., 0.1], [1., 0.9], 21)
+        actual = Sampler(space, points).evaluate(u)
+        desired = exact(points, [lambda x, y: x * y, lambda x, y: 1 - y * y])
+        assert actual.shape == (21, 2)
+        np.testing.assert_allclose(actual, desired, atol=1e-12)
+
+    def test_evaluate_basis(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        # the discontinuous elements use evaluate_basis_all
+        mesh = fix.object.get('mesh')
+        space = dolfin.FunctionSpace(mesh, 'DG', 1)
+        u = dolfin.interpolate(
+            dolfin.Expression('x[0] - 2*x[1]', degree=1), space)
+        points = np.random.RandomState(1).uniform(0., 1., (20, 2))
+        actual = Sampler(space, points).evaluate(u)
+        desired = exact(points, [lambda x, y: x - 2 * y])
+        np.testing.assert_allclose(actual, desired[:, 0], atol=1e-12)
+
+    def test_outside(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        space = dolfin.FunctionSpace(mesh, 'P', 1)
+        u = dolfin.interpolate(dolfin.Constant(2.), space)
+        sampler = Sampler(space, [[0.5, 0.5], [1.5, 0.5], [1., 1.]])
+        np.testing.assert_array_equal(sampler.found(), [True, False, True])
+        actual = sampler.evaluate(u)
+        assert np.isnan(actual[1])
+        np.testing.assert_allclose(actual[[0, 2]], [2., 2.])
+
+    def test_points(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        space = dolfin.FunctionSpace(mesh, 'P', 1)
+        with pytest.raises(ValueError):
+            Sampler(space, [[0.5, 0.5, 0.5]])
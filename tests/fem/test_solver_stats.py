@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_solver_stats.py
+November 14, 2019
+@author Francois Roy
+"""
+import csv
+import json
+import time
+import pytest
+from utils import *
+from fem.solver_stats import *
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    r"""Replaces the clock of the timers by a clock advancing by 1 s at each
+    reading."""
+    ticks = iter(range(1000))
+    monkeypatch.setattr(time, 'perf_counter', lambda: float(next(ticks)))
+
+
+def record(stats):
+    r"""Records two steps of a solver."""
+    stats.start_step(1, t=0.1, dt=0.1)
+    with stats.timer('assemble_rhs'):
+        pass
+    with stats.timer('solve_pressure'):
+        pass
+    stats.add('iterations_pressure', 7)
+    stats.add('residual_pressure', 1e-10)
+    stats.add('courant', 0.4)
+    stats.start_step(2, t=0.3, dt=0.2)
+    with stats.timer('assemble_rhs'):
+        pass
+    stats.add('iterations_pressure', 5)
+    stats.add('residual_pressure', 3e-11)
+    stats.add('courant', 0.6)
+    stats.add('rejected', True)
+
+
+class TestSolverStats:
+    def test_timer(self, fix, clock):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        stats = SolverStats()
+        # not recorded before the first step
+        with stats.timer('assemble_rhs'):
+            pass
+        stats.add('iterations_pressure', 3)
+        assert stats.steps() == []
+        stats.start_step(1, t=0.1, dt=0.1)
+        with stats.timer('assemble_rhs'):
+            pass
+        with stats.timer('assemble_rhs'):
+            pass
+        # the time of a phase is added up within a step
+        assert stats.steps() == [{'step': 1, 't': 0.1, 'dt': 0.1,
+                                  'assemble_rhs': 2.}]
+
+    def test_start_step(self, fix, clock):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        stats = SolverStats()
+        record(stats)
+        steps = stats.steps()
+        assert [s['step'] for s in steps] == [1, 2]
+        assert steps[0] == {'step': 1, 't': 0.1, 'dt': 0.1,
+                            'assemble_rhs': 1., 'solve_pressure': 1.,
+                            'iterations_pressure': 7,
+                            'residual_pressure': 1e-10, 'courant': 0.4}
+        assert 'solve_pressure' not in steps[1]
+        stats.clear()
+        assert stats.steps() == []
+        assert stats.summary() == {'num_steps': 0}
+
+    def test_summary(self, fix, clock):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        stats = SolverStats()
+        record(stats)
+        # the phases and the iterations are added up, not the other values
+        assert stats.summary() == {
+            'num_steps': 2, 'assemble_rhs': 2., 'solve_pressure': 1.,
+            'iterations_pressure': 12, 'residual_pressure_last': 3e-11,
+            'residual_pressure_max': 1e-10, 'courant_last': 0.6,
+            'courant_max': 0.6}
+
+    def test_save(self, fix, clock):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        directory = fix.object.get('dir')
+        stats = SolverStats()
+        record(stats)
+        stats.to_json(str(directory.joinpath('stats.json')))
+        with open(str(directory.joinpath('stats.json'))) as f:
+            data = json.load(f)
+        assert data['summary'] == stats.summary()
+        assert data['steps'] == stats.steps()
+        stats.to_csv(str(directory.joinpath('stats.csv')))
+        with open(str(directory.joinpath('stats.csv')), newline='') as f:
+            rows = list(csv.DictReader(f))
+        # the columns of all the steps, empty if missing in a step
+        assert list(rows[0].keys()) == [
+            'step', 't', 'dt', 'assemble_rhs', 'solve_pressure',
+            'iterations_pressure', 'residual_pressure', 'courant',
+            'rejected']
+        assert [r['iterations_pressure'] for r in rows] == ['7', '5']
+        assert [r['solve_pressure'] for r in rows] == ['1.0', '']
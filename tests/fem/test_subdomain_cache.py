@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_subdomain_cache.py
+November 14, 2019
+@author Francois Roy
+"""
+import threading
+import time
+import pytest
+import dolfin
+from utils import *
+from fem.subdomain_cache import *
+
+LEFT = 'on_boundary && near(x[0], 0.0, tol)'
+
+
+@pytest.fixture()
+def compiled(monkeypatch):
+    r"""Empties the subdomain cache and records the compilations.
+
+    :return: The list of the compiled expressions.
+    """
+    calls = []
+    compile_subdomain = dolfin.CompiledSubDomain
+
+    def counted(expression, **kwargs):
+        calls.append(expression)
+        time.sleep(0.01)  # let the other threads miss
+        return compile_subdomain(expression, **kwargs)
+
+    monkeypatch.setattr(dolfin, 'CompiledSubDomain', counted)
+    clear_cache()
+    yield calls
+    clear_cache()
+
+
+class TestSubdomainCache:
+    def test_hits(self, fix, compiled):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        a = compiled_subdomain(LEFT, tol=1e-14)
+        b = compiled_subdomain(LEFT, tol=1e-14)
+        assert a is b
+        assert cache_info() == {'size': 1, 'hits': 1, 'misses': 1}
+        # the parameters are part of the key, not their order
+        c = compiled_subdomain(LEFT, tol=1e-10)
+        assert c is not a
+        d = compiled_subdomain('near(x[0], a, tol)', tol=1e-14, a=0.5)
+        assert compiled_subdomain('near(x[0], a, tol)', a=0.5,
+                                  tol=1e-14) is d
+        assert cache_info() == {'size': 3, 'hits': 2, 'misses': 3}
+        assert len(compiled) == 3
+        clear_cache()
+        assert cache_info() == {'size': 0, 'hits': 0, 'misses': 0}
+
+    def test_threads(self, fix, compiled):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        out = []
+
+        def run():
+            out.append(compiled_subdomain(LEFT, tol=1e-14))
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        # compiled once, the same subdomain for all the threads
+        assert compiled == [LEFT]
+        assert all(s is out[0] for s in out)
+        assert cache_info() == {'size': 1, 'hits': 7, 'misses': 1}
+
+    def test_lazy(self, fix, compiled):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        left = LazySubDomain(LEFT, tol=1e-14)
+        other = LazySubDomain(LEFT, tol=1e-14)
+        assert left.expression() == LEFT
+        assert compiled == []
+        boundaries = dolfin.MeshFunction('size_t', mesh, 1, 0)
+        left.mark(boundaries, 1)
+        # 4 facets on the left side of the unit square mesh
+        assert np.count_nonzero(boundaries.array() == 1) == 4
+        assert other.compiled() is left.compiled()
+        assert compiled == [LEFT]
+        with pytest.raises(AttributeError):
+            left._missing
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+tests.fem.test_time_series.py
+November 14, 2019
+@author Francois Roy
+"""
+import json
+import xml.etree.ElementTree as ET
+import pytest
+import dolfin
+from utils import *
+from fem.results_feats.time_series import *
+
+
+def functions(mesh):
+    r"""Returns the written fields on the mesh."""
+    u = dolfin.Function(dolfin.VectorFunctionSpace(mesh, 'P', 1))
+    p = dolfin.Function(dolfin.FunctionSpace(mesh, 'P', 1))
+    return {'u': u, 'p': p}
+
+
+def run(writer, funcs, steps, dt=0.1):
+    r"""Writes the steps, the pressure being the step index and the
+    velocity (step, 2 * step)."""
+    for step in steps:
+        funcs['p'].assign(dolfin.Constant(float(step)))
+        funcs['u'].assign(dolfin.Constant((float(step), 2. * step)))
+        writer.write(step, step * dt, funcs)
+
+
+def read_item(directory, item):
+    r"""Reads the array of an XDMF binary data item."""
+    shape = [int(d) for d in item.get('Dimensions').split()]
+    dtype = np.float64 if item.get('NumberType') == 'Float' else np.int64
+    return np.fromfile(str(directory.joinpath(item.text.strip())),
+                       dtype=dtype, count=int(np.prod(shape)),
+                       offset=int(item.get('Seek'))).reshape(shape)
+
+
+def read_xdmf(directory, name):
+    r"""Returns the times and the values of the snapshots of an XDMF file,
+    with the geometry and the topology of the last snapshot."""
+    root = ET.parse(str(directory.joinpath(name + '.xdmf'))).getroot()
+    grids = root.find('Domain').find('Grid').findall('Grid')
+    times = [float(g.find('Time').get('Value')) for g in grids]
+    values = [read_item(directory, g.find('Attribute').find('DataItem'))
+              for g in grids]
+    geometry = read_item(directory, grids[-1].find('Geometry').find(
+        'DataItem')) if grids else None
+    topology = read_item(directory, grids[-1].find('Topology').find(
+        'DataItem')) if grids else None
+    return times, values, geometry, topology
+
+
+class TestTimeSeriesWriter:
+    def test_write(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        directory = fix.object.get('dir')
+        funcs = functions(mesh)
+        writer = TimeSeriesWriter(str(directory), funcs, stride=2)
+        run(writer, funcs, range(5))
+        writer.close()
+        assert writer.num_snapshots() == 3
+        num_vertices = mesh.num_vertices()
+        # the binary files, written by the thread
+        np.testing.assert_allclose(
+            np.fromfile(str(directory.joinpath('times.bin'))), [0., .2, .4])
+        p = np.fromfile(str(directory.joinpath('p_0.bin')))
+        np.testing.assert_allclose(p.reshape(3, num_vertices),
+                                   [[0.] * num_vertices, [2.] * num_vertices,
+                                    [4.] * num_vertices])
+        u = np.fromfile(str(directory.joinpath('u_0.bin')))
+        # the 2d vectors are written as 3d vectors
+        np.testing.assert_allclose(u.reshape(3, num_vertices, 3)[2],
+                                   [[4., 8., 0.]] * num_vertices)
+        with open(str(directory.joinpath('time_series.json'))) as f:
+            meta = json.load(f)
+        assert meta['fields'] == {'u': 3, 'p': 1}
+        assert meta['partition'] == [[num_vertices, mesh.num_cells()]]
+        # the XDMF files describe the binary files
+        times, values, geometry, topology = read_xdmf(directory, 'u')
+        np.testing.assert_allclose(times, [0., .2, .4])
+        np.testing.assert_allclose(values[1], [[2., 4., 0.]] * num_vertices)
+        np.testing.assert_allclose(geometry[:, :2], mesh.coordinates())
+        np.testing.assert_array_equal(topology, mesh.cells())
+        times, values, _, _ = read_xdmf(directory, 'p')
+        np.testing.assert_allclose(values[2], [[4.]] * num_vertices)
+
+    def test_times(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        directory = fix.object.get('dir')
+        funcs = functions(fix.object.get('mesh'))
+        # the first step after each output time, without thread
+        writer = TimeSeriesWriter(str(directory), funcs,
+                                  times=[0.15, 0.3, 0.31],
+                                  asynchronous=False)
+        run(writer, funcs, range(6))
+        writer.close()
+        times, _, _, _ = read_xdmf(directory, 'p')
+        np.testing.assert_allclose(times, [0.2, 0.3, 0.4])
+
+    def test_restart(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        directory = fix.object.get('dir')
+        funcs = functions(mesh)
+        writer = TimeSeriesWriter(str(directory), funcs)
+        run(writer, funcs, range(6))
+        writer.close()
+        # the snapshots after the restart time are dropped
+        writer = TimeSeriesWriter(str(directory), funcs, t=0.25)
+        assert writer.num_snapshots() == 3
+        run(writer, funcs, [30])
+        writer.close()
+        assert writer.num_snapshots() == 4
+        times, values, _, _ = read_xdmf(directory, 'p')
+        np.testing.assert_allclose(times, [0., .1, .2, 3.])
+        np.testing.assert_allclose([v[0, 0] for v in values],
+                                   [0., 1., 2., 30.])
+        np.testing.assert_allclose(
+            np.fromfile(str(directory.joinpath('times.bin'))),
+            [0., .1, .2, 3.])
+        assert os.path.getsize(str(directory.joinpath('p_0.bin'))) == \
+            4 * mesh.num_vertices() * 8
+        # a new series without restart time
+        writer = TimeSeriesWriter(str(directory), funcs)
+        writer.close()
+        assert read_xdmf(directory, 'p')[0] == []
+
+    def test_error(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        directory = fix.object.get('dir')
+        funcs = functions(fix.object.get('mesh'))
+        writer = TimeSeriesWriter(str(directory), funcs)
+        writer._files['p'].close()
+        # the error of the thread is raised in the solver thread
+        run(writer, funcs, [0])
+        with pytest.raises(ValueError):
+            writer.flush()
+        with pytest.raises(ValueError):
+            writer.close()
+
+
+class TestTimeSeriesReader:
+    def write(self, mesh, directory):
+        r"""Writes 3 snapshots of fields varying in space."""
+        funcs = functions(mesh)
+        p_exact = dolfin.Expression('x[0] + 2*x[1] + t', degree=1, t=0.)
+        u_exact = dolfin.Expression(('x[1] + t', '-x[0]'), degree=1, t=0.)
+        writer = TimeSeriesWriter(str(directory), funcs)
+        for step in range(3):
+            p_exact.t = u_exact.t = float(step)
+            funcs['p'].interpolate(p_exact)
+            funcs['u'].interpolate(u_exact)
+            writer.write(step, 0.1 * step, funcs)
+        writer.close()
+        return funcs, p_exact, u_exact
+
+    def test_values(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        directory = fix.object.get('dir')
+        self.write(mesh, directory)
+        reader = TimeSeriesReader(str(directory))
+        assert reader.fields() == {'u': 3, 'p': 1}
+        assert reader.num_snapshots() == 3
+        np.testing.assert_allclose(reader.times(), [0., 0.1, 0.2])
+        vertices, cells = reader.mesh()
+        np.testing.assert_allclose(vertices[:, :2], mesh.coordinates())
+        np.testing.assert_array_equal(cells, mesh.cells())
+        x, y = vertices[:, 0], vertices[:, 1]
+        np.testing.assert_allclose(reader.values('p', 1)[:, 0],
+                                   x + 2. * y + 1.)
+        np.testing.assert_allclose(reader.values('u'),
+                                   np.stack([y + 2., -x, 0. * x], axis=1))
+        with pytest.raises(ValueError):
+            reader.values('p', 3)
+
+    def test_read(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        directory = fix.object.get('dir')
+        funcs, p_exact, u_exact = self.write(mesh, directory)
+        reader = TimeSeriesReader(str(directory))
+        # the function of the snapshot, from the dofs of the vertices
+        p = dolfin.Function(funcs['p'].function_space())
+        reader.read('p', p, index=1)
+        p_exact.t = 1.
+        funcs['p'].interpolate(p_exact)
+        np.testing.assert_allclose(p.vector().get_local(),
+                                   funcs['p'].vector().get_local())
+        u = dolfin.Function(funcs['u'].function_space())
+        reader.read('u', u)
+        np.testing.assert_allclose(u.vector().get_local(),
+                                   funcs['u'].vector().get_local())
+
+    def test_invalid(self, fix):
+        """
+        :param fix: The fixture --see :func:`fix<tests.fem.conftest.fix>`
+        """
+        mesh = fix.object.get('mesh')
+        directory = fix.object.get('dir')
+        with pytest.raises(ValueError):
+            TimeSeriesReader(str(directory))
+        self.write(mesh, directory)
+        reader = TimeSeriesReader(str(directory))
+        # another mesh
+        other = dolfin.UnitSquareMesh(2, 2)
+        with pytest.raises(ValueError):
+            reader.read('p', dolfin.Function(
+                dolfin.FunctionSpace(other, 'P', 1)))
+        # not a P1 space
+        with pytest.raises(ValueError):
+            reader.read('p', dolfin.Function(
+                dolfin.FunctionSpace(mesh, 'P', 2)))
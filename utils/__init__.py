@@ -50,3 +50,16 @@ Q_ = ureg.Quantity
 ROOT_DIR = Path(os.path.abspath(__file__)).ancestor(2)
 APP_DIR = ROOT_DIR.child(".fem")
 OUT_DIR = ROOT_DIR.child('outputs')
+
+
+def app_dir():
+    r"""Returns the directory of the generated files (geometry, meshes),
+    default to APP_DIR. The ``FEM_APP_DIR`` environment variable overrides it,
+    e.g. to give each job of a sweep its own scratch directory."""
+    return Path(os.environ.get('FEM_APP_DIR', APP_DIR))
+
+
+def out_dir():
+    r"""Returns the directory of the outputs (checkpoints, probes), default
+    to OUT_DIR. The ``FEM_OUT_DIR`` environment variable overrides it."""
+    return Path(os.environ.get('FEM_OUT_DIR', OUT_DIR))